@@ -1,10 +1,16 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
-import time
 from dotenv import load_dotenv
 from prometheus_flask_exporter import PrometheusMetrics
 from prometheus_client import Histogram
+from app.services.startup import startup
+from app.services.tuning import tuning
+
+startup.record_phase('import:dependencies', time.perf_counter() - _import_started)
 
 
 # Определение метрик Prometheus
@@ -61,9 +67,19 @@ def create_app(test_config=None):
             request_latency.labels(endpoint=request.path).observe(latency)
         return response
     
+    # Потоки OpenCV и torch по доступным процессорам (или по файлу автонастройки)
+    tuning.apply()
+
     # Регистрация маршрутов
-    from app.api import routes
+    with startup.phase('import:routes'):
+        from app.api import routes
     app.register_blueprint(routes.bp)
+
+    # Подключение к БД, хранилищу и прогрев модели выполняются в фоне;
+    # готовность приложения сообщает /ready
+    routes.register_startup_tasks(startup)
+    if not app.config.get('TESTING') and os.environ.get('STARTUP_INIT', 'true').lower() == 'true':
+        startup.start()
     
     # После регистрации всех маршрутов регистрируем дефолтные метрики
     # для отслеживания запросов по путям
@@ -76,6 +92,3 @@ def create_app(test_config=None):
         )
     
     return app
-
-# Создание экземпляра приложения для запуска через WSGI
-app = create_app()
@@ -4,15 +4,20 @@ from functools import wraps
 import json
 import jwt
 import os
-import tempfile
+import shutil
 import logging
 import uuid
 import traceback
 import time  # Добавляем для измерения времени операций
 from datetime import datetime
 from app.services.video_processing import video_processing
+from app.services.video_processing import detection_log
+from app.services.video_processing.detection_store import DetectionReader, detections_object_name, evaluate_threshold
+from app.models import model as detection_model
 from app.services.minio import MinioStorage
 from app.services.database import DatabaseManager
+from app.services.jobs import JobQueue, QueueFullError, recovery
+from app.services.uploads import UploadRejected, file_sha256, presigned, receive_upload, resumable, sweeper
 from prometheus_client import Counter, Histogram, Gauge, Summary, generate_latest, CONTENT_TYPE_LATEST  # Импортируем классы метрик
 from app import metrics  # Импортируем экземпляр метрик из app
 from flask import Response
@@ -39,10 +44,37 @@ with open(os.path.join(CONFIG_DIR, "secret.json")) as f:
     config = json.load(f)
     SECRET_KEY = config["SECRET_KEY"]
 
-storage = MinioStorage()
+storage = MinioStorage.shared()
 
 db_manager = DatabaseManager()
-db_manager.init_database()
+
+
+def register_startup_tasks(startup):
+    """Задачи инициализации ресурсов, которые используют маршруты"""
+    def init_database():
+        if not db_manager.init_database():
+            raise RuntimeError("База данных недоступна или схема не обновлена")
+
+    def init_storage():
+        if not storage.ensure_connection():
+            raise RuntimeError("MinIO недоступен")
+
+    def warmup_model():
+        detection_model.warmup(batch_size=int(os.environ.get('MODEL_WARMUP_BATCH', 1)))
+        for phase, seconds in detection_model.load_timings.items():
+            startup.record_phase(f"model:{phase}", seconds)
+
+    def start_upload_sweeper():
+        sweeper.start(storage, db_manager)
+
+    def start_job_recovery():
+        recovery.start(job_queue, db_manager)
+
+    startup.add_task('database', init_database)
+    startup.add_task('storage', init_storage)
+    startup.add_task('model', warmup_model)
+    startup.add_task('upload_sweeper', start_upload_sweeper, required=False)
+    startup.add_task('job_recovery', start_job_recovery, required=False)
 
 # === Определение метрик Prometheus для routes.py ===
 
@@ -96,6 +128,18 @@ api_response_size_bytes = Histogram(
 )
 
 # Метрики ошибок
+result_cache_requests_total = Counter(
+    'result_cache_requests_total',
+    'Lookups of processing results by uploaded content',
+    ['result']  # 'hit', 'miss', 'stale'
+)
+
+threshold_reevaluation_seconds = Histogram(
+    'threshold_reevaluation_seconds',
+    'Time to recompute a video result at another confidence threshold from stored detections',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
 api_errors_total = Counter(
     'api_errors_total',
     'Total number of API errors',
@@ -225,24 +269,236 @@ def login():
         raise
 
 
+def _discard_upload(workspace):
+    """Удаление рабочего каталога загрузки вместе с файлом"""
+    shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _parse_processing_options(values):
+    """
+    Параметры обработки из полей формы или тела JSON
+
+    imgsz - размер входа модели вместо выбранного по разрешению видео; render=false -
+    видео с разметкой не формируется, клиент рисует рамки по /videos/<filename>/detections.
+
+    :raises ValueError: Недопустимое значение (текст ошибки для ответа)
+    :return: (imgsz или None, render)
+    """
+    imgsz = values.get("imgsz")
+    if imgsz is not None:
+        try:
+            imgsz = int(imgsz)
+        except (TypeError, ValueError):
+            imgsz = 0
+        if not 32 <= imgsz <= 4096:
+            raise ValueError("Размер входа модели (imgsz) должен быть целым числом от 32 до 4096")
+
+    render = str(values.get("render", "true")).lower()
+    if render not in ("true", "false"):
+        raise ValueError("Параметр render должен быть true или false")
+    return imgsz, render == "true"
+
+
+def _fetch_stored_upload(payload):
+    """
+    Скачивание видео из бакета загрузок в рабочий каталог задачи
+
+    Хэш содержимого считается после скачивания: результат сохраняется в кэше так же,
+    как для видео, загруженного через /predict.
+
+    :return: Путь к файлу видео
+    """
+    workspace = video_processing.create_workspace()
+    payload['workspace'] = workspace
+    temp_path = os.path.join(workspace, "upload" + os.path.splitext(payload['source_object'])[1])
+    if not storage.get_upload(payload['source_object'], temp_path):
+        raise RuntimeError(
+            f"Не удалось получить загруженное видео {payload['source_object']} из хранилища, повторите завершение загрузки"
+        )
+    payload['upload_fetched'] = True
+
+    payload['content_sha256'] = file_sha256(temp_path)
+    # Размер входа выбирается до ключа кэша: при бюджете задержки политика выбирает разные размеры
+    payload['inference_size'] = video_processing.select_inference_size(temp_path, payload.get('imgsz'))
+    payload['cache_key'] = video_processing.build_cache_key(
+        payload['content_sha256'], payload['confidence_threshold'],
+        imgsz=payload['inference_size']['imgsz'], render=payload.get('render', True)
+    )
+    return temp_path
+
+
+def _expand_requested():
+    """Запрошен ли лог обнаружений в исходном формате - списком кадров (?expand=true)"""
+    return request.args.get('expand', 'false').lower() == 'true'
+
+
+def _with_detections(response, log):
+    """Добавление лога обнаружений в ответ: компактный формат или (с ?expand=true) список кадров"""
+    if _expand_requested():
+        response["frame_objects"] = detection_log.expand(log)
+    else:
+        response["detections"] = detection_log.encode(log, fps=response.get("fps"))
+    return response
+
+
+def _load_video_log(filename, video_data=None):
+    """Лог обнаружений видео: по записи результатов в БД, иначе по имени рядом с видео"""
+    if video_data:
+        detection_results = db_manager.get_video_detections(video_data['video_id'])
+        if detection_results:
+            if storage.object_exists(detection_results['bucket_name'], detection_results['s3_key']):
+                logs = storage.get_log_from_bucket(detection_results['bucket_name'], detection_results['s3_key'])
+                if logs:
+                    return logs
+    return storage.get_log(f"{filename}.json")
+
+
+def _load_cached_result(cache_key, user_id):
+    """
+    Результат предыдущей обработки того же содержимого или None
+
+    Запись кэша, объекты которой удалены из хранилища, удаляется.
+    """
+    cached = db_manager.get_cached_result(cache_key, user_id)
+    if not cached:
+        result_cache_requests_total.labels(result='miss').inc()
+        return None
+
+    log = None
+    if storage.object_exists(cached['bucket_name'], cached['s3_key']) and \
+            storage.object_exists(cached['log_bucket_name'], cached['log_s3_key']):
+        log = storage.get_log_from_bucket(cached['log_bucket_name'], cached['log_s3_key'])
+
+    if not detection_log.is_valid(log):
+        logger.warning(f"Результат в кэше недоступен в хранилище, запись удалена: {cache_key}")
+        db_manager.delete_cached_result(cache_key, user_id)
+        result_cache_requests_total.labels(result='stale').inc()
+        return None
+
+    result_cache_requests_total.labels(result='hit').inc()
+    metadata = cached.get('metadata') or {}
+    fps = metadata.get('fps')
+    return _with_detections({
+        "job_id": str(cached['video_id']),
+        "video_url": cached['s3_key'],
+        "fps": float(fps) if fps else None
+    }, log)
+
+
+def _run_prediction_job(job_id, payload, report_progress):
+    """Фоновая обработка видео, поставленного в очередь через /predict или /uploads/<upload_id>/complete"""
+    temp_path = payload.get('temp_path')
+    video_id = payload.get('video_id')
+    user_id = payload.get('user_id')
+    saved_progress = {'value': 0.0}
+
+    def on_progress(progress):
+        report_progress(progress)
+        # Прогресс в БД пишем с шагом 5%, чтобы не выполнять запрос на каждый кадр
+        if video_id and progress - saved_progress['value'] >= 0.05:
+            db_manager.update_video_metadata(video_id, {'progress': round(progress, 2)})
+            saved_progress['value'] = progress
+
+    try:
+        if video_id:
+            db_manager.update_video_status(video_id, 'processing')
+
+        if payload.get('source_object'):
+            # Видео загружено частями в MinIO: API его не сохранял, файл получает задача
+            temp_path = _fetch_stored_upload(payload)
+
+        logger.info(f"Начало обработки видео: {payload['original_filename']}, порог уверенности: {payload['confidence_threshold']}")
+        # Размер входа уже выбран, если по нему построен ключ кэша
+        inference_size = payload.get('inference_size') or video_processing.select_inference_size(temp_path, payload.get('imgsz'))
+        video_filename, frame_objects, fps, has_weapon_or_knife, log_filename = video_processing.process_video(
+            temp_path,
+            payload['confidence_threshold'],
+            payload['username'],
+            output_filename=payload['video_filename'],
+            progress_callback=on_progress,
+            imgsz=inference_size['imgsz'],
+            render=payload.get('render', True)
+        )
+
+        if not video_filename or not isinstance(frame_objects, list) or not fps:
+            logger.error("Некорректные результаты обработки видео")
+            raise ValueError("Не удалось корректно обработать видео. Проверьте формат файла.")
+
+        logger.info(f"Обработка видео завершена: {video_filename}, кадров: {len(frame_objects)}, fps: {fps}")
+
+        if video_id:
+            detection_count = sum(1 for obj in frame_objects if len(obj) > 0)
+            model_variant = detection_model.get_model_variant()
+            db_manager.update_video_metadata(video_id, {
+                "fps": str(fps),
+                "detection_count": str(detection_count),
+                "processed_date": datetime.now().isoformat(),
+                "model_variant": model_variant,
+                "imgsz": inference_size['imgsz'],
+                "imgsz_source": inference_size['source'],
+                "rendered": payload.get('render', True),
+                "progress": 1.0
+            })
+            success, error = db_manager.save_detection_results(
+                video_id, log_filename, frame_objects, has_weapon_or_knife, model_variant=model_variant
+            )
+            if error:
+                logger.error(f"Ошибка при сохранении результатов обнаружения в БД: {error}")
+            else:
+                db_manager.add_log(user_id, 'upload', video_id)
+                if payload.get('cache_key'):
+                    db_manager.save_cached_result(
+                        payload['cache_key'],
+                        user_id,
+                        video_id,
+                        payload['content_sha256'],
+                        detection_model.get_model_version(),
+                        payload['confidence_threshold']
+                    )
+
+        # В памяти задачи лог хранится в компактном формате; список кадров - по ?expand=true
+        return {
+            "video_url": video_filename,
+            "detections": detection_log.encode(frame_objects, fps),
+            "fps": fps,
+            "imgsz": inference_size['imgsz'],
+            "rendered": payload.get('render', True)
+        }
+    except Exception:
+        if payload.get('source_object') and not payload.get('upload_fetched'):
+            # Видео не получено из хранилища: объект остается в бакете загрузок, а запись видео
+            # удаляется вместе с привязкой к загрузке, чтобы завершение можно было повторить
+            if video_id:
+                db_manager.discard_video(video_id)
+        elif video_id:
+            db_manager.update_video_status(video_id, 'failed')
+        raise
+    finally:
+        if payload.get('workspace'):
+            _discard_upload(payload['workspace'])
+            logger.debug(f"Рабочий каталог загрузки удален: {payload['workspace']}")
+        elif temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+            logger.debug(f"Временный файл удален: {temp_path}")
+        if payload.get('upload_fetched'):
+            # Объект больше не нужен: видео обработано или не может быть обработано
+            storage.delete_upload(payload['source_object'])
+
+
+# Порог уверенности для видео, загружаемых на обработку
+PREDICT_CONFIDENCE_THRESHOLD = 0.6
+
+job_queue = JobQueue(
+    _run_prediction_job,
+    num_workers=int(os.environ.get('PROCESSING_WORKERS', 2)),
+    max_size=int(os.environ.get('PROCESSING_QUEUE_SIZE', 100))
+)
+
+
 @bp.route("/predict", methods=["POST"])
 @token_required
 def processing():
     logger.info("Получен запрос на обработку видео")
-    
-    if "file" not in request.files:
-        logger.warning("Запрос не содержит файла")
-        return jsonify({"error": "No file part"}), 400
-
-    file = request.files["file"]
-    if file.filename == "":
-        logger.warning("Файл не выбран")
-        return jsonify({"error": "No selected file"}), 400
-        
-    allowed_extensions = {'mp4', 'avi', 'mov', 'mkv'}
-    if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
-        logger.warning(f"Недопустимое расширение файла: {file.filename}")
-        return jsonify({"error": "Недопустимый формат файла. Разрешены только видеофайлы (.mp4, .avi, .mov, .mkv)"}), 400
 
     token = request.headers.get("Authorization").split(" ")[1]
     user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
@@ -250,96 +506,459 @@ def processing():
     user_id = user_data.get("user_id")  # Может отсутствовать в старых токенах
     logger.info(f"Обработка видео для пользователя: {username}")
 
-    file_extension = os.path.splitext(file.filename)[1]
-    logger.debug(f"Расширение загруженного файла: {file_extension}")
+    # Тело запроса разбирается потоково: файл пишется сразу в рабочий каталог задачи,
+    # хэш и формат контейнера определяются по ходу записи, без буферизации формы
+    workspace = video_processing.create_workspace()
+    try:
+        upload = receive_upload(request.stream, request.content_type, request.content_length, workspace)
+    except UploadRejected as e:
+        _discard_upload(workspace)
+        logger.warning(f"Загрузка отклонена: {e}")
+        return jsonify({"error": str(e)}), e.status
+    except Exception:
+        _discard_upload(workspace)
+        raise
+    form = upload.fields
+
+    # mode=alert: быстрый ответ о первом подтвержденном обнаружении, continue=true - затем полный анализ в фоне
+    mode = form.get("mode", "full")
+    if mode not in ("full", "alert"):
+        _discard_upload(workspace)
+        return jsonify({"error": "Недопустимый режим обработки. Разрешены: full, alert"}), 400
+    continue_full = form.get("continue", "false").lower() == "true"
 
-    temp_path = None
     try:
-        temp_dir = tempfile.gettempdir()
-        
-        temp_filename = f"temp_video_{datetime.now().strftime('%Y%m%d%H%M%S')}_{username}{file_extension}"
-        temp_path = os.path.join(temp_dir, temp_filename)
-        
-        file.save(temp_path)
-        file.close()  # Убедимся, что файл закрыт
-        logger.info(f"Временный файл создан: {temp_path}")
-        
-        if not os.path.exists(temp_path):
-            logger.error(f"Временный файл не был создан: {temp_path}")
-            return jsonify({"error": "Ошибка при сохранении временного файла"}), 500
-            
-        file_size = os.path.getsize(temp_path)
-        max_size = 100 * 1024 * 1024  # 100 МБ
-        if file_size > max_size:
-            logger.warning(f"Файл слишком большой: {file_size//(1024*1024)} МБ")
-            os.remove(temp_path)
-            return jsonify({"error": f"Файл слишком большой. Максимальный размер: {max_size/(1024*1024)} МБ"}), 400
-    
-        confidence_threshold = 0.6
-        logger.info(f"Начало обработки видео: {file.filename}, порог уверенности: {confidence_threshold}")
-        video_filename, frame_objects, fps, has_weapon_or_knife, log_filename = video_processing.process_video(
-            temp_path, confidence_threshold, username
-        )
-        
-        if not video_filename or not isinstance(frame_objects, list) or not fps:
-            logger.error("Некорректные результаты обработки видео")
-            raise ValueError("Не удалось корректно обработать видео. Проверьте формат файла.")
-        
-        logger.info(f"Обработка видео завершена: {video_filename}, кадров: {len(frame_objects)}, fps: {fps}")
-        
-        detection_count = sum(1 for obj in frame_objects if len(obj) > 0)
-        metadata = {
-            "username": username,
-            "original_filename": file.filename,
-            "fps": str(fps),
-            "detection_count": str(detection_count),
-            "processed_date": datetime.now().isoformat()
-        }
-        logger.debug(f"Метаданные видео: {metadata}")
+        imgsz, render = _parse_processing_options(form)
+    except ValueError as e:
+        _discard_upload(workspace)
+        return jsonify({"error": str(e)}), 400
+
+    original_filename = upload.filename
+    temp_path = upload.path
+    content_sha256 = upload.sha256
+    logger.info(f"Видео {original_filename} принято: {upload.size} байт, контейнер {upload.container}")
+
+    video_id = None
+    try:
+        confidence_threshold = PREDICT_CONFIDENCE_THRESHOLD
+
+        alert = None
+        if mode == "alert":
+            try:
+                alert = video_processing.detect_alert(temp_path, confidence_threshold, imgsz=imgsz)
+            except ValueError as e:
+                # Контейнер распознан, но OpenCV не открывает видео
+                _discard_upload(workspace)
+                return jsonify({"error": str(e)}), 400
+            if user_id:
+                db_manager.add_log(user_id, 'alert_scan', details={"filename": original_filename, **alert})
+            if not continue_full:
+                _discard_upload(workspace)
+                return jsonify({"mode": "alert", **alert}), 200
 
+        cache_key = None
+        inference_size = None
         if user_id:
+            # Ключ кэша строится по размеру входа, с которым видео будет обработано (а не по запрошенному):
+            # при бюджете задержки политика выбирает размер по текущим замерам
+            try:
+                inference_size = video_processing.select_inference_size(temp_path, imgsz)
+            except ValueError as e:
+                _discard_upload(workspace)
+                return jsonify({"error": str(e)}), 400
+            # То же видео с той же моделью и настройками уже обработано: результат берется из кэша
+            cache_key = video_processing.build_cache_key(
+                content_sha256, confidence_threshold, imgsz=inference_size['imgsz'], render=render
+            )
+            cached = _load_cached_result(cache_key, user_id)
+            if cached:
+                _discard_upload(workspace)
+                db_manager.add_log(user_id, 'upload_cached', cached['job_id'])
+                logger.info(f"Видео {original_filename} уже обработано, результат из кэша: {cached['job_id']}")
+                cached.update(status="completed", cached=True, status_url=f"/jobs/{cached['job_id']}")
+                if alert is not None:
+                    cached["alert"] = alert
+                return jsonify(cached), 200
+
+        video_filename = video_processing.build_output_filename(original_filename, username)
+
+        if user_id:
+            # Видео регистрируется в БД сразу со статусом 'pending', идентификатор записи служит идентификатором задачи
             video_id, error = db_manager.save_video_metadata(
                 user_id, 
                 video_filename, 
                 storage.video_bucket, 
-                metadata, 
-                status='completed'
+                {
+                    "username": username,
+                    "original_filename": original_filename,
+                    "submitted_date": datetime.now().isoformat(),
+                    "progress": 0.0,
+                    **({"alert": alert} if alert is not None else {})
+                },
+                status='pending'
             )
-            success, error1 = db_manager.save_detection_results(video_id,log_filename, frame_objects, has_weapon_or_knife)
-            
             if error:
                 logger.error(f"Ошибка при сохранении метаданных видео в БД: {error}")
-            if error1:
-                logger.error(f"Ошибка при сохранении результатов обнаружения в БД: {error1}")
-            else:
-                db_manager.add_log(user_id, 'upload', video_id)
-                
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            logger.debug(f"Временный файл удален: {temp_path}")
 
-        logger.info(f"Запрос /predict успешно обработан для файла: {file.filename}")
-        return jsonify({
-            "video_url": video_filename, 
-            "frame_objects": frame_objects, 
-            "fps": fps
-        }), 200
-    
-    except ValueError as ve:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        logger.warning(f"Ошибка валидации в /predict: {str(ve)}")
-        return jsonify({"error": str(ve)}), 400
-        
+        job_id = job_queue.submit({
+            "temp_path": temp_path,
+            "workspace": workspace,
+            "username": username,
+            "user_id": user_id,
+            "video_id": video_id,
+            "video_filename": video_filename,
+            "original_filename": original_filename,
+            "confidence_threshold": confidence_threshold,
+            "imgsz": imgsz,
+            "inference_size": inference_size,
+            "render": render,
+            "cache_key": cache_key,
+            "content_sha256": content_sha256
+        }, job_id=video_id, owner=username)
+
+        logger.info(f"Видео {original_filename} поставлено в очередь обработки, задача: {job_id}")
+        response = {
+            "job_id": job_id,
+            "status": "pending",
+            "video_url": video_filename,
+            "status_url": f"/jobs/{job_id}"
+        }
+        if alert is not None:
+            response["alert"] = alert
+        return jsonify(response), 202
+
+    except QueueFullError as qe:
+        _discard_upload(workspace)
+        if video_id:
+            db_manager.update_video_status(video_id, 'failed')
+        api_errors_total.labels(endpoint='/predict', error_type='queue_full').inc()
+        return jsonify({"error": str(qe)}), 503
+
     except Exception as e:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        _discard_upload(workspace)
        
         logger.error(f"Ошибка в /predict: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": "Произошла ошибка при обработке видео. Пожалуйста, попробуйте снова или используйте другой файл."}), 500
 
 
+def _load_upload_session(upload_id, user_id):
+    """Возобновляемая загрузка пользователя или None"""
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        return None
+    return db_manager.get_upload_session(upload_id, user_id)
+
+
+def _upload_flow(session):
+    """Модуль завершения и отмены загрузки: частями через API или по временной ссылке"""
+    return presigned if session.get('upload_type') == 'presigned' else resumable
+
+
+def _submit_stored_upload(session, username, user_id):
+    """
+    Регистрация видео, собранного из частей, и постановка его в очередь обработки
+
+    Задачу ставит только запрос, привязавший видео к загрузке условным UPDATE:
+    параллельные запросы завершения той же загрузки не ставят ее повторно.
+
+    :raises QueueFullError: Очередь заполнена (загрузку можно завершить повторно)
+    :return: Идентификатор задачи и имя видео результата; None, если задачу ставит другой запрос
+    """
+    options = session.get('options') or {}
+    video_filename = video_processing.build_output_filename(session['filename'], username)
+    video_id, error = db_manager.save_video_metadata(
+        user_id,
+        video_filename,
+        storage.video_bucket,
+        {
+            "username": username,
+            "original_filename": session['filename'],
+            "submitted_date": datetime.now().isoformat(),
+            "upload_id": str(session['upload_id']),
+            "size": session['total_size'],
+            "progress": 0.0
+        }
+    )
+    if error:
+        raise RuntimeError(f"Ошибка при регистрации видео: {error}")
+    claimed, error = db_manager.claim_upload_video(session['upload_id'], video_id)
+    if not claimed:
+        db_manager.discard_video(video_id)
+        if error:
+            raise RuntimeError(f"Ошибка при регистрации видео: {error}")
+        return None
+
+    try:
+        job_id = job_queue.submit({
+            "source_object": session['s3_key'],
+            "username": username,
+            "user_id": user_id,
+            "video_id": video_id,
+            "video_filename": video_filename,
+            "original_filename": session['filename'],
+            "confidence_threshold": PREDICT_CONFIDENCE_THRESHOLD,
+            "imgsz": options.get('imgsz'),
+            "render": options.get('render', True)
+        }, job_id=video_id, owner=username)
+    except QueueFullError:
+        # Запись видео удаляется вместе с привязкой: повторное завершение создаст новую
+        db_manager.discard_video(video_id)
+        raise
+    return job_id, video_filename
+
+
+def _submitted_upload_response(session):
+    """Ответ на завершение загрузки, видео которой уже поставлено в очередь"""
+    job_id = str(session['video_id'])
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 200
+
+
+@bp.route("/uploads", methods=["POST"])
+@token_required
+def start_resumable_upload():
+    """
+    Начало возобновляемой загрузки видео частями
+
+    Тело JSON: filename, size (байты), необязательные imgsz и render. В ответе -
+    идентификатор загрузки, размер и число частей.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Загрузка частями требует токена с идентификатором пользователя"}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        imgsz, render = _parse_processing_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        session = resumable.start_upload(
+            storage, db_manager, user_id, str(data.get("filename") or ""), data.get("size"),
+            {"imgsz": imgsz, "render": render}
+        )
+    except UploadRejected as e:
+        logger.warning(f"Загрузка частями отклонена: {e}")
+        return jsonify({"error": str(e)}), e.status
+
+    logger.info(f"Начата загрузка частями {session['upload_id']} пользователя {username}: {session['filename']}, {session['total_size']} байт")
+    response = resumable.describe(session)
+    response["part_url"] = f"/uploads/{session['upload_id']}/parts/{{part_number}}"
+    return jsonify(response), 201
+
+
+@bp.route("/uploads/presigned", methods=["POST"])
+@token_required
+def start_presigned_upload():
+    """
+    Временная ссылка для загрузки видео клиентом напрямую в MinIO
+
+    Тело JSON: filename, size (байты), необязательные imgsz и render. Клиент
+    загружает файл запросом PUT по upload_url, затем вызывает complete_url.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Загрузка по ссылке требует токена с идентификатором пользователя"}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        imgsz, render = _parse_processing_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    start_time = time.time()
+    try:
+        session, url, expires_at = presigned.start_upload(
+            storage, db_manager, user_id, str(data.get("filename") or ""), data.get("size"),
+            {"imgsz": imgsz, "render": render}
+        )
+    except UploadRejected as e:
+        logger.warning(f"Загрузка по ссылке отклонена: {e}")
+        return jsonify({"error": str(e)}), e.status
+    minio_operation_latency.labels(operation_type='get_presigned_upload_url').observe(time.time() - start_time)
+
+    logger.info(f"Выдана ссылка для загрузки {session['upload_id']} пользователю {username}: {session['filename']}")
+    response = resumable.describe(session)
+    response.update(
+        upload_url=url,
+        method="PUT",
+        expires_at=expires_at.isoformat(timespec='seconds'),
+        complete_url=f"/uploads/{session['upload_id']}/complete"
+    )
+    return jsonify(response), 201
+
+
+@bp.route("/uploads/<upload_id>", methods=["GET"])
+@token_required
+def get_resumable_upload(upload_id):
+    """Состояние загрузки: полученные и недостающие части (для продолжения после обрыва)"""
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    session = _load_upload_session(upload_id, user_data.get("user_id"))
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(resumable.describe(session)), 200
+
+
+@bp.route("/uploads/<upload_id>/parts/<int:part_number>", methods=["PUT"])
+@token_required
+def put_resumable_upload_part(upload_id, part_number):
+    """Загрузка части: тело запроса - байты части (повторная отправка заменяет часть)"""
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    session = _load_upload_session(upload_id, user_data.get("user_id"))
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+
+    # Размер части проверяется до чтения тела: в памяти не больше одной части
+    if request.content_length is None:
+        return jsonify({"error": "Требуется заголовок Content-Length"}), 411
+    if request.content_length > session['part_size']:
+        return jsonify({"error": f"Часть больше размера части загрузки ({session['part_size']} байт)"}), 413
+
+    try:
+        etag = resumable.store_part(storage, db_manager, session, part_number, request.get_data(cache=False))
+    except UploadRejected as e:
+        logger.warning(f"Часть {part_number} загрузки {upload_id} отклонена: {e}")
+        return jsonify({"error": str(e)}), e.status
+    return jsonify({"upload_id": upload_id, "part_number": part_number, "etag": etag}), 200
+
+
+@bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+@token_required
+def complete_resumable_upload(upload_id):
+    """
+    Завершение загрузки и постановка видео в очередь обработки
+
+    Для загрузки частями объект собирается из частей, для загрузки по ссылке -
+    проверяется загруженный клиентом объект.
+
+    Повторный вызов для завершенной загрузки возвращает ту же задачу.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+    session = _load_upload_session(upload_id, user_id)
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+
+    if session['status'] == 'completed' and session.get('video_id'):
+        return _submitted_upload_response(session)
+
+    try:
+        if session['status'] != 'completed':
+            _upload_flow(session).complete_upload(storage, db_manager, session)
+        # Объект собран, но задача еще не поставлена (например, очередь была заполнена)
+        submitted = _submit_stored_upload(session, username, user_id)
+        if submitted is None:
+            # Задачу поставил параллельный запрос завершения
+            session = _load_upload_session(upload_id, user_id)
+            if session and session.get('video_id'):
+                return _submitted_upload_response(session)
+            return jsonify({"error": "Загрузка завершается другим запросом, повторите попытку"}), 409
+        job_id, video_filename = submitted
+    except UploadRejected as e:
+        logger.warning(f"Завершение загрузки {upload_id} отклонено: {e}")
+        return jsonify({"error": str(e)}), e.status
+    except QueueFullError as qe:
+        api_errors_total.labels(endpoint='/uploads/complete', error_type='queue_full').inc()
+        return jsonify({"error": str(qe)}), 503
+    except Exception as e:
+        logger.error(f"Ошибка при завершении загрузки {upload_id}: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": "Произошла ошибка при завершении загрузки. Повторите попытку."}), 500
+
+    logger.info(f"Загрузка {upload_id} собрана, видео поставлено в очередь обработки, задача: {job_id}")
+    return jsonify({
+        "job_id": job_id,
+        "status": "pending",
+        "video_url": video_filename,
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+
+@bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@token_required
+def abort_resumable_upload(upload_id):
+    """Отмена загрузки: загруженные части (или объект, загруженный по ссылке) удаляются из хранилища"""
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    session = _load_upload_session(upload_id, user_data.get("user_id"))
+    if not session:
+        return jsonify({"error": "Upload not found"}), 404
+
+    try:
+        _upload_flow(session).abort_upload(storage, db_manager, session)
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    return jsonify({"upload_id": upload_id, "status": "aborted"}), 200
+
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job_status(job_id):
+    """Получение статуса и прогресса задачи обработки видео"""
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    # Задача выполняется (или выполнялась) в этом процессе: отдаем полное состояние из памяти
+    job = job_queue.get_job(job_id)
+    if job:
+        if job['owner'] != username:
+            return jsonify({"error": "Unauthorized"}), 401
+        response = {
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "progress": job['progress'],
+            "submitted_at": job['submitted_at'],
+            "started_at": job['started_at'],
+            "finished_at": job['finished_at']
+        }
+        if job['status'] == 'completed' and job['result']:
+            response.update(job['result'])
+            if 'detections' in response and _expand_requested():
+                response["frame_objects"] = detection_log.expand(response.pop('detections'))
+        if job['status'] == 'failed':
+            response["error"] = "Произошла ошибка при обработке видео. Пожалуйста, попробуйте снова или используйте другой файл."
+        return jsonify(response), 200
+
+    # Задачу обрабатывает другой процесс: статус берем из БД
+    if user_id:
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return jsonify({"error": "Job not found"}), 404
+
+        video = db_manager.get_video_by_id(job_id)
+        if video:
+            if str(video['user_id']) != user_id:
+                return jsonify({"error": "Unauthorized"}), 401
+            metadata = video.get('metadata') or {}
+            progress = 1.0 if video['status'] == 'completed' else metadata.get('progress', 0.0)
+            response = {
+                "job_id": job_id,
+                "status": video['status'],
+                "progress": progress,
+                "video_url": video['s3_key']
+            }
+            if 'alert' in metadata:
+                response["alert"] = metadata['alert']
+            return jsonify(response), 200
+
+    return jsonify({"error": "Job not found"}), 404
+
+
 @bp.route("/video/<path:filename>")
 @token_required
 def serve_video(filename):
@@ -516,6 +1135,7 @@ def get_videos():
 @bp.route("/videos/<filename>/logs", methods=["GET"])
 @token_required
 def get_video_logs(filename):
+    """Лог обнаружений видео в формате хранения; ?expand=true - списком [кадр, оружие, нож]"""
     token = request.headers.get("Authorization").split(" ")[1]
     user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
     username = user_data["user"]
@@ -525,31 +1145,140 @@ def get_video_logs(filename):
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
+        video_data = None
         if user_id:
             video_data = db_manager.get_video_by_s3_key(filename)
-            if video_data:
-                if str(video_data['user_id']) != user_id:
-                    return jsonify({"error": "Unauthorized"}), 401
-                
-                detection_results = db_manager.get_video_detections(video_data['video_id'])
-                if detection_results:
-                    if storage.object_exists(detection_results['bucket_name'], detection_results['s3_key']):
-                        logs = storage.get_log_from_bucket(detection_results['bucket_name'], detection_results['s3_key'])
-                        if logs:
-                            print(logs)
-                            return jsonify(logs)
-        
-        logs = storage.get_log(f"{filename}.json")
+            if video_data and str(video_data['user_id']) != user_id:
+                return jsonify({"error": "Unauthorized"}), 401
+
+        logs = _load_video_log(filename, video_data)
         
         if logs is None:
             return jsonify({"error": "Logs not found"}), 404
             
-        return jsonify(logs)
+        return jsonify(detection_log.expand(logs) if _expand_requested() else logs)
     except Exception as e:
         logger.error(f"Ошибка при получении логов видео: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route("/videos/<filename>/detections", methods=["GET"])
+@token_required
+def get_video_detections(filename):
+    """
+    Все обнаружения видео (кадр, время, класс, уверенность, рамка) в колоночном виде
+
+    ?start=&end= - интервал времени в секундах, ?class= - классы (можно несколько
+    или через запятую), ?conf= - порог уверенности. Из хранилища читаются только
+    нужные блоки файла обнаружений.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    if not filename.startswith(f"{username}_"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        start = request.args.get("start", type=float)
+        end = request.args.get("end", type=float)
+        conf = request.args.get("conf", type=float)
+        if "start" in request.args and start is None or "end" in request.args and end is None:
+            return jsonify({"error": "start and end must be numbers of seconds"}), 400
+        if "conf" in request.args and conf is None:
+            return jsonify({"error": "conf must be a number"}), 400
+        classes = [name.strip() for value in request.args.getlist("class") for name in value.split(",") if name.strip()]
+
+        if user_id:
+            video_data = db_manager.get_video_by_s3_key(filename)
+            if video_data and str(video_data['user_id']) != user_id:
+                return jsonify({"error": "Unauthorized"}), 401
+
+        try:
+            reader = DetectionReader.from_storage(storage, storage.log_bucket, detections_object_name(filename))
+        except FileNotFoundError:
+            return jsonify({"error": "Detections not found"}), 404
+
+        columns = reader.read_window(start, end, classes or None, conf)
+        fps = reader.fps or 1.0
+        return jsonify({
+            "fps": reader.fps,
+            "min_conf": reader.min_score,
+            "rows": len(columns["frame"]),
+            "frame": columns["frame"].tolist(),
+            "time": [round(frame / fps, 3) for frame in columns["frame"].tolist()],
+            "class": [reader.class_names.get(int(cls), str(cls)) for cls in columns["cls"].tolist()],
+            "score": [round(score, 4) for score in columns["score"].tolist()],
+            "xyxy": [[round(value, 1) for value in box] for box in columns["xyxy"].tolist()],
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении обнаружений видео: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/videos/<filename>/reevaluate", methods=["GET"])
+@token_required
+def reevaluate_video(filename):
+    """
+    Результат обработки при другом пороге уверенности (?conf=) без повторного инференса
+
+    Лог обнаружений, счетчики объектов и weapon_detected пересчитываются по файлу
+    обнаружений, сохраненному с нижним порогом; результат не сохраняется.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    if not filename.startswith(f"{username}_"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    conf = request.args.get("conf", type=float)
+    if conf is None or not 0 < conf <= 1:
+        return jsonify({"error": "conf must be a number in (0, 1]"}), 400
+
+    try:
+        video_data = None
+        if user_id:
+            video_data = db_manager.get_video_by_s3_key(filename)
+            if video_data and str(video_data['user_id']) != user_id:
+                return jsonify({"error": "Unauthorized"}), 401
+
+        try:
+            reader = DetectionReader.from_storage(storage, storage.log_bucket, detections_object_name(filename))
+        except FileNotFoundError:
+            return jsonify({"error": "Detections not found"}), 404
+        if reader.min_score is not None and conf < reader.min_score:
+            return jsonify({
+                "error": f"Detections are stored with conf >= {reader.min_score}; a lower threshold requires reprocessing"
+            }), 400
+
+        log = _load_video_log(filename, video_data)
+        if not detection_log.is_valid(log):
+            return jsonify({"error": "Logs not found"}), 404
+
+        started = time.perf_counter()
+        frame_objects, counters = evaluate_threshold(
+            reader.read(min_score=conf), reader.class_names, detection_log.sampled_frames(log), conf
+        )
+        total_frames = log.get("total_frames") if detection_log.is_compact(log) else None
+        reevaluated = detection_log.encode(frame_objects, reader.fps, total_frames)
+        threshold_reevaluation_seconds.observe(time.perf_counter() - started)
+
+        return jsonify(_with_detections({
+            "conf": conf,
+            "min_conf": reader.min_score,
+            "fps": reader.fps,
+            "weapon_detected": counters["weapon"] > 0 or counters["knife"] > 0,
+            "counters": counters,
+            "summary": reevaluated["summary"],
+        }, reevaluated))
+    except Exception as e:
+        logger.error(f"Ошибка при пересчете результата видео: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.route("/videos/<filename>", methods=["DELETE"])
 @token_required
 def delete_video_route(filename):
@@ -587,7 +1316,7 @@ def delete_video_route(filename):
             
             # Измеряем время операции с MinIO
             minio_start = time.time()
-            success = storage.delete_objects(filename, f"{filename}.json")
+            success = storage.delete_objects(filename, f"{filename}.json", detections_object_name(filename))
             minio_operation_latency.labels(operation_type='delete_objects').observe(time.time() - minio_start)
                 
             if not success and not deleted_from_db:
@@ -678,6 +1407,13 @@ def update_video(filename):
             minio_start = time.time()
             storage.rename_object(storage.log_bucket, f"{filename}.json", f"{new_filename}.json")
             minio_operation_latency.labels(operation_type='rename_object').observe(time.time() - minio_start)
+
+            # Файл обнаружений лежит рядом с логом и переименовывается вместе с ним
+            minio_start = time.time()
+            storage.rename_object(
+                storage.log_bucket, detections_object_name(filename), detections_object_name(new_filename)
+            )
+            minio_operation_latency.labels(operation_type='rename_object').observe(time.time() - minio_start)
             
             # Инкрементируем счетчик успешных операций переименования
             video_operations_total.labels(operation_type='rename', status='success').inc()
@@ -700,3 +1436,12 @@ def update_video(filename):
 @bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"}), 200
+
+
+@bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """Готовность к приему запросов: БД, хранилище и модель инициализированы"""
+    from app.services.startup import startup
+
+    status = startup.status()
+    return jsonify(status), 200 if status['ready'] else 503
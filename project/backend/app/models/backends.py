@@ -0,0 +1,165 @@
+"""
+Бэкенды инференса модели на CPU
+
+Модель может выполняться через PyTorch (.pt), ONNX Runtime (.onnx) или
+OpenVINO IR (каталог *_openvino_model). Все форматы загружаются классом YOLO
+из ultralytics, поэтому результат инференса одинаков для process_video.
+
+Бэкенд выбирается переменной MODEL_BACKEND (torch, onnx, openvino) или, при
+MODEL_BACKEND=auto, по расширению MODEL_PATH. Если MODEL_PATH указывает на .pt,
+а выбран другой бэкенд, используется экспортированная рядом с весами модель;
+при ее отсутствии выполняется экспорт.
+
+Точность задается переменной MODEL_PRECISION: fp32 (по умолчанию), int8-dynamic
+или int8-static (см. quantization.py). INT8 выполняется только через ONNX Runtime.
+Вариант модели (бэкенд и точность, например onnx-int8-static) сохраняется
+вместе с результатами обнаружения.
+"""
+import fcntl
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+PRECISIONS = ('fp32', 'int8-dynamic', 'int8-static')
+
+# Размер входа модели при экспорте
+EXPORT_IMGSZ = int(os.environ.get("MODEL_EXPORT_IMGSZ", 640))
+
+
+def detect_backend(model_path):
+    """Бэкенд по пути к модели"""
+    path = model_path.rstrip(os.sep)
+    if path.endswith('.onnx'):
+        return 'onnx'
+    if path.endswith('_openvino_model') or path.endswith('.xml'):
+        return 'openvino'
+    return 'torch'
+
+
+def detect_precision(model_path):
+    """Точность по имени файла модели (квантованные модели имеют суффикс .int8-<режим>.onnx)"""
+    for precision in PRECISIONS[1:]:
+        if model_path.endswith(f".{precision}.onnx"):
+            return precision
+    return 'fp32'
+
+
+def variant_name(backend, precision='fp32'):
+    """Имя варианта модели: бэкенд и, для квантованных моделей, точность"""
+    return backend if precision == 'fp32' else f"{backend}-{precision}"
+
+
+def parse_variant(variant):
+    """Разбор имени варианта модели на (бэкенд, точность)"""
+    backend, _, precision = variant.partition('-')
+    return backend, precision or 'fp32'
+
+
+def artifact_path(weights_path, backend):
+    """Путь, по которому ultralytics сохраняет модель, экспортированную из weights_path"""
+    stem, _ = os.path.splitext(weights_path)
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    return weights_path
+
+
+def export_model(weights_path, backend, imgsz=EXPORT_IMGSZ):
+    """
+    Экспорт весов PyTorch в формат бэкенда
+
+    Экспорт выполняется под файловой блокировкой: воркеры, стартующие
+    одновременно, не экспортируют модель повторно.
+
+    :return: Путь к экспортированной модели
+    """
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд модели: {backend}")
+    target = artifact_path(weights_path, backend)
+    if backend == 'torch':
+        return target
+
+    with open(f"{target}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(target):
+                logger.info(f"Экспорт модели {weights_path} в формат {backend}")
+                # Динамические оси нужны для инференса пакетами кадров
+                exported = YOLO(weights_path).export(format=backend, imgsz=imgsz, dynamic=True)
+                if os.path.abspath(exported) != os.path.abspath(target):
+                    os.replace(exported, target)
+                logger.info(f"Модель экспортирована: {target}")
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return target
+
+
+def resolve_model(model_path, backend='auto'):
+    """
+    Выбор бэкенда и файла модели
+
+    :param model_path: Путь из MODEL_PATH
+    :param backend: 'auto' или один из BACKENDS
+    :return: (бэкенд, путь к модели для загрузки)
+    """
+    path_backend = detect_backend(model_path)
+    if not backend or backend == 'auto':
+        return path_backend, model_path
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд модели: {backend}")
+    if backend == path_backend:
+        return backend, model_path
+    if path_backend != 'torch':
+        raise ValueError(f"Модель {model_path} нельзя выполнить бэкендом {backend}: нужны веса .pt")
+
+    target = artifact_path(model_path, backend)
+    if not os.path.exists(target):
+        target = export_model(model_path, backend)
+    return backend, target
+
+
+def resolve_variant(model_path, backend='auto', precision='fp32', calibration_dir=None):
+    """
+    Выбор файла модели с учетом точности
+
+    Квантованная модель строится из модели ONNX при первом запуске, если ее
+    еще нет рядом с весами.
+
+    :return: (имя варианта, путь к модели для загрузки)
+    """
+    from app.models.quantization import quantize_model, quantized_path
+
+    precision = precision or 'fp32'
+    if precision not in PRECISIONS:
+        raise ValueError(f"Неизвестная точность модели: {precision}")
+
+    if precision == 'fp32' or detect_precision(model_path) == precision:
+        backend, path = resolve_model(model_path, backend)
+        return variant_name(backend, detect_precision(path)), path
+
+    if backend not in ('auto', 'onnx', None, ''):
+        raise ValueError(f"Точность {precision} поддерживается только бэкендом onnx")
+    _, onnx_path = resolve_model(model_path, 'onnx')
+    mode = precision.split('-', 1)[1]
+    target = quantized_path(onnx_path, mode)
+
+    with open(f"{target}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(target):
+                target = quantize_model(onnx_path, mode, calibration_dir=calibration_dir, imgsz=EXPORT_IMGSZ)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return variant_name('onnx', precision), target
@@ -0,0 +1,228 @@
+"""
+Сравнение вариантов модели на эталонном видео
+
+Для каждого варианта (бэкенд и точность, например onnx или onnx-int8-static)
+измеряется скорость инференса (кадров в секунду), размер модели и совпадение
+обнаружений с моделью PyTorch (.pt), которая считается эталоном.
+
+Запуск:
+    python -m app.models.benchmark --clip reference.mp4 --backends torch onnx openvino
+    python -m app.models.benchmark --clip reference.mp4 --backends onnx onnx-int8-dynamic onnx-int8-static \
+        --calibration-dir frames/
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+
+def read_frames(clip_path, max_frames=200, stride=1):
+    """Чтение каждого stride-го кадра видео, не более max_frames кадров"""
+    cap = cv2.VideoCapture(clip_path)
+    if not cap.isOpened():
+        raise ValueError(f"Не удалось открыть видео: {clip_path}")
+
+    frames = []
+    index = 0
+    try:
+        while len(frames) < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if index % stride == 0:
+                frames.append(frame)
+            index += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def box_iou(boxes_a, boxes_b):
+    """Матрица IoU между двумя наборами рамок xyxy"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+def compare_detections(reference, candidate, class_names, iou_threshold=0.5):
+    """
+    Сравнение обнаружений кандидата с эталоном по кадрам
+
+    Рамки сопоставляются жадно по убыванию IoU внутри одного класса.
+
+    :param reference: Список Detections эталонной модели
+    :param candidate: Список Detections сравниваемой модели (для тех же кадров)
+    :param class_names: Словарь {id класса: имя класса}
+    :return: Словарь с числом рамок по классам, числом совпавших рамок,
+        средним IoU совпавших рамок и долей кадров, в которых совпадает
+        наличие каждого класса (именно это сохраняет process_video)
+    """
+    per_class = {
+        name: {'reference': 0, 'candidate': 0, 'matched': 0, 'frames_agree': 0}
+        for name in class_names.values()
+    }
+    ious = []
+
+    for ref, cand in zip(reference, candidate):
+        for class_id, name in class_names.items():
+            ref_boxes = ref.xyxy[ref.cls == class_id]
+            cand_boxes = cand.xyxy[cand.cls == class_id]
+            stats = per_class[name]
+            stats['reference'] += len(ref_boxes)
+            stats['candidate'] += len(cand_boxes)
+            if (len(ref_boxes) > 0) == (len(cand_boxes) > 0):
+                stats['frames_agree'] += 1
+
+            iou = box_iou(ref_boxes, cand_boxes)
+            while iou.size and iou.max() >= iou_threshold:
+                i, j = np.unravel_index(np.argmax(iou), iou.shape)
+                ious.append(float(iou[i, j]))
+                stats['matched'] += 1
+                iou[i, :] = 0
+                iou[:, j] = 0
+
+    frames = max(len(reference), 1)
+    for stats in per_class.values():
+        stats['frame_agreement'] = round(stats.pop('frames_agree') / frames, 4)
+        stats['recall'] = round(stats['matched'] / stats['reference'], 4) if stats['reference'] else None
+        stats['precision'] = round(stats['matched'] / stats['candidate'], 4) if stats['candidate'] else None
+
+    return {
+        'classes': per_class,
+        'mean_iou': round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def measure(yolo, frames, batch_size=8, conf=0.25, warmup=1):
+    """
+    Прогон кадров через модель пакетами
+
+    :return: (кадров в секунду, список Detections)
+    """
+    from app.models.model import run_model
+
+    for _ in range(warmup):
+        run_model(yolo, frames[:batch_size], conf=conf)
+
+    detections = []
+    started = time.perf_counter()
+    for start in range(0, len(frames), batch_size):
+        detections.extend(run_model(yolo, frames[start:start + batch_size], conf=conf))
+    elapsed = time.perf_counter() - started
+    return len(frames) / elapsed if elapsed > 0 else 0.0, detections
+
+
+def model_size_mb(path):
+    """Размер файла или каталога модели в мегабайтах"""
+    if os.path.isdir(path):
+        size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    else:
+        size = os.path.getsize(path)
+    return round(size / (1024 * 1024), 2)
+
+
+def load_variant(weights_path, variant, calibration_dir=None):
+    """
+    Загрузка варианта модели
+
+    :return: (модель YOLO, путь к файлу модели)
+    """
+    from ultralytics import YOLO
+    from app.models.backends import parse_variant, resolve_variant
+
+    backend, precision = parse_variant(variant)
+    _, path = resolve_variant(weights_path, backend, precision, calibration_dir)
+    return YOLO(path, task='detect'), path
+
+
+def run_benchmark(clip_path, weights_path, backends, max_frames=200, stride=1, batch_size=8, conf=0.25, calibration_dir=None):
+    """
+    Сравнение вариантов модели на видео
+
+    Эталоном служит модель PyTorch; она прогоняется первой, даже если не указана в backends.
+
+    :param backends: Имена вариантов: torch, onnx, openvino, onnx-int8-dynamic, onnx-int8-static
+    :return: Словарь {вариант: {'fps', 'speedup', 'model_size_mb', 'parity'}}
+    """
+    frames = read_frames(clip_path, max_frames=max_frames, stride=stride)
+    if not frames:
+        raise ValueError(f"В видео нет кадров: {clip_path}")
+
+    reference_model, reference_path = load_variant(weights_path, 'torch')
+    class_names = reference_model.names
+    reference_fps, reference = measure(reference_model, frames, batch_size=batch_size, conf=conf)
+
+    report = {}
+    for backend in backends:
+        if backend == 'torch':
+            fps, detections, path = reference_fps, reference, reference_path
+        else:
+            yolo, path = load_variant(weights_path, backend, calibration_dir)
+            fps, detections = measure(yolo, frames, batch_size=batch_size, conf=conf)
+        report[backend] = {
+            'fps': round(fps, 2),
+            'speedup': round(fps / reference_fps, 2) if reference_fps else None,
+            'model_size_mb': model_size_mb(path),
+            'parity': compare_detections(reference, detections, class_names),
+        }
+    return report
+
+
+def format_report(report):
+    lines = [f"{'вариант':<20}{'кадр/с':>10}{'ускорение':>12}{'МБ':>8}{'IoU':>8}  совпадение по кадрам"]
+    for backend, values in report.items():
+        parity = values['parity']
+        # Классы, которых нет ни у одной модели, в таблицу не попадают
+        agreement = ", ".join(
+            f"{name}={stats['frame_agreement']:.3f}"
+            for name, stats in parity['classes'].items()
+            if stats['reference'] or stats['candidate']
+        ) or "нет обнаружений"
+        mean_iou = f"{parity['mean_iou']:.3f}" if parity['mean_iou'] is not None else "-"
+        lines.append(
+            f"{backend:<20}{values['fps']:>10.2f}{values['speedup']:>12.2f}"
+            f"{values['model_size_mb']:>8.1f}{mean_iou:>8}  {agreement}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение вариантов модели на эталонном видео")
+    parser.add_argument("--clip", required=True, help="Эталонное видео")
+    parser.add_argument("--model", default=os.environ.get("MODEL_PATH", "app/utils/yolov8nv2_e200_bs16.pt"), help="Веса .pt")
+    parser.add_argument("--backends", nargs="+", default=['torch', 'onnx'], help="Варианты модели для сравнения")
+    parser.add_argument("--calibration-dir", default=os.environ.get("MODEL_CALIBRATION_DIR"), help="Кадры для калибровки INT8 (static)")
+    parser.add_argument("--frames", type=int, default=200, help="Максимальное число кадров")
+    parser.add_argument("--stride", type=int, default=1, help="Брать каждый stride-й кадр")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true", help="Вывести отчет в JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.clip,
+        args.model,
+        args.backends,
+        max_frames=args.frames,
+        stride=args.stride,
+        batch_size=args.batch_size,
+        conf=args.conf,
+        calibration_dir=args.calibration_dir,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
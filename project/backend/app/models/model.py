@@ -1,22 +1,237 @@
+import hashlib
 import os
-from ultralytics import YOLO
+import threading
+import time
+from collections import namedtuple
+import numpy as np
 import logging
+from app.services.tuning import tuning
 
 logger = logging.getLogger(__name__)
 
 
+# Если задан сокет сервера инференса, модель в процессе не загружается
+INFERENCE_SERVER_SOCKET = os.environ.get("INFERENCE_SERVER_SOCKET")
+
+# Бэкенд инференса: auto (по расширению MODEL_PATH), torch, onnx, openvino
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "auto")
+# Точность: fp32, int8-dynamic, int8-static (калибровка по MODEL_CALIBRATION_DIR)
+MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp32")
+MODEL_CALIBRATION_DIR = os.environ.get("MODEL_CALIBRATION_DIR")
+
+# Объединение кадров параллельных задач в общие пакеты инференса (см. BatchScheduler)
+INFERENCE_BATCHING = os.environ.get("INFERENCE_BATCHING", "true").lower() == "true"
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", 16))
+INFERENCE_MAX_WAIT = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 10)) / 1000
+
 model_path = os.environ.get("MODEL_PATH", "app/utils/yolov8nv2_e200_bs16.pt")
 
 
 absolute_model_path = os.path.join(os.getcwd(), model_path)
 
+# Модель загружается при первом обращении (или задачей прогрева при старте приложения),
+# а не при импорте: импорт torch и чтение весов занимают секунды
+_load_lock = threading.Lock()
+_loaded = False
+
+# Длительность этапов загрузки модели, секунды
+load_timings = {}
+
+
+def YOLO(*args, **kwargs):
+    """Создание модели ultralytics; импорт ultralytics и torch откладывается до первого вызова"""
+    from ultralytics import YOLO as UltralyticsYOLO
+    return UltralyticsYOLO(*args, **kwargs)
+
+
+def _file_digest(path):
+    """SHA-256 файла модели или всех файлов каталога модели"""
+    digest = hashlib.sha256()
+    paths = [path]
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    for item in paths:
+        with open(item, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_model():
+    """
+    Загрузка модели или подключение к серверу инференса
+
+    Безопасна для вызова из нескольких потоков: загрузка выполняется один раз.
+    """
+    global model, model_variant, model_version, model_file, inference_client, _loaded
+
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+
+        if INFERENCE_SERVER_SOCKET:
+            # Кадры отправляются серверу (см. app/services/inference), модель в процессе не нужна
+            from app.services.inference.client import InferenceClient
+            from app.services.inference.server import INFERENCE_SERVER_AUTHKEY
+
+            model = None
+            model_variant = None
+            model_version = None
+            model_file = None
+            inference_client = InferenceClient(INFERENCE_SERVER_SOCKET, INFERENCE_SERVER_AUTHKEY)
+            logger.info(f"Инференс выполняется сервером: {INFERENCE_SERVER_SOCKET}")
+        else:
+            from app.models.backends import resolve_variant
+
+            if not os.path.exists(absolute_model_path):
+                raise FileNotFoundError(f"Модель не найдена по пути: {absolute_model_path}")
+
+            started = time.perf_counter()
+            import ultralytics  # noqa: F401 - отдельно измеряется время импорта torch
+            load_timings['import_ultralytics'] = time.perf_counter() - started
+            tuning.configure_torch()
+
+            started = time.perf_counter()
+            model_variant, model_file = resolve_variant(
+                absolute_model_path, MODEL_BACKEND, MODEL_PRECISION, MODEL_CALIBRATION_DIR
+            )
+            # Версия модели: вариант и хеш исходных весов (используется в ключе кэша результатов)
+            model_version = f"{model_variant}:{_file_digest(absolute_model_path)[:16]}"
+            load_timings['resolve_model'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            # task указывается явно: у экспортированных моделей он не всегда определяется по файлу
+            model = YOLO(model_file, task='detect')
+            load_timings['load_weights'] = time.perf_counter() - started
+            inference_client = None
+            logger.info(f"Модель загружена: {model_file} (вариант {model_variant})")
+
+        _loaded = True
+
+
+def __getattr__(name):
+    # Атрибуты модели модуля (model, model_variant, ...) загружают модель при первом обращении
+    if name in ('model', 'model_variant', 'model_version', 'model_file', 'inference_client'):
+        load_model()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Предиктор ultralytics хранит состояние (аргументы, каталог сохранения) в объекте модели,
+# поэтому без планировщика пакетов фоновые потоки обработки получают собственные экземпляры
+_thread_models = threading.local()
+_scheduler = None
+
+
+def get_model():
+    """Экземпляр модели для текущего потока"""
+    load_model()
+    if threading.current_thread() is threading.main_thread():
+        return model
+
+    thread_model = getattr(_thread_models, "model", None)
+    if thread_model is None:
+        thread_model = YOLO(model_file, task='detect')
+        _thread_models.model = thread_model
+        logger.info(f"Модель загружена для потока {threading.current_thread().name}")
+    return thread_model
+
+
+def get_scheduler():
+    """Планировщик пакетов: единственный поток, вызывающий общую модель процесса"""
+    global _scheduler
+
+    load_model()
+    with _load_lock:
+        if _scheduler is None:
+            from app.services.inference.scheduler import BatchScheduler
+
+            _scheduler = BatchScheduler(
+                lambda frames, conf=0.25, **kwargs: run_model(model, frames, conf=conf, **kwargs),
+                max_batch_size=INFERENCE_MAX_BATCH,
+                max_wait=INFERENCE_MAX_WAIT,
+            )
+    return _scheduler
+
+
+# Результат инференса для одного кадра: рамки (N x 4, xyxy в пикселях кадра), уверенность и классы
+Detections = namedtuple("Detections", ["xyxy", "conf", "cls"])
+
+
+def filter_confidence(detections, threshold):
+    """Обнаружения с уверенностью не ниже threshold"""
+    keep = np.asarray(detections.conf) >= threshold
+    if keep.all():
+        return detections
+    return Detections(xyxy=detections.xyxy[keep], conf=detections.conf[keep], cls=detections.cls[keep])
+
+
+def get_class_names():
+    """Словарь {id класса: имя класса} модели"""
+    load_model()
+    if inference_client is not None:
+        return inference_client.get_class_names()
+    return get_model().names
+
+
+def get_model_variant():
+    """Вариант модели (бэкенд и точность), которым выполняется инференс"""
+    load_model()
+    if inference_client is not None:
+        return inference_client.get_model_info()['variant']
+    return model_variant
+
+
+def get_model_version():
+    """Версия модели: вариант и хеш весов; меняется при замене модели или ее варианта"""
+    load_model()
+    if inference_client is not None:
+        return inference_client.get_model_info()['version']
+    return model_version
+
+
+def predict_batch(frames, conf=0.25, **kwargs):
+    """
+    Инференс пакета кадров
 
-if not os.path.exists(absolute_model_path):
-    raise FileNotFoundError(f"Модель не найдена по пути: {absolute_model_path}")
+    :param frames: Список кадров BGR (numpy) одного размера
+    :param conf: Порог уверенности
+    :return: Список Detections, по одному на кадр
+    """
+    load_model()
+    if inference_client is not None:
+        return inference_client.predict_batch(frames, conf=conf, **kwargs)
+    if INFERENCE_BATCHING:
+        return get_scheduler().predict(frames, conf=conf, **kwargs)
+    return run_model(get_model(), frames, conf=conf, **kwargs)
 
 
-model = YOLO(absolute_model_path)
-logger.info(f"Модель загружена: {absolute_model_path}")
+def run_model(yolo, frames, conf=0.25, **kwargs):
+    """Инференс пакета кадров указанным экземпляром модели"""
+    results = yolo.predict(frames, conf=conf, verbose=False, **kwargs)
+    detections = []
+    for result in results:
+        boxes = result.boxes
+        detections.append(Detections(
+            xyxy=boxes.xyxy.cpu().numpy().astype(np.float32),
+            conf=boxes.conf.cpu().numpy().astype(np.float32),
+            cls=boxes.cls.cpu().numpy().astype(np.int32),
+        ))
+    return detections
 
 
+def warmup(batch_size=1, imgsz=640):
+    """
+    Прогрев модели на пакете пустых кадров
 
+    Первый инференс заметно медленнее следующих (инициализация runtime, выделение
+    памяти), поэтому он выполняется при старте, а не на первом запросе пользователя.
+    """
+    load_model()
+    frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8) for _ in range(max(1, batch_size))]
+    started = time.perf_counter()
+    predict_batch(frames)
+    load_timings['warmup'] = time.perf_counter() - started
@@ -0,0 +1,179 @@
+"""
+INT8-квантование модели ONNX для инференса на CPU
+
+Поддерживаются два режима onnxruntime.quantization:
+- dynamic: веса квантуются заранее, активации - во время инференса; калибровка не нужна;
+- static: веса и активации квантуются заранее, диапазоны активаций определяются
+  прогоном модели по каталогу с образцами кадров (калибровка).
+
+Голова детектора (последний модуль YOLO) при статическом квантовании остается в FP32:
+в ней вычисляются координаты рамок, и квантование сильно сдвигает их.
+
+Запуск:
+    python -m app.models.quantization --model weights.pt --mode static --calibration-dir frames/
+"""
+import argparse
+import logging
+import os
+import re
+import cv2
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+QUANTIZATION_MODES = ('dynamic', 'static')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+
+
+def quantized_path(onnx_path, mode):
+    """Путь квантованной модели рядом с исходной моделью ONNX"""
+    stem, _ = os.path.splitext(onnx_path)
+    return f"{stem}.int8-{mode}.onnx"
+
+
+def preprocess(frame, imgsz=640):
+    """
+    Подготовка кадра BGR к подаче в модель так же, как это делает ultralytics:
+    letterbox до imgsz x imgsz с заполнением 114, RGB, NCHW, float32 в диапазоне 0..1
+    """
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - new_height) // 2
+    left = (imgsz - new_width) // 2
+    canvas[top:top + new_height, left:left + new_width] = resized
+
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[None]
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+
+def iter_calibration_frames(calibration_dir, max_samples=64, video_stride=30):
+    """Кадры для калибровки: изображения и каждый video_stride-й кадр видео из каталога"""
+    count = 0
+    for name in sorted(os.listdir(calibration_dir)):
+        path = os.path.join(calibration_dir, name)
+        extension = os.path.splitext(name)[1].lower()
+        if extension in IMAGE_EXTENSIONS:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+                count += 1
+        elif extension in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(path)
+            index = 0
+            try:
+                while count < max_samples:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    if index % video_stride == 0:
+                        yield frame
+                        count += 1
+                    index += 1
+            finally:
+                cap.release()
+        if count >= max_samples:
+            return
+
+
+def _calibration_reader(input_name, calibration_dir, imgsz, max_samples):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        """Источник данных калибровки из каталога кадров"""
+
+        def __init__(self):
+            self._frames = iter_calibration_frames(calibration_dir, max_samples=max_samples)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            return {input_name: preprocess(frame, imgsz)}
+
+    return FrameCalibrationReader()
+
+
+def _detect_head_nodes(onnx_model):
+    """Узлы последнего модуля YOLO (голова детектора) по именам вида /model.22/..."""
+    module_ids = [
+        int(match.group(1))
+        for node in onnx_model.graph.node
+        for match in [re.match(r"/model\.(\d+)/", node.name)]
+        if match
+    ]
+    if not module_ids:
+        return []
+    head = f"/model.{max(module_ids)}/"
+    return [node.name for node in onnx_model.graph.node if node.name.startswith(head)]
+
+
+def quantize_model(onnx_path, mode, calibration_dir=None, imgsz=640, max_samples=64):
+    """
+    Квантование модели ONNX в INT8
+
+    :param onnx_path: Модель ONNX в FP32
+    :param mode: 'dynamic' или 'static'
+    :param calibration_dir: Каталог с изображениями или видео (обязателен для static)
+    :return: Путь к квантованной модели
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Неизвестный режим квантования: {mode}")
+    target = quantized_path(onnx_path, mode)
+
+    if mode == 'dynamic':
+        logger.info(f"Динамическое квантование {onnx_path}")
+        quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+        return target
+
+    if not calibration_dir or not os.path.isdir(calibration_dir):
+        raise ValueError("Для статического квантования нужен каталог с кадрами для калибровки")
+
+    onnx_model = onnx.load(onnx_path)
+    input_name = onnx_model.graph.input[0].name
+    logger.info(f"Статическое квантование {onnx_path}, калибровка по {calibration_dir}")
+    quantize_static(
+        onnx_path,
+        target,
+        _calibration_reader(input_name, calibration_dir, imgsz, max_samples),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=_detect_head_nodes(onnx_model),
+    )
+    return target
+
+
+def main():
+    from app.models.backends import EXPORT_IMGSZ, resolve_model
+
+    parser = argparse.ArgumentParser(description="INT8-квантование модели для инференса на CPU")
+    parser.add_argument("--model", default=os.environ.get("MODEL_PATH", "app/utils/yolov8nv2_e200_bs16.pt"), help="Веса .pt или модель .onnx")
+    parser.add_argument("--mode", choices=QUANTIZATION_MODES, default='static')
+    parser.add_argument("--calibration-dir", default=os.environ.get("MODEL_CALIBRATION_DIR"), help="Каталог с кадрами для калибровки")
+    parser.add_argument("--samples", type=int, default=64, help="Число кадров для калибровки")
+    args = parser.parse_args()
+
+    _, onnx_path = resolve_model(args.model, 'onnx')
+    print(quantize_model(onnx_path, args.mode, args.calibration_dir, imgsz=EXPORT_IMGSZ, max_samples=args.samples))
+
+
+if __name__ == "__main__":
+    main()
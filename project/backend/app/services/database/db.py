@@ -16,6 +16,50 @@ logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
 
+# Изменения схемы для баз, созданных до их появления в 01-init-schema.sql;
+# выполняются при запуске и должны быть идемпотентными
+SCHEMA_UPDATES = [
+    "ALTER TABLE detection_results ADD COLUMN IF NOT EXISTS model_variant VARCHAR(64)",
+    """
+    CREATE TABLE IF NOT EXISTS result_cache (
+        cache_key VARCHAR(64) NOT NULL,
+        user_id UUID NOT NULL,
+        video_id UUID NOT NULL,
+        content_sha256 VARCHAR(64) NOT NULL,
+        model_version VARCHAR(128) NOT NULL,
+        confidence_threshold REAL NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (cache_key, user_id),
+        FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        upload_id UUID PRIMARY KEY,
+        user_id UUID NOT NULL,
+        filename VARCHAR(255) NOT NULL,
+        bucket_name VARCHAR(100) NOT NULL,
+        s3_key VARCHAR(255) NOT NULL,
+        s3_upload_id VARCHAR(255),
+        upload_type VARCHAR(20) NOT NULL DEFAULT 'multipart' CHECK (upload_type IN ('multipart', 'presigned')),
+        total_size BIGINT NOT NULL,
+        part_size BIGINT NOT NULL,
+        parts JSONB NOT NULL DEFAULT '{}',
+        options JSONB,
+        status VARCHAR(20) NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'completed', 'aborted')),
+        video_id UUID,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+        FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE SET NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_upload_sessions_user_id ON upload_sessions (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_upload_sessions_active_created_at ON upload_sessions (created_at) WHERE status = 'active'",
+    "CREATE INDEX IF NOT EXISTS idx_videos_unfinished_upload_time ON videos (upload_time) WHERE status IN ('pending', 'processing')",
+]
+
+
 class DatabaseManager:
     """Класс для управления подключением к базе данных и операциями с ней"""
     
@@ -72,7 +116,12 @@ class DatabaseManager:
             conn.close()
     
     def init_database(self):
-        """Инициализация базы данных при первом запуске"""
+        """
+        Инициализация базы данных при первом запуске
+
+        :return: False, если БД недоступна или изменения схемы не применены
+            (задача запуска повторяется, приложение не готово)
+        """
         logger.info("Проверка соединения с базой данных...")
         conn = self.get_connection()
         if not conn:
@@ -80,7 +129,17 @@ class DatabaseManager:
             return False
         
         logger.info("Соединение с базой данных установлено успешно")
-        conn.close()
+        try:
+            with conn.cursor() as cur:
+                for statement in SCHEMA_UPDATES:
+                    cur.execute(statement)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Ошибка обновления схемы базы данных: {e}")
+            return False
+        finally:
+            conn.close()
         return True
     
     def execute_query(self, query, params=None, fetch=None, cursor_factory=None):
@@ -195,7 +254,260 @@ class DatabaseManager:
         
         logger.info(f"Обновлен статус видео {video_id} на {status}")
         return True, None
-    
+
+    def update_video_metadata(self, video_id, updates):
+        """Дополнение метаданных видео (ключи из updates перезаписывают существующие)"""
+        _, error = self.execute_query(
+            """
+            UPDATE videos
+            SET metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb
+            WHERE video_id = %s
+            """,
+            (json.dumps(updates), video_id),
+            fetch=None
+        )
+
+        if error:
+            return False, error
+
+        return True, None
+
+    def touch_videos(self, video_ids):
+        """Отметка незавершенных задач воркера: время в metadata.heartbeat_at (см. jobs/recovery.py)"""
+        _, error = self.execute_query(
+            """
+            UPDATE videos
+            SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('heartbeat_at', LOCALTIMESTAMP)
+            WHERE video_id = ANY(%s::uuid[]) AND status IN ('pending', 'processing')
+            """,
+            ([str(video_id) for video_id in video_ids],),
+            fetch=None
+        )
+
+        return error is None, error
+
+    def fail_stale_videos(self, stale_after_seconds):
+        """
+        Перевод в статус 'failed' видео, задачи которых никто не отмечал дольше stale_after_seconds
+
+        Видео без отметки сравнивается по времени загрузки.
+
+        :return: (идентификаторы видео, сообщение об ошибке)
+        """
+        result, error = self.execute_query(
+            """
+            UPDATE videos
+            SET status = 'failed',
+                metadata = COALESCE(metadata, '{}'::jsonb) || '{"error": "job_lost"}'::jsonb
+            WHERE status IN ('pending', 'processing')
+              AND COALESCE((metadata->>'heartbeat_at')::timestamp, upload_time)
+                  < LOCALTIMESTAMP - make_interval(secs => %s)
+            RETURNING video_id
+            """,
+            (float(stale_after_seconds),),
+            fetch='all'
+        )
+
+        return [row[0] for row in result or []], error
+
+    def get_video_by_id(self, video_id):
+        """Получение видео по идентификатору"""
+        result, _ = self.execute_query(
+            """
+            SELECT * FROM videos
+            WHERE video_id = %s
+            """,
+            (video_id,),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+
+        return result
+
+    def get_cached_result(self, cache_key, user_id):
+        """
+        Поиск результата обработки в кэше
+
+        :return: Запись с видео (video_id, s3_key, bucket_name, metadata) и логом
+            обнаружений (log_s3_key, log_bucket_name) или None
+        """
+        result, _ = self.execute_query(
+            """
+            SELECT v.video_id, v.s3_key, v.bucket_name, v.metadata,
+                   dr.s3_key AS log_s3_key, dr.bucket_name AS log_bucket_name
+            FROM result_cache rc
+            JOIN videos v ON rc.video_id = v.video_id
+            JOIN detection_results dr ON dr.video_id = v.video_id
+            WHERE rc.cache_key = %s AND rc.user_id = %s AND v.status = 'completed'
+            """,
+            (cache_key, user_id),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+
+        return result
+
+    def save_cached_result(self, cache_key, user_id, video_id, content_sha256, model_version, confidence_threshold):
+        """Сохранение результата обработки в кэше (существующая запись заменяется)"""
+        _, error = self.execute_query(
+            """
+            INSERT INTO result_cache (cache_key, user_id, video_id, content_sha256, model_version, confidence_threshold)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (cache_key, user_id) DO UPDATE
+            SET video_id = EXCLUDED.video_id, created_at = CURRENT_TIMESTAMP
+            """,
+            (cache_key, user_id, video_id, content_sha256, model_version, confidence_threshold),
+            fetch=None
+        )
+
+        return error is None, error
+
+    def delete_cached_result(self, cache_key, user_id):
+        """Удаление записи кэша (например, если объекты в хранилище удалены)"""
+        _, error = self.execute_query(
+            """DELETE FROM result_cache WHERE cache_key = %s AND user_id = %s""",
+            (cache_key, user_id),
+            fetch=None
+        )
+
+        return error is None, error
+
+    def create_upload_session(self, upload_id, user_id, filename, bucket_name, s3_key, s3_upload_id,
+                              total_size, part_size, options=None, upload_type='multipart'):
+        """
+        Регистрация загрузки в бакет загрузок
+
+        :param upload_type: 'multipart' - частями через API, 'presigned' - клиентом по временной ссылке
+            (s3_upload_id не используется)
+        """
+        _, error = self.execute_query(
+            """
+            INSERT INTO upload_sessions
+                (upload_id, user_id, filename, bucket_name, s3_key, s3_upload_id, upload_type, total_size, part_size, options)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (upload_id, user_id, filename, bucket_name, s3_key, s3_upload_id, upload_type, total_size, part_size,
+             json.dumps(options or {})),
+            fetch=None
+        )
+
+        return error is None, error
+
+    def get_upload_session(self, upload_id, user_id):
+        """Загрузка пользователя по идентификатору (parts - словарь {номер части: ETag})"""
+        result, _ = self.execute_query(
+            """
+            SELECT * FROM upload_sessions
+            WHERE upload_id = %s AND user_id = %s
+            """,
+            (upload_id, user_id),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+
+        return result
+
+    def get_expired_upload_sessions(self, upload_type, max_age_hours):
+        """Незавершенные загрузки типа upload_type, начатые больше max_age_hours часов назад"""
+        result, error = self.execute_query(
+            """
+            SELECT * FROM upload_sessions
+            WHERE status = 'active' AND upload_type = %s
+              AND created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+            ORDER BY created_at
+            """,
+            (upload_type, float(max_age_hours) * 3600),
+            fetch='all',
+            cursor_factory=RealDictCursor
+        )
+
+        return result or [], error
+
+    def save_upload_part(self, upload_id, part_number, etag):
+        """
+        Отметка о загруженной части
+
+        Части приходят параллельно, поэтому словарь частей дополняется в самом
+        запросе, без чтения и перезаписи. Повторная загрузка части заменяет ETag.
+
+        :return: False, если загрузка уже завершена или отменена
+        """
+        result, error = self.execute_query(
+            """
+            UPDATE upload_sessions
+            SET parts = parts || jsonb_build_object(%s::text, %s::text)
+            WHERE upload_id = %s AND status = 'active'
+            RETURNING upload_id
+            """,
+            (str(part_number), etag, upload_id),
+            fetch='one'
+        )
+
+        return result is not None, error
+
+    def finish_upload_session(self, upload_id, status, s3_key=None):
+        """
+        Перевод активной загрузки в статус 'completed' или 'aborted'
+
+        :param s3_key: Новое имя объекта загрузки (None - не меняется)
+        :return: False, если загрузка уже не активна (ее завершил другой запрос)
+        """
+        result, error = self.execute_query(
+            """
+            UPDATE upload_sessions
+            SET status = %s, s3_key = COALESCE(%s, s3_key)
+            WHERE upload_id = %s AND status = 'active'
+            RETURNING upload_id
+            """,
+            (status, s3_key, upload_id),
+            fetch='one'
+        )
+
+        return result is not None, error
+
+    def reopen_upload_session(self, upload_id):
+        """Возврат загрузки в статус 'active' (сборка объекта не удалась, части можно дозагрузить)"""
+        _, error = self.execute_query(
+            """UPDATE upload_sessions SET status = 'active' WHERE upload_id = %s""",
+            (upload_id,),
+            fetch=None
+        )
+
+        return error is None, error
+
+    def claim_upload_video(self, upload_id, video_id):
+        """
+        Привязка видео (задачи обработки) к завершенной загрузке
+
+        :return: False, если к загрузке уже привязано видео (задачу ставит другой запрос)
+        """
+        result, error = self.execute_query(
+            """
+            UPDATE upload_sessions
+            SET video_id = %s
+            WHERE upload_id = %s AND video_id IS NULL
+            RETURNING upload_id
+            """,
+            (video_id, upload_id),
+            fetch='one'
+        )
+
+        return result is not None, error
+
+    def discard_video(self, video_id):
+        """
+        Удаление записи видео, задача которого не поставлена в очередь
+
+        Привязка к загрузке (upload_sessions.video_id) обнуляется внешним ключом.
+        """
+        _, error = self.execute_query(
+            """DELETE FROM videos WHERE video_id = %s""",
+            (video_id,),
+            fetch=None
+        )
+
+        return error is None, error
+
     def rename_video(self, video_id, user_id, new_s3_key):
         """
         Переименование видео (обновление ключа S3)
@@ -326,8 +638,12 @@ class DatabaseManager:
             logger.error(f"Ошибка при удалении видео: {e}")
             return False, f"Ошибка при удалении видео: {e}"
     
-    def save_detection_results(self, video_id, log_filename, frame_objects, weapon_detected, summary=None):
-        """Сохранение результатов обнаружения оружия"""
+    def save_detection_results(self, video_id, log_filename, frame_objects, weapon_detected, summary=None, model_variant=None):
+        """
+        Сохранение результатов обнаружения оружия
+
+        :param model_variant: Вариант модели (бэкенд и точность), получивший результаты
+        """
         conn = self.get_connection()
         if not conn:
             return False, "Ошибка подключения к БД"
@@ -358,10 +674,10 @@ class DatabaseManager:
                 
                 cur.execute("""
                 INSERT INTO detection_results 
-                (video_id, user_id, s3_key, bucket_name, status, weapon_detected)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                (video_id, user_id, s3_key, bucket_name, status, weapon_detected, model_variant)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
                 RETURNING result_id
-                """, (video_id, user_id, log_filename, detection_bucket_name, 'completed', weapon_detected))
+                """, (video_id, user_id, log_filename, detection_bucket_name, 'completed', weapon_detected, model_variant))
                 
                 result = cur.fetchone()
                 
@@ -0,0 +1,13 @@
+from .client import (
+    InferenceClient,
+    InferenceServerError
+)
+from .scheduler import BatchScheduler
+from .server import InferenceServer
+
+__all__ = [
+    'BatchScheduler',
+    'InferenceClient',
+    'InferenceServer',
+    'InferenceServerError'
+]
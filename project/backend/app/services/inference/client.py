@@ -0,0 +1,144 @@
+import cv2
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client
+import numpy as np
+from prometheus_client import Histogram
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+inference_client_request_seconds = Histogram(
+    'inference_client_request_seconds',
+    'Round-trip time of a frame batch sent to the inference server'
+)
+
+# Кадры перед отправкой уменьшаются до этого размера по длинной стороне:
+# модель все равно работает на входе 640, а объем передачи падает в разы
+INFERENCE_TRANSFER_SIZE = int(os.environ.get("INFERENCE_TRANSFER_SIZE", 640))
+
+
+class InferenceServerError(Exception):
+    """Сервер инференса вернул ошибку или недоступен"""
+
+
+class InferenceClient:
+    """
+    Клиент локального сервера инференса (см. server.py)
+
+    Каждый поток использует собственное соединение, поэтому клиент можно
+    разделять между потоками обработки. Повторяется только неудавшееся
+    подключение: запрос, отправленный до обрыва соединения, мог быть уже
+    выполнен сервером, поэтому он не повторяется (соединение пересоздается
+    при следующем запросе).
+
+    :param address: Путь к Unix-сокету сервера
+    :param authkey: Ключ аутентификации соединения
+    :param transfer_size: Максимальная длинная сторона передаваемого кадра (0 - без уменьшения)
+    """
+
+    def __init__(self, address, authkey, transfer_size=INFERENCE_TRANSFER_SIZE):
+        if not authkey:
+            raise InferenceServerError("Не задан ключ аутентификации сервера инференса (INFERENCE_SERVER_AUTHKEY)")
+        self.address = address
+        self.authkey = authkey
+        self.transfer_size = int(transfer_size)
+        self._local = threading.local()
+        self._class_names = None
+        self._model_info = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        for attempt in range(2):
+            try:
+                conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                break
+            except (EOFError, OSError) as e:
+                if attempt:
+                    raise InferenceServerError(f"Сервер инференса недоступен ({self.address}): {e}")
+                logger.warning(f"Не удалось подключиться к серверу инференса, повторное подключение: {e}")
+        self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, request):
+        conn = self._connection()
+        try:
+            conn.send(request)
+            status, payload = conn.recv()
+        except (EOFError, OSError) as e:
+            self._reset()
+            raise InferenceServerError(f"Соединение с сервером инференса прервано ({self.address}): {e}")
+
+        if status != 'ok':
+            raise InferenceServerError(payload)
+        return payload
+
+    def _shrink(self, frames, imgsz=None):
+        """Уменьшение кадров перед передачей, возвращает кадры и коэффициент масштаба"""
+        height, width = frames[0].shape[:2]
+        longest = max(height, width)
+        # Кадр не уменьшается сильнее запрошенного размера входа модели
+        limit = max(self.transfer_size, imgsz or 0)
+        if not self.transfer_size or longest <= limit:
+            return frames, 1.0
+
+        scale = limit / longest
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return [cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in frames], scale
+
+    def get_class_names(self):
+        """Словарь {id класса: имя класса} модели сервера"""
+        if self._class_names is None:
+            self._class_names = self._call(('names',))
+        return self._class_names
+
+    def get_model_info(self):
+        """Вариант (бэкенд и точность) и версия модели сервера: {'variant', 'version'}"""
+        if self._model_info is None:
+            self._model_info = self._call(('info',))
+        return self._model_info
+
+    def ping(self):
+        return self._call(('ping',))
+
+    def predict_batch(self, frames, conf=0.25, **kwargs):
+        """
+        Инференс пакета кадров на сервере
+
+        :return: Список Detections в координатах исходных кадров
+        """
+        from app.models.model import Detections
+
+        if not frames:
+            return []
+
+        sent, scale = self._shrink(frames, kwargs.get('imgsz'))
+        started = time.perf_counter()
+        results = self._call(('predict', sent, conf, kwargs))
+        inference_client_request_seconds.observe(time.perf_counter() - started)
+
+        detections = []
+        for xyxy, confidences, classes in results:
+            if scale != 1.0:
+                xyxy = (xyxy / scale).astype(np.float32)
+            detections.append(Detections(xyxy=xyxy, conf=confidences, cls=classes))
+        return detections
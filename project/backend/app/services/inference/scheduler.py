@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import deque
+from prometheus_client import Histogram
+from app.models.model import filter_confidence
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+# --- Метрики Prometheus для планировщика пакетов ---
+inference_batch_frames = Histogram(
+    'inference_batch_frames',
+    'Number of frames in a batch executed by the model',
+    buckets=(1, 2, 4, 8, 12, 16, 24, 32, 48, 64)
+)
+
+inference_batch_requests = Histogram(
+    'inference_batch_requests',
+    'Number of requests merged into one model batch',
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16)
+)
+
+inference_batch_wait_seconds = Histogram(
+    'inference_batch_wait_seconds',
+    'Time a request waits in the scheduler queue before its batch starts'
+)
+
+
+class _Request:
+    """Часть кадров одного вызова predict, ожидающая выполнения"""
+
+    def __init__(self, frames, conf, kwargs):
+        self.frames = frames
+        self.conf = conf
+        self.kwargs = kwargs
+        # Объединяются только запросы с одинаковыми параметрами инференса
+        self.key = tuple(sorted(kwargs.items()))
+        self.enqueued = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchScheduler:
+    """
+    Объединение кадров из параллельных задач в общие пакеты инференса
+
+    Модель вызывается только из потока планировщика. Запросы из разных потоков
+    складываются в очередь; пакет собирается, пока в нем меньше max_batch_size
+    кадров и с момента поступления первого запроса прошло меньше max_wait секунд.
+    Если за последние activity_window секунд модель вызывал только один поток, ожидание
+    пропускается: добавить кадры в пакет некому, и одиночный пользователь
+    не получает дополнительной задержки.
+
+    Пакет выполняется с минимальным порогом уверенности среди запросов, затем
+    результаты каждого запроса фильтруются по его собственному порогу.
+
+    :param predict: Функция (кадры, conf, **kwargs) -> список Detections
+    :param max_batch_size: Максимальное число кадров в пакете
+    :param max_wait: Максимальное ожидание заполнения пакета, секунды
+    """
+
+    def __init__(self, predict, max_batch_size=16, max_wait=0.01, activity_window=5.0, name='inference'):
+        self.predict_fn = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.activity_window = activity_window
+        self.name = name
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._callers = {}
+        self._thread = None
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=f"{self.name}-batcher", daemon=True)
+            self._thread.start()
+
+    def predict(self, frames, conf=0.25, **kwargs):
+        """
+        Инференс кадров в составе общего пакета (блокирует до получения результата)
+
+        :return: Список Detections, по одному на кадр
+        """
+        if not frames:
+            return []
+
+        requests = [
+            _Request(frames[start:start + self.max_batch_size], conf, kwargs)
+            for start in range(0, len(frames), self.max_batch_size)
+        ]
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Планировщик инференса остановлен")
+            self._ensure_started()
+            self._callers[threading.get_ident()] = time.monotonic()
+            self._queue.extend(requests)
+            self._condition.notify()
+
+        results = []
+        for request in requests:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            results.extend(request.result)
+        return results
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _concurrent_callers(self):
+        now = time.monotonic()
+        for ident, seen in list(self._callers.items()):
+            if now - seen > self.activity_window:
+                del self._callers[ident]
+        return len(self._callers)
+
+    def _take_compatible(self, batch, key, total):
+        for request in list(self._queue):
+            if total >= self.max_batch_size:
+                break
+            if request.key == key and total + len(request.frames) <= self.max_batch_size:
+                self._queue.remove(request)
+                batch.append(request)
+                total += len(request.frames)
+        return total
+
+    def _collect(self):
+        """Сборка следующего пакета; вызывается под self._condition"""
+        while not self._queue:
+            if self._closed:
+                return None
+            self._condition.wait()
+
+        first = self._queue.popleft()
+        batch = [first]
+        total = self._take_compatible(batch, first.key, len(first.frames))
+
+        if self._concurrent_callers() > 1:
+            deadline = first.enqueued + self.max_wait
+            while total < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                total = self._take_compatible(batch, first.key, total)
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                batch = self._collect()
+            if batch is None:
+                return
+            self._run(batch)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        for request in batch:
+            inference_batch_wait_seconds.observe(started - request.enqueued)
+
+        frames = [frame for request in batch for frame in request.frames]
+        inference_batch_frames.observe(len(frames))
+        inference_batch_requests.observe(len(batch))
+
+        try:
+            detections = self.predict_fn(frames, conf=min(request.conf for request in batch), **batch[0].kwargs)
+        except Exception as e:
+            logger.error(f"Ошибка инференса пакета из {len(frames)} кадров: {e}")
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            count = len(request.frames)
+            request.result = [filter_confidence(item, request.conf) for item in detections[offset:offset + count]]
+            offset += count
+            request.done.set()
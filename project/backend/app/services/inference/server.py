@@ -0,0 +1,208 @@
+"""
+Локальный сервер инференса
+
+Один процесс на хост владеет моделью, воркеры API отправляют ему пакеты кадров
+через Unix-сокет. Память под модель и runtime torch расходуется один раз на хост,
+а не в каждом воркере gunicorn.
+
+Запуск:
+    python -m app.services.inference --socket /run/inference/inference.sock
+
+Процесс сервера запускается без INFERENCE_SERVER_SOCKET в окружении, иначе
+модель в нем тоже будет работать как клиент.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Listener
+from prometheus_client import Counter, Histogram, start_http_server
+from .scheduler import BatchScheduler
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+inference_server_requests_total = Counter(
+    'inference_server_requests_total',
+    'Total number of requests handled by the inference server',
+    ['op', 'status']  # op: 'predict', 'names', 'info', 'ping'; status: 'success', 'error'
+)
+
+inference_server_batch_seconds = Histogram(
+    'inference_server_batch_seconds',
+    'Time the inference server spent running the model on a batch'
+)
+
+inference_server_batch_frames = Histogram(
+    'inference_server_batch_frames',
+    'Number of frames in a request received by the inference server',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# Ключ аутентификации соединений (обязателен: соединения передают объекты pickle,
+# поэтому процесс с доступом к сокету без ключа мог бы выполнить код в сервере)
+INFERENCE_SERVER_AUTHKEY = os.environ.get("INFERENCE_SERVER_AUTHKEY", "").encode()
+
+
+class InferenceServer:
+    """
+    Сервер инференса на Unix-сокете
+
+    Каждое соединение обслуживается отдельным потоком, а кадры всех соединений
+    объединяются в общие пакеты планировщиком (см. scheduler.py), который
+    единственный вызывает модель - в процессе один экземпляр модели.
+
+    :param address: Путь к Unix-сокету
+    :param predict: Функция (кадры, conf, **kwargs) -> список Detections
+    :param class_names: Словарь {id класса: имя класса} модели
+    :param authkey: Ключ аутентификации соединений
+    :param model_variant: Вариант модели (бэкенд и точность) для записи в результаты
+    :param model_version: Версия модели (вариант и хеш весов)
+    :param max_batch_size: Максимальное число кадров в общем пакете
+    :param max_wait: Максимальное ожидание заполнения пакета, секунды
+    """
+
+    def __init__(
+        self,
+        address,
+        predict,
+        class_names,
+        authkey=INFERENCE_SERVER_AUTHKEY,
+        model_variant=None,
+        model_version=None,
+        max_batch_size=16,
+        max_wait=0.01,
+    ):
+        self.address = address
+        self.predict = predict
+        self.class_names = dict(class_names)
+        self.model_variant = model_variant
+        self.model_version = model_version
+        self.authkey = authkey
+        self._scheduler = BatchScheduler(self._run_model, max_batch_size=max_batch_size, max_wait=max_wait, name='server')
+        self._listener = None
+        self._closed = threading.Event()
+
+    def start(self):
+        """Открытие сокета; после возврата сервер готов принимать соединения"""
+        if not self.authkey:
+            raise RuntimeError("Не задан ключ аутентификации сервера инференса (INFERENCE_SERVER_AUTHKEY)")
+        if os.path.exists(self.address):
+            # Сокет остался от предыдущего запуска
+            os.remove(self.address)
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)), exist_ok=True)
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        logger.info(f"Сервер инференса слушает {self.address}")
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    break
+                raise
+            except Exception as e:
+                # Например, ошибка аутентификации клиента
+                logger.warning(f"Соединение отклонено: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), name="inference-conn", daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        self._scheduler.close()
+        if self._listener is not None:
+            self._listener.close()
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+    def _serve_connection(self, conn):
+        with conn:
+            while not self._closed.is_set():
+                try:
+                    request = conn.recv()
+                    conn.send(self._handle(request))
+                except (EOFError, OSError):
+                    break
+
+    def _handle(self, request):
+        op = request[0]
+        try:
+            if op == 'predict':
+                payload = self._predict(*request[1:])
+            elif op == 'names':
+                payload = self.class_names
+            elif op == 'info':
+                payload = {'variant': self.model_variant, 'version': self.model_version}
+            elif op == 'ping':
+                payload = 'pong'
+            else:
+                raise ValueError(f"Неизвестная операция: {op}")
+        except Exception as e:
+            logger.error(f"Ошибка обработки запроса {op}: {e}")
+            inference_server_requests_total.labels(op=op, status='error').inc()
+            return 'error', str(e)
+
+        inference_server_requests_total.labels(op=op, status='success').inc()
+        return 'ok', payload
+
+    def _run_model(self, frames, conf=0.25, **kwargs):
+        started = time.perf_counter()
+        detections = self.predict(frames, conf=conf, **kwargs)
+        inference_server_batch_seconds.observe(time.perf_counter() - started)
+        return detections
+
+    def _predict(self, frames, conf, kwargs):
+        inference_server_batch_frames.observe(len(frames))
+        detections = self._scheduler.predict(frames, conf=conf, **kwargs)
+        # Передаются кортежи массивов, клиент собирает из них Detections
+        return [(item.xyxy, item.conf, item.cls) for item in detections]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный сервер инференса")
+    parser.add_argument("--socket", default=os.environ.get("INFERENCE_SERVER_LISTEN", "/run/inference/inference.sock"))
+    parser.add_argument("--metrics-port", type=int, default=int(os.environ.get("INFERENCE_SERVER_METRICS_PORT", 9101)))
+    args = parser.parse_args()
+
+    if not INFERENCE_SERVER_AUTHKEY:
+        raise SystemExit("Сервер инференса нельзя запускать без INFERENCE_SERVER_AUTHKEY в окружении")
+
+    from app.models import model
+    from app.services.tuning import tuning
+
+    # Один процесс сервера: все доступные процессоры - потокам torch
+    tuning.apply(role="inference")
+
+    if model.inference_client is not None:
+        raise SystemExit("Сервер инференса нельзя запускать с INFERENCE_SERVER_SOCKET в окружении")
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+
+    server = InferenceServer(
+        args.socket,
+        predict=lambda frames, conf=0.25, **kwargs: model.run_model(model.model, frames, conf=conf, **kwargs),
+        class_names=model.model.names,
+        model_variant=model.model_variant,
+        model_version=model.model_version,
+        max_batch_size=model.INFERENCE_MAX_BATCH,
+        max_wait=model.INFERENCE_MAX_WAIT,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
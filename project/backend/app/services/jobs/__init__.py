@@ -0,0 +1,11 @@
+from .job_queue import (
+    JobQueue,
+    QueueFullError
+)
+from . import recovery
+
+__all__ = [
+    'JobQueue',
+    'QueueFullError',
+    'recovery'
+]
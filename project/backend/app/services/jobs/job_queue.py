@@ -0,0 +1,191 @@
+import logging
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from prometheus_client import Counter, Gauge, Histogram
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+# --- Метрики Prometheus для очереди задач ---
+job_queue_depth = Gauge(
+    'job_queue_depth',
+    'Number of jobs waiting in the processing queue'
+)
+
+job_wait_time_seconds = Histogram(
+    'job_wait_time_seconds',
+    'Time a job spends in the queue before a worker picks it up'
+)
+
+jobs_total = Counter(
+    'jobs_total',
+    'Total number of processed background jobs',
+    ['status']  # 'completed', 'failed', 'rejected'
+)
+
+
+class QueueFullError(Exception):
+    """Очередь задач переполнена, новая задача не может быть принята"""
+
+
+class JobQueue:
+    """Очередь фоновых задач с пулом потоков-обработчиков
+
+    Обработчик вызывается как handler(job_id, payload, report_progress) и
+    возвращает результат задачи (любой JSON-сериализуемый объект).
+    Очередь и состояние задач хранятся в памяти процесса: задачу видит только
+    воркер gunicorn, который ее принял, и при его перезапуске она пропадает.
+    Постоянное состояние (статус видео) обработчик сохраняет в БД самостоятельно,
+    а потерянные задачи находит recovery.py.
+    """
+
+    def __init__(self, handler, num_workers=2, max_size=100, max_history=1000, name='video'):
+        self.handler = handler
+        self.num_workers = max(1, int(num_workers))
+        self.max_history = max_history
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._started = False
+
+    def start(self):
+        """Запуск потоков-обработчиков (выполняется один раз)"""
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"{self.name}-worker-{i}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+            self._started = True
+        logger.info(f"Запущено {self.num_workers} обработчиков очереди '{self.name}'")
+
+    def submit(self, payload, job_id=None, owner=None):
+        """Постановка задачи в очередь
+
+        :param payload: Данные задачи, передаваемые обработчику
+        :param job_id: Идентификатор задачи (по умолчанию генерируется)
+        :param owner: Владелец задачи (имя пользователя) для проверки доступа
+        :return: Идентификатор задачи
+        :raises QueueFullError: если очередь переполнена
+        """
+        # Потоки запускаются лениво, чтобы не создавать их до fork() в gunicorn
+        self.start()
+
+        job_id = str(job_id or uuid.uuid4())
+        job = {
+            'job_id': job_id,
+            'owner': owner,
+            'status': 'pending',
+            'progress': 0.0,
+            'submitted_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim_history()
+
+        try:
+            self._queue.put_nowait((job_id, payload, time.time()))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            jobs_total.labels(status='rejected').inc()
+            logger.warning(f"Очередь '{self.name}' переполнена, задача {job_id} отклонена")
+            raise QueueFullError("Очередь обработки переполнена, попробуйте позже")
+
+        job_queue_depth.set(self._queue.qsize())
+        logger.info(f"Задача {job_id} поставлена в очередь '{self.name}'")
+        return job_id
+
+    def get_job(self, job_id):
+        """Получение копии состояния задачи или None, если задача неизвестна"""
+        with self._lock:
+            job = self._jobs.get(str(job_id))
+            return dict(job) if job else None
+
+    def active_jobs(self):
+        """Идентификаторы задач, ожидающих в очереди или выполняемых этим процессом"""
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job['status'] in ('pending', 'processing')]
+
+    def update_progress(self, job_id, progress):
+        """Обновление прогресса задачи (значение от 0 до 1)"""
+        with self._lock:
+            job = self._jobs.get(str(job_id))
+            if job:
+                job['progress'] = round(min(max(float(progress), 0.0), 1.0), 4)
+
+    def _set_state(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _trim_history(self):
+        """Удаление самых старых завершенных задач при превышении лимита истории"""
+        if len(self._jobs) <= self.max_history:
+            return
+        for old_id in list(self._jobs.keys()):
+            if len(self._jobs) <= self.max_history:
+                break
+            if self._jobs[old_id]['status'] in ('completed', 'failed'):
+                del self._jobs[old_id]
+
+    def _worker_loop(self):
+        while True:
+            job_id, payload, enqueued_at = self._queue.get()
+            job_queue_depth.set(self._queue.qsize())
+            job_wait_time_seconds.observe(time.time() - enqueued_at)
+
+            self._set_state(job_id, status='processing', started_at=datetime.now().isoformat())
+            logger.info(f"Начало выполнения задачи {job_id}")
+
+            try:
+                result = self.handler(
+                    job_id,
+                    payload,
+                    lambda progress: self.update_progress(job_id, progress)
+                )
+                self._set_state(
+                    job_id,
+                    status='completed',
+                    progress=1.0,
+                    result=result,
+                    finished_at=datetime.now().isoformat()
+                )
+                jobs_total.labels(status='completed').inc()
+                logger.info(f"Задача {job_id} успешно выполнена")
+            except Exception as e:
+                logger.error(f"Ошибка при выполнении задачи {job_id}: {e}")
+                logger.error(traceback.format_exc())
+                self._set_state(
+                    job_id,
+                    status='failed',
+                    error=str(e),
+                    finished_at=datetime.now().isoformat()
+                )
+                jobs_total.labels(status='failed').inc()
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,93 @@
+"""
+Отказ по задачам, потерянным вместе с воркером
+
+Очередь задач (JobQueue) хранится в памяти воркера gunicorn: при перезапуске воркера
+ожидающие и выполняемые задачи пропадают, а их видео остаются в статусе 'pending' или
+'processing'. Каждый воркер раз в JOB_HEARTBEAT_INTERVAL секунд отмечает в БД свои
+незавершенные задачи (metadata.heartbeat_at), а видео, которые никто не отмечал дольше
+JOB_STALE_AFTER секунд, получают статус 'failed'. Первая проверка выполняется при
+запуске воркера. Задачи других работающих воркеров отмечаются ими самими и поэтому не
+затрагиваются.
+"""
+import logging
+import os
+import threading
+from prometheus_client import Counter
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+jobs_abandoned_total = Counter(
+    'jobs_abandoned_total',
+    'Videos marked failed because their job was lost with its worker'
+)
+
+# Интервал отметки незавершенных задач воркера и проверки потерянных, секунды
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", 60))
+# Задача, не отмеченная дольше этого срока, считается потерянной, секунды
+JOB_STALE_AFTER = max(float(os.environ.get("JOB_STALE_AFTER", 600)), 3 * JOB_HEARTBEAT_INTERVAL)
+
+_thread = None
+_lock = threading.Lock()
+
+
+def heartbeat(job_queue, db):
+    """Отметка в БД задач, ожидающих или выполняемых этим воркером"""
+    job_ids = job_queue.active_jobs()
+    if not job_ids:
+        return
+    _, error = db.touch_videos(job_ids)
+    if error:
+        raise RuntimeError(f"Не удалось отметить задачи воркера: {error}")
+
+
+def recover(db, stale_after=None):
+    """Перевод видео потерянных задач в статус 'failed', возвращает их число"""
+    stale_after = JOB_STALE_AFTER if stale_after is None else stale_after
+    video_ids, error = db.fail_stale_videos(stale_after)
+    if error:
+        raise RuntimeError(f"Не удалось проверить незавершенные задачи: {error}")
+    if video_ids:
+        jobs_abandoned_total.inc(len(video_ids))
+        logger.warning(f"Задачи потеряны при перезапуске воркера, видео отмечены как failed: {', '.join(map(str, video_ids))}")
+    return len(video_ids)
+
+
+def check(job_queue, db):
+    """Одна проверка: отметка своих задач и отказ по потерянным, возвращает число потерянных"""
+    heartbeat(job_queue, db)
+    return recover(db)
+
+
+def _loop(job_queue, db, interval, stop):
+    while not stop.wait(interval):
+        try:
+            check(job_queue, db)
+        except Exception as e:
+            logger.warning(f"Не удалось проверить потерянные задачи: {e}")
+
+
+def start(job_queue, db, interval=JOB_HEARTBEAT_INTERVAL):
+    """
+    Первая проверка и запуск фонового потока (один на процесс)
+
+    Ошибка первой проверки передается вызывающему, чтобы задача запуска повторилась.
+
+    :return: Событие, установка которого останавливает поток
+    """
+    global _thread
+    with _lock:
+        if _thread is None:
+            check(job_queue, db)
+            stop = threading.Event()
+            thread = threading.Thread(target=_loop, args=(job_queue, db, interval, stop), name="job-recovery", daemon=True)
+            thread.start()
+            _thread = (thread, stop)
+            logger.info(f"Запущена отметка задач воркера каждые {interval} с")
+        return _thread[1]
@@ -1,7 +1,9 @@
 from .minio_storage import (
-    MinioStorage
+    MinioStorage,
+    UPLOAD_STAGING_PREFIX
 )
 
 __all__ = [
-    'MinioStorage'
+    'MinioStorage',
+    'UPLOAD_STAGING_PREFIX'
 ] 
\ No newline at end of file
@@ -1,10 +1,13 @@
 from minio import Minio
 from minio.error import S3Error
-from minio.commonconfig import CopySource
+from minio.commonconfig import ENABLED, ComposeSource, CopySource, Filter
+from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+from minio.datatypes import Part
 import os
 import json
 import logging
 import time
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
 import io
@@ -16,6 +19,15 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Префикс объектов, которые клиенты загружают по временной ссылке до проверки
+UPLOAD_STAGING_PREFIX = 'staging/'
+# Срок хранения таких объектов (брошенных или перезаписанных после завершения), дни
+UPLOAD_STAGING_EXPIRY_DAYS = int(os.environ.get('UPLOAD_STAGING_EXPIRY_DAYS', 1))
+
+_shared_lock = threading.Lock()
+_shared_storage = None
+
+
 def retry_s3_operation(max_retries=3, backoff_factor=0.3):
     """Декоратор для повторения операций S3 при ошибках"""
     def decorator(func):
@@ -56,18 +68,41 @@ class MinioStorage:
         secure=os.environ.get('MINIO_SECURE', 'false').lower() == 'true',
         video_bucket='videos',
         log_bucket='logs',
-        region=None
+        upload_bucket=os.environ.get('MINIO_UPLOAD_BUCKET', 'uploads'),
+        region=None,
+        lazy=False
     ):
+        """
+        :param upload_bucket: Бакет для загружаемых частями видео до их обработки
+        :param lazy: Не подключаться в конструкторе; соединение устанавливается
+            при первой операции (см. ensure_connection)
+        """
         self.endpoint = endpoint
         self.access_key = access_key
         self.secret_key = secret_key
         self.secure = secure
         self.video_bucket = video_bucket
         self.log_bucket = log_bucket
+        self.upload_bucket = upload_bucket
         self.region = region
         self.client = None
         logger.info(f"Инициализация MinioStorage с параметрами: endpoint={endpoint}, secure={secure}, region={region}")
-        self.connect()
+        if not lazy:
+            self.connect()
+
+    @classmethod
+    def shared(cls):
+        """
+        Общий для процесса экземпляр хранилища с отложенным подключением
+
+        Модули приложения используют один клиент MinIO вместо собственного
+        подключения при импорте каждого модуля.
+        """
+        with _shared_lock:
+            global _shared_storage
+            if _shared_storage is None:
+                _shared_storage = cls(lazy=True)
+            return _shared_storage
         
     def connect(self):
         """Установка соединения с MinIO"""
@@ -109,10 +144,30 @@ class MinioStorage:
                 logger.info(f"Создан бакет {self.log_bucket}")
             else:
                 logger.debug(f"Бакет {self.log_bucket} уже существует")
+
+            if not self.client.bucket_exists(self.upload_bucket):
+                logger.info(f"Бакет {self.upload_bucket} не существует, создаем")
+                self.client.make_bucket(self.upload_bucket)
+                logger.info(f"Создан бакет {self.upload_bucket}")
+            self._ensure_staging_expiry()
                 
         except Exception as e:
             logger.error(f"Ошибка при проверке/создании бакетов: {e}")
             raise
+
+    def _ensure_staging_expiry(self):
+        """Правило жизненного цикла: MinIO удаляет объекты с префиксом staging/ через UPLOAD_STAGING_EXPIRY_DAYS дней"""
+        rule = Rule(
+            ENABLED,
+            rule_filter=Filter(prefix=UPLOAD_STAGING_PREFIX),
+            rule_id='expire-staging-uploads',
+            expiration=Expiration(days=UPLOAD_STAGING_EXPIRY_DAYS),
+        )
+        try:
+            self.client.set_bucket_lifecycle(self.upload_bucket, LifecycleConfig([rule]))
+        except S3Error as e:
+            # Без правила брошенные объекты удаляет только проверка загрузок (см. uploads/sweeper.py)
+            logger.warning(f"Не удалось задать срок хранения загрузок в бакете {self.upload_bucket}: {e}")
     
     def check_connection(self):
         """Проверка работоспособности соединения"""
@@ -185,6 +240,141 @@ class MinioStorage:
         logger.info(f"Лог {object_name} успешно загружен в Minio")
         return True
     
+    @retry_s3_operation()
+    def save_detections(self, file_path, object_name):
+        """Сохранение колоночного файла обнаружений в бакет логов"""
+        logger.info(f"Загрузка файла обнаружений {file_path} в MinIO с именем {object_name}")
+        try:
+            self.ensure_connection()
+
+            self.client.fput_object(
+                bucket_name=self.log_bucket,
+                object_name=object_name,
+                file_path=file_path,
+                content_type='application/octet-stream'
+            )
+
+            logger.info(f"Файл обнаружений {object_name} успешно загружен в Minio")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении файла обнаружений: {e}")
+            return False
+
+    @retry_s3_operation()
+    def create_multipart_upload(self, object_name, content_type='application/octet-stream'):
+        """
+        Начало составной загрузки (multipart upload) объекта в бакет загрузок
+
+        Клиент minio не дает публичного API для загрузки частями из разных запросов,
+        поэтому используются его внутренние методы S3 CreateMultipartUpload/UploadPart/
+        CompleteMultipartUpload/AbortMultipartUpload. Их сигнатуры проверены для версии
+        из requirements.txt (minio==7.2.0) и проверяются тестом при каждом запуске, так
+        что обновление minio с другими сигнатурами остановит сборку.
+
+        :return: Идентификатор загрузки в MinIO или None в случае ошибки
+        """
+        logger.info(f"Начало составной загрузки {object_name} в бакет {self.upload_bucket}")
+        try:
+            self.ensure_connection()
+
+            return self.client._create_multipart_upload(
+                self.upload_bucket, object_name, {'Content-Type': content_type}
+            )
+        except S3Error as e:
+            logger.error(f"Ошибка начала составной загрузки {object_name}: {e}")
+            return None
+
+    @retry_s3_operation()
+    def upload_part(self, object_name, upload_id, part_number, data):
+        """
+        Загрузка части составного объекта (части можно загружать параллельно и повторно)
+
+        :param data: Байты части
+        :return: ETag части
+        """
+        self.ensure_connection()
+
+        return self.client._upload_part(self.upload_bucket, object_name, data, None, upload_id, part_number)
+
+    @retry_s3_operation()
+    def complete_multipart_upload(self, object_name, upload_id, parts):
+        """
+        Сборка объекта из загруженных частей
+
+        :param parts: Словарь {номер части: ETag}
+        """
+        logger.info(f"Сборка объекта {object_name} из {len(parts)} частей")
+        self.ensure_connection()
+
+        self.client._complete_multipart_upload(
+            self.upload_bucket,
+            object_name,
+            upload_id,
+            [Part(number, etag) for number, etag in sorted(parts.items())]
+        )
+        logger.info(f"Объект {object_name} собран в бакете {self.upload_bucket}")
+        return True
+
+    @retry_s3_operation()
+    def copy_upload(self, source_object, object_name):
+        """
+        Копирование объекта внутри бакета загрузок на стороне MinIO
+
+        Используется составное копирование, поэтому размер объекта не ограничен 5 ГБ.
+        """
+        logger.info(f"Копирование загруженного видео {source_object} в {object_name}")
+        self.ensure_connection()
+
+        self.client.compose_object(
+            self.upload_bucket,
+            object_name,
+            [ComposeSource(self.upload_bucket, source_object)]
+        )
+        return True
+
+    @retry_s3_operation()
+    def abort_multipart_upload(self, object_name, upload_id):
+        """Отмена составной загрузки: загруженные части удаляются"""
+        logger.info(f"Отмена составной загрузки {object_name}")
+        try:
+            self.ensure_connection()
+
+            self.client._abort_multipart_upload(self.upload_bucket, object_name, upload_id)
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка отмены составной загрузки {object_name}: {e}")
+            return False
+
+    @retry_s3_operation()
+    def get_upload(self, object_name, file_path):
+        """Скачивание загруженного видео из бакета загрузок в файл"""
+        logger.info(f"Скачивание загруженного видео {object_name} в {file_path}")
+        try:
+            self.ensure_connection()
+
+            self.client.fget_object(
+                bucket_name=self.upload_bucket,
+                object_name=object_name,
+                file_path=file_path
+            )
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка скачивания загруженного видео {object_name}: {e}")
+            return False
+
+    @retry_s3_operation()
+    def delete_upload(self, object_name):
+        """Удаление загруженного видео из бакета загрузок после обработки"""
+        try:
+            self.ensure_connection()
+
+            self.client.remove_object(bucket_name=self.upload_bucket, object_name=object_name)
+            logger.info(f"Загруженное видео {object_name} удалено из бакета {self.upload_bucket}")
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка удаления загруженного видео {object_name}: {e}")
+            return False
+
     @retry_s3_operation()
     def rename_object(self, source_bucket, source_object, target_object):
         """Переименование объекта через операцию копирования"""
@@ -318,14 +508,54 @@ class MinioStorage:
             logger.error(f"Ошибка получения лога из Minio: {e}")
             return None
             
+
+    @retry_s3_operation()
+    def get_object_size(self, bucket_name, object_name):
+        """Размер объекта в байтах (None - объект не найден)"""
+        try:
+            self.ensure_connection()
+
+            return self.client.stat_object(bucket_name, object_name).size
+        except S3Error as e:
+            if e.code != 'NoSuchKey':
+                logger.error(f"Ошибка получения размера объекта {object_name}: {e}")
+            return None
+
+    @retry_s3_operation()
+    def get_object_range(self, bucket_name, object_name, offset, length):
+        """Чтение диапазона байт объекта (запрос с заголовком Range)
+        
+        Args:
+            bucket_name (str): Имя бакета в Minio
+            object_name (str): Имя объекта в Minio
+            offset (int): Смещение первого байта
+            length (int): Число байт
+            
+        Returns:
+            bytes: Прочитанные байты
+        """
+        self.ensure_connection()
+
+        response = self.client.get_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            offset=offset,
+            length=length
+        )
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
    
     @retry_s3_operation()
-    def delete_objects(self, video_object_name, log_object_name=None):
-        """Удаление видео и лога из Minio
+    def delete_objects(self, video_object_name, log_object_name=None, detections_object_name=None):
+        """Удаление видео, лога и файла обнаружений из Minio
         
         Args:
             video_object_name (str): Имя видео объекта в Minio
             log_object_name (str, optional): Имя лог объекта в Minio
+            detections_object_name (str, optional): Имя файла обнаружений в бакете логов
             
         Returns:
             bool: True - успешно, False - ошибка
@@ -346,6 +576,13 @@ class MinioStorage:
                     object_name=log_object_name
                 )
                 logger.info(f"Лог {log_object_name} успешно удален")
+
+            if detections_object_name:
+                self.client.remove_object(
+                    bucket_name=self.log_bucket,
+                    object_name=detections_object_name
+                )
+                logger.info(f"Файл обнаружений {detections_object_name} успешно удален")
             
             return True
         except S3Error as e:
@@ -393,6 +630,33 @@ class MinioStorage:
             logger.error(f"Неожиданная ошибка при создании временной ссылки: {e}")
             return None
             
+    @retry_s3_operation()
+    def get_presigned_upload_url(self, object_name, expires=timedelta(hours=1)):
+        """Создание временной ссылки для загрузки видео клиентом в бакет загрузок (PUT)
+
+        Args:
+            object_name (str): Имя объекта в бакете загрузок
+            expires (timedelta, optional): Время жизни ссылки
+
+        Returns:
+            str or None: URL или None в случае ошибки
+        """
+        logger.info(f"Создание ссылки для загрузки {object_name} со сроком действия {expires}")
+        try:
+            self.ensure_connection()
+
+            return self.client.presigned_put_object(
+                bucket_name=self.upload_bucket,
+                object_name=object_name,
+                expires=expires
+            )
+        except S3Error as e:
+            logger.error(f"Ошибка создания ссылки для загрузки: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при создании ссылки для загрузки: {e}")
+            return None
+
     @retry_s3_operation()
     def list_user_videos(self, username):
         """Получение списка видео пользователя из Minio
@@ -0,0 +1,9 @@
+from .startup import (
+    StartupManager,
+    startup
+)
+
+__all__ = [
+    'StartupManager',
+    'startup'
+]
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from prometheus_client import Gauge
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+# --- Метрики Prometheus для запуска приложения ---
+app_startup_phase_seconds = Gauge(
+    'app_startup_phase_seconds',
+    'Duration of application startup phases (imports and initialization tasks)',
+    ['phase']
+)
+
+app_ready = Gauge(
+    'app_ready',
+    '1 when all required startup tasks have completed successfully'
+)
+
+# Интервал повторного запуска неудавшейся задачи инициализации, секунды
+STARTUP_RETRY_INTERVAL = float(os.environ.get("STARTUP_RETRY_INTERVAL", 5))
+
+
+class StartupManager:
+    """
+    Инициализация тяжелых ресурсов приложения (БД, хранилище, модель)
+
+    Задачи выполняются параллельно в фоновых потоках, поэтому импорт приложения
+    и запуск воркера не ждут подключения к зависимостям. Неудавшаяся задача
+    повторяется каждые retry_interval секунд; пока все обязательные задачи
+    не выполнены, приложение считается неготовым (см. /ready).
+
+    Дополнительно собирается длительность этапов запуска (импорты, задачи).
+    """
+
+    def __init__(self, retry_interval=STARTUP_RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self._tasks = OrderedDict()
+        self._state = OrderedDict()
+        self._phases = OrderedDict()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started = False
+
+    def add_task(self, name, func, required=True):
+        """
+        Регистрация задачи инициализации
+
+        :param func: Функция без аргументов; исключение означает неудачу
+        :param required: Без успешного выполнения задачи приложение не готово
+        """
+        with self._lock:
+            self._tasks[name] = (func, required)
+            self._state[name] = {'status': 'pending', 'required': required, 'seconds': None, 'attempts': 0, 'error': None}
+
+    def record_phase(self, name, seconds):
+        """Запись длительности этапа запуска"""
+        self._phases[name] = round(seconds, 4)
+        app_startup_phase_seconds.labels(phase=name).set(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """Измерение длительности этапа запуска"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+
+    def start(self):
+        """Запуск всех задач в фоновых потоках (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            tasks = list(self._tasks.items())
+
+        if not tasks:
+            self._finish()
+            return
+
+        logger.info(f"Запуск инициализации: {', '.join(name for name, _ in tasks)}")
+        for name, (func, _) in tasks:
+            threading.Thread(target=self._run, args=(name, func), name=f"startup-{name}", daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения обязательных задач; возвращает готовность"""
+        self._done.wait(timeout)
+        return self.is_ready()
+
+    def is_ready(self):
+        with self._lock:
+            return self._started and all(
+                state['status'] == 'ready' for state in self._state.values() if state['required']
+            )
+
+    def status(self):
+        """Состояние готовности, задач и длительность этапов запуска"""
+        with self._lock:
+            tasks = {name: dict(state) for name, state in self._state.items()}
+        return {
+            'ready': self.is_ready(),
+            'tasks': tasks,
+            'phases': dict(self._phases),
+        }
+
+    def _run(self, name, func):
+        while True:
+            with self._lock:
+                self._state[name]['status'] = 'running'
+                self._state[name]['attempts'] += 1
+
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                with self._lock:
+                    self._state[name].update(status='failed', error=str(e))
+                logger.error(f"Ошибка инициализации {name}: {e}; повтор через {self.retry_interval} с")
+                time.sleep(self.retry_interval)
+                continue
+
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._state[name].update(status='ready', seconds=round(seconds, 4), error=None)
+            self.record_phase(f"task:{name}", seconds)
+            logger.info(f"Инициализация {name} завершена за {seconds:.2f} с")
+            break
+
+        if self.is_ready():
+            self._finish()
+
+    def _finish(self):
+        if self._done.is_set():
+            return
+        app_ready.set(1)
+        self._done.set()
+        logger.info(f"Приложение готово к работе: {dict(self._phases)}")
+
+
+# Состояние запуска процесса приложения
+startup = StartupManager()
@@ -0,0 +1,21 @@
+from .topology import (
+    available_cpus,
+    cgroup_cpu_quota,
+    load_config,
+    plan_threads
+)
+from .tuning import (
+    apply,
+    configure_torch,
+    current_config
+)
+
+__all__ = [
+    'apply',
+    'available_cpus',
+    'cgroup_cpu_quota',
+    'configure_torch',
+    'current_config',
+    'load_config',
+    'plan_threads'
+]
@@ -0,0 +1,4 @@
+from .autotune import main
+
+
+main()
@@ -0,0 +1,135 @@
+"""
+Автонастройка потоков: замер обработки видео при разных распределениях процессоров
+
+Для каждого варианта (число воркеров x потоков torch в воркере) запускается пул из
+стольких же процессов с этой конфигурацией потоков; каждый процесс обрабатывает
+эталонное видео (декодирование, инференс, отрисовка и кодирование - как при
+обработке запроса, без загрузки в MinIO). Выбирается вариант с наибольшим числом
+обработанных кадров в секунду; результат записывается в файл, который читает
+load_config (и gunicorn.conf.py).
+
+Запуск:
+    python -m app.services.tuning --clip reference.mp4 --output config/tuning.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from datetime import datetime
+import cv2
+from .topology import TUNING_FILE, TUNING_MAX_WORKERS, available_cpus, plan_threads
+
+
+def candidate_configs(cpus, max_workers=TUNING_MAX_WORKERS):
+    """
+    Варианты распределения: воркеры x потоки torch, не больше cpus потоков всего
+
+    Потоки OpenCV в воркере равны потокам torch: стадии конвейера делят одни процессоры.
+    """
+    candidates = []
+    for workers in range(1, max(1, min(cpus, max_workers)) + 1):
+        for threads in range(1, cpus // workers + 1):
+            config = plan_threads(cpus)
+            config.update(workers=workers, torch_intra_op=threads, opencv=threads, source='autotune')
+            candidates.append(config)
+    return candidates
+
+
+def _init_candidate(config):
+    from app.services.tuning import tuning
+    tuning.apply(config)
+
+
+def _process_clip(clip_path, confidence_threshold):
+    from app.services.video_processing.video_processing import process_frame_range
+
+    with tempfile.TemporaryDirectory() as workspace:
+        process_frame_range(clip_path, confidence_threshold, os.path.join(workspace, "result.mp4"))
+
+
+def _count_frames(clip_path):
+    cap = cv2.VideoCapture(clip_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def measure(config, clip_path, confidence_threshold=0.5, repeats=1):
+    """
+    Кадров в секунду при конфигурации config
+
+    Каждый из config['workers'] процессов сначала обрабатывает видео один раз
+    без замера (загрузка модели), затем repeats раз с замером.
+    """
+    workers = config['workers']
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_candidate,
+        initargs=(config,),
+    ) as pool:
+        for future in wait([pool.submit(_process_clip, clip_path, confidence_threshold) for _ in range(workers)]).done:
+            future.result()
+
+        started = time.perf_counter()
+        futures = [pool.submit(_process_clip, clip_path, confidence_threshold) for _ in range(workers * repeats)]
+        for future in wait(futures).done:
+            future.result()
+        elapsed = time.perf_counter() - started
+
+    return _count_frames(clip_path) * workers * repeats / elapsed
+
+
+def autotune(clip_path, confidence_threshold=0.5, repeats=1, max_workers=TUNING_MAX_WORKERS):
+    """
+    Замер всех вариантов и выбор лучшего (при равенстве - с меньшим числом воркеров)
+
+    :return: Конфигурация для файла автонастройки с результатами замеров
+    """
+    cpus = available_cpus()
+    results = []
+    for config in candidate_configs(cpus, max_workers):
+        fps = measure(config, clip_path, confidence_threshold, repeats)
+        results.append({
+            'workers': config['workers'],
+            'torch_intra_op': config['torch_intra_op'],
+            'fps': round(fps, 2),
+        })
+        print(f"воркеров {config['workers']} x потоков {config['torch_intra_op']}: {fps:.2f} кадров/с", flush=True)
+
+    best = max(results, key=lambda item: (item['fps'], -item['workers']))
+    config = plan_threads(cpus)
+    config.update(workers=best['workers'], torch_intra_op=best['torch_intra_op'], opencv=best['torch_intra_op'])
+    config.update(
+        role='api',
+        clip=os.path.basename(clip_path),
+        fps=best['fps'],
+        results=results,
+        tuned_at=datetime.now().isoformat(timespec='seconds'),
+    )
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Автонастройка потоков torch, OpenCV и воркеров gunicorn")
+    parser.add_argument("--clip", required=True, help="Эталонное видео")
+    parser.add_argument("--output", default=TUNING_FILE, help="Файл автонастройки")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=1, help="Число замеряемых проходов на воркер")
+    parser.add_argument("--max-workers", type=int, default=TUNING_MAX_WORKERS)
+    args = parser.parse_args()
+
+    config = autotune(args.clip, args.conf, args.repeats, args.max_workers)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(
+        f"Выбрано: воркеров {config['workers']} x потоков {config['torch_intra_op']} "
+        f"({config['fps']} кадров/с), записано в {args.output}"
+    )
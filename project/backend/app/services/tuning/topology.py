@@ -0,0 +1,127 @@
+"""
+Доступные процессоры и распределение потоков между воркерами, torch и OpenCV
+
+Модуль не зависит от пакета app и сторонних библиотек: его загружает gunicorn.conf.py
+в мастер-процессе gunicorn, где приложение еще не импортировано.
+"""
+import json
+import math
+import os
+
+
+# Файл с конфигурацией, выбранной командой автонастройки (python -m app.services.tuning)
+TUNING_FILE = os.environ.get("TUNING_FILE", "config/tuning.json")
+# Наибольшее число воркеров gunicorn при автоматическом выборе
+TUNING_MAX_WORKERS = int(os.environ.get("TUNING_MAX_WORKERS", 4))
+# Число потоков обработки запросов в воркере gunicorn (запросы в основном ждут ввода-вывода)
+GUNICORN_THREADS_DEFAULT = 4
+
+# Переменные окружения, явно задающие параметры (важнее файла автонастройки)
+ENV_OVERRIDES = {
+    'workers': "WEB_CONCURRENCY",
+    'threads': "GUNICORN_THREADS",
+    'torch_intra_op': "TORCH_NUM_THREADS",
+    'torch_inter_op': "TORCH_INTEROP_THREADS",
+    'opencv': "OPENCV_NUM_THREADS",
+}
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota(root=""):
+    """
+    Квота процессора контейнера из cgroup (v2 или v1) в долях процессора
+
+    :param root: Префикс путей cgroup (для тестов)
+    :return: Например 0.3 для limits.cpu=300m; None - квота не задана
+    """
+    cpu_max = _read(root + CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota, period = _read(root + CGROUP_V1_QUOTA), _read(root + CGROUP_V1_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus(root=""):
+    """Число процессоров, доступных процессу: привязка к ядрам с учетом квоты cgroup (не меньше 1)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def plan_threads(cpus, role="api", inference_server=False):
+    """
+    Распределение потоков по умолчанию
+
+    role='api' - воркеры gunicorn: воркеров не больше процессоров (и TUNING_MAX_WORKERS),
+    потоки torch и OpenCV делят процессоры между воркерами поровну. Если инференс
+    выполняет сервер (inference_server=True), модель в воркерах не работает и torch
+    получает один поток. role='inference' - сервер инференса: один процесс, все
+    процессоры - torch.
+
+    :return: {'cpus', 'workers', 'threads', 'torch_intra_op', 'torch_inter_op', 'opencv'}
+    """
+    cpus = max(1, int(cpus))
+    if role == "inference":
+        workers = 1
+    else:
+        workers = max(1, min(cpus, TUNING_MAX_WORKERS))
+    share = max(1, cpus // workers)
+    return {
+        'cpus': cpus,
+        'workers': workers,
+        'threads': GUNICORN_THREADS_DEFAULT,
+        'torch_intra_op': 1 if inference_server and role != "inference" else share,
+        'torch_inter_op': 1,
+        'opencv': share,
+    }
+
+
+def load_config(role="api", tuning_file=None, environ=None):
+    """
+    Действующая конфигурация потоков
+
+    Порядок: переменные окружения (ENV_OVERRIDES), файл автонастройки (если он создан
+    для того же числа процессоров), распределение по умолчанию (plan_threads).
+
+    :return: Словарь plan_threads с полем 'source' ('auto', 'file' или 'env')
+    """
+    environ = os.environ if environ is None else environ
+    cpus = available_cpus()
+    config = plan_threads(cpus, role, inference_server=bool(environ.get("INFERENCE_SERVER_SOCKET")))
+    config['source'] = 'auto'
+
+    path = tuning_file or environ.get("TUNING_FILE", TUNING_FILE)
+    raw = _read(path) if path else None
+    if raw:
+        tuned = json.loads(raw)
+        if tuned.get('cpus') == cpus and role == tuned.get('role', 'api'):
+            config.update({key: int(tuned[key]) for key in ENV_OVERRIDES if key in tuned})
+            config['source'] = 'file'
+
+    for key, name in ENV_OVERRIDES.items():
+        if environ.get(name):
+            config[key] = int(environ[name])
+            config['source'] = 'env'
+    return config
@@ -0,0 +1,72 @@
+"""
+Применение конфигурации потоков torch и OpenCV в процессе
+"""
+import logging
+import sys
+import cv2
+from prometheus_client import Info
+from .topology import load_config
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+cpu_tuning_info = Info(
+    'cpu_tuning',
+    'CPU thread configuration in effect for the process'
+)
+
+# Конфигурация процесса (см. apply); torch настраивается по ней при загрузке модели
+_config = None
+
+
+def current_config():
+    """Действующая конфигурация процесса (до вызова apply - распределение по умолчанию)"""
+    return _config if _config is not None else load_config()
+
+
+def configure_torch(torch=None):
+    """
+    Число потоков torch по действующей конфигурации
+
+    Вызывается после импорта torch (при загрузке модели). Потоки между операциями
+    задаются только до первой параллельной операции torch; позже значение не меняется.
+    """
+    if torch is None:
+        torch = sys.modules.get('torch')
+        if torch is None:
+            return
+    config = current_config()
+    torch.set_num_threads(config['torch_intra_op'])
+    try:
+        torch.set_num_interop_threads(config['torch_inter_op'])
+    except RuntimeError:
+        logger.debug("Число потоков torch между операциями уже зафиксировано")
+
+
+def apply(config=None, role="api"):
+    """
+    Применение конфигурации: потоки OpenCV сразу, torch - сразу или при загрузке модели
+
+    :param config: Конфигурация (None - load_config(role))
+    :return: Примененная конфигурация
+    """
+    global _config
+    config = dict(config or load_config(role))
+    config.setdefault('role', role)
+    _config = config
+
+    cv2.setNumThreads(config['opencv'])
+    configure_torch()
+    cpu_tuning_info.info({key: str(value) for key, value in config.items()})
+    logger.info(
+        f"Конфигурация потоков ({config['source']}): процессоров {config['cpus']}, "
+        f"воркеров {config['workers']} x {config['threads']} потоков, "
+        f"torch {config['torch_intra_op']}/{config['torch_inter_op']}, OpenCV {config['opencv']}"
+    )
+    return config
@@ -0,0 +1,21 @@
+from .streaming import (
+    MAX_UPLOAD_SIZE,
+    UploadRejected,
+    UploadedVideo,
+    file_sha256,
+    receive_upload,
+    sniff_container
+)
+from . import presigned, resumable, sweeper
+
+__all__ = [
+    'MAX_UPLOAD_SIZE',
+    'UploadRejected',
+    'UploadedVideo',
+    'file_sha256',
+    'presigned',
+    'receive_upload',
+    'resumable',
+    'sniff_container',
+    'sweeper'
+]
@@ -0,0 +1,166 @@
+"""
+Загрузка видео клиентом напрямую в MinIO по временной ссылке (presigned PUT)
+
+API выдает ссылку на промежуточный объект (префикс staging/) в бакете загрузок и
+регистрирует загрузку в таблице upload_sessions; байты видео идут от клиента в MinIO,
+минуя API. После загрузки клиент вызывает завершение: MinIO копирует промежуточный
+объект под новое имя, на которое ссылки нет, и проверяется уже копия (размер и
+формат контейнера по первым байтам). Ссылка действует и после завершения, но
+перезапись промежуточного объекта не затрагивает проверенное видео. Задача
+обработки скачивает проверенную копию сама.
+
+Брошенные загрузки отменяет проверка (см. sweeper.py), а промежуточные объекты,
+записанные после завершения или отмены, удаляет правило жизненного цикла бакета.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+from app.services.minio import UPLOAD_STAGING_PREFIX
+from .resumable import UPLOAD_SESSION_EXPIRY_HOURS, check_total_size
+from .streaming import SNIFF_BYTES, UploadRejected, check_extension, sniff_container
+
+
+# Время жизни ссылки для загрузки, секунды
+UPLOAD_URL_EXPIRES = int(os.environ.get("UPLOAD_URL_EXPIRES", 3600))
+
+
+def staging_key(session):
+    """Промежуточный объект, в который клиент загружает видео по ссылке"""
+    return f"{UPLOAD_STAGING_PREFIX}{session['upload_id']}.{_extension(session['filename'])}"
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower()
+
+
+def start_upload(storage, db, user_id, filename, total_size, options=None):
+    """
+    Регистрация загрузки и создание ссылки для PUT
+
+    Ссылка не ограничивает размер тела, поэтому заявленный размер проверяется
+    при завершении загрузки.
+
+    :raises UploadRejected: Недопустимое имя или размер файла, хранилище или БД недоступны
+    :return: (запись загрузки, URL, время истечения ссылки)
+    """
+    check_extension(filename)
+    check_total_size(total_size)
+
+    upload_id = uuid.uuid4()
+    object_name = staging_key({'upload_id': upload_id, 'filename': filename})
+    expires = timedelta(seconds=UPLOAD_URL_EXPIRES)
+    url = storage.get_presigned_upload_url(object_name, expires)
+    if not url:
+        raise UploadRejected("Хранилище недоступно, повторите попытку позже", 503, 'storage')
+
+    success, error = db.create_upload_session(
+        upload_id, user_id, filename, storage.upload_bucket, object_name, None,
+        total_size, total_size, options, upload_type='presigned'
+    )
+    if not success:
+        raise UploadRejected(f"Не удалось зарегистрировать загрузку: {error}", 503, 'database')
+
+    session = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'filename': filename,
+        'bucket_name': storage.upload_bucket,
+        's3_key': object_name,
+        's3_upload_id': None,
+        'upload_type': 'presigned',
+        'total_size': total_size,
+        'part_size': total_size,
+        'parts': {},
+        'options': options or {},
+        'status': 'active',
+        'video_id': None,
+    }
+    return session, url, datetime.now() + expires
+
+
+def complete_upload(storage, db, session):
+    """
+    Проверка загруженного объекта и завершение загрузки
+
+    Проверяется копия объекта под новым именем: клиент может перезаписать объект по
+    ссылке, но не копию. Загрузка завершается условным UPDATE после проверки, и ее
+    объектом становится копия. Объект, не являющийся видео или не совпадающий по
+    размеру с заявленным, удаляется, а загрузка отменяется.
+
+    :raises UploadRejected: Объект не загружен, не совпадает размер, не видео, загрузка не активна
+    """
+    if session['status'] != 'active':
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    staged = staging_key(session)
+    if storage.get_object_size(session['bucket_name'], staged) is None:
+        raise UploadRejected("Видео еще не загружено по ссылке", 400, 'missing_parts')
+
+    object_name = f"{uuid.uuid4()}.{_extension(session['filename'])}"
+    try:
+        storage.copy_upload(staged, object_name)
+    except Exception as e:
+        raise UploadRejected(f"Не удалось сохранить загруженное видео: {e}", 503, 'storage')
+
+    size = storage.get_object_size(session['bucket_name'], object_name)
+    if size != session['total_size']:
+        storage.delete_upload(object_name)
+        _reject(storage, db, session)
+        raise UploadRejected(
+            f"Размер загруженного файла ({size} байт) не совпадает с заявленным ({session['total_size']} байт)",
+            400, 'malformed'
+        )
+    head = storage.get_object_range(session['bucket_name'], object_name, 0, min(SNIFF_BYTES, size))
+    if sniff_container(head) is None:
+        storage.delete_upload(object_name)
+        _reject(storage, db, session)
+        raise UploadRejected("Файл не является видео поддерживаемого формата", 415, 'not_video')
+
+    claimed, error = db.finish_upload_session(session['upload_id'], 'completed', s3_key=object_name)
+    if not claimed:
+        storage.delete_upload(object_name)
+        if error:
+            raise UploadRejected(f"Не удалось завершить загрузку: {error}", 503, 'database')
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    storage.delete_upload(staged)
+    session.update(status='completed', s3_key=object_name)
+
+
+def abort_upload(storage, db, session):
+    """Отмена загрузки: загруженный по ссылке объект удаляется"""
+    if session['status'] != 'active':
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    claimed, error = db.finish_upload_session(session['upload_id'], 'aborted')
+    if not claimed:
+        if error:
+            raise UploadRejected(f"Не удалось отменить загрузку: {error}", 503, 'database')
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    storage.delete_upload(staging_key(session))
+    session['status'] = 'aborted'
+
+
+def expire_uploads(storage, db, max_age_hours=None):
+    """
+    Отмена загрузок по ссылке, не завершенных за max_age_hours часов
+
+    :return: Число отмененных загрузок
+    """
+    max_age_hours = UPLOAD_SESSION_EXPIRY_HOURS if max_age_hours is None else max_age_hours
+    sessions, error = db.get_expired_upload_sessions('presigned', max_age_hours)
+    if error:
+        raise RuntimeError(f"Не удалось получить незавершенные загрузки: {error}")
+
+    expired = 0
+    for session in sessions:
+        try:
+            abort_upload(storage, db, session)
+            expired += 1
+        except UploadRejected:
+            # Загрузку завершил или отменил другой запрос
+            continue
+    return expired
+
+
+def _reject(storage, db, session):
+    db.finish_upload_session(session['upload_id'], 'aborted')
+    storage.delete_upload(staging_key(session))
+    session['status'] = 'aborted'
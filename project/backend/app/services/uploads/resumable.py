@@ -0,0 +1,240 @@
+"""
+Возобновляемая загрузка видео частями в составной объект MinIO
+
+Клиент начинает загрузку (start_upload), отправляет части отдельными запросами
+(store_part) в любом порядке и параллельно, а затем завершает загрузку
+(complete_upload). Каждая часть сразу передается в составную загрузку (multipart
+upload) MinIO, поэтому API держит в памяти не больше одной части на запрос, а при
+сбое повторяется только неудавшаяся часть. Состояние загрузки (ETag частей) хранится
+в таблице upload_sessions, так что части может принимать любой экземпляр API.
+"""
+import os
+import uuid
+from prometheus_client import Counter
+from .streaming import SNIFF_BYTES, UploadRejected, check_extension, sniff_container
+
+
+# Размер части; S3 требует не меньше 5 МБ для всех частей, кроме последней
+UPLOAD_PART_SIZE = max(int(os.environ.get("UPLOAD_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024)
+# Предельный размер видео, загружаемого в бакет загрузок (частями или по временной ссылке)
+MAX_RESUMABLE_UPLOAD_SIZE = int(os.environ.get("MAX_RESUMABLE_UPLOAD_SIZE", 20 * 1024 * 1024 * 1024))
+# Предельное число частей составного объекта S3
+MAX_UPLOAD_PARTS = 10000
+# Незавершенные загрузки старше этого срока отменяются (см. sweeper.py), часы
+UPLOAD_SESSION_EXPIRY_HOURS = float(os.environ.get("UPLOAD_SESSION_EXPIRY_HOURS", 24))
+
+upload_parts_total = Counter(
+    'upload_parts_total',
+    'Parts received by resumable uploads',
+    ['result']  # 'stored', 'rejected', 'failed'
+)
+
+
+def part_count(total_size, part_size):
+    """Число частей видео размером total_size"""
+    return max(1, -(-total_size // part_size))
+
+
+def expected_part_size(session, part_number):
+    """Размер части с номером part_number (последняя часть короче остальных)"""
+    count = part_count(session['total_size'], session['part_size'])
+    if part_number < count:
+        return session['part_size']
+    return session['total_size'] - session['part_size'] * (count - 1)
+
+
+def received_parts(session):
+    """Словарь {номер части: ETag} загруженных частей"""
+    return {int(number): etag for number, etag in (session.get('parts') or {}).items()}
+
+
+def missing_parts(session):
+    """Номера частей, которые еще не загружены"""
+    received = received_parts(session)
+    count = part_count(session['total_size'], session['part_size'])
+    return [number for number in range(1, count + 1) if number not in received]
+
+
+def describe(session):
+    """Состояние загрузки для ответа API (части - только для загрузки через API)"""
+    response = {
+        "upload_id": str(session['upload_id']),
+        "type": session.get('upload_type', 'multipart'),
+        "status": session['status'],
+        "filename": session['filename'],
+        "size": session['total_size'],
+        "job_id": str(session['video_id']) if session.get('video_id') else None,
+    }
+    if response["type"] == 'multipart':
+        response.update(
+            part_size=session['part_size'],
+            part_count=part_count(session['total_size'], session['part_size']),
+            received_parts=sorted(received_parts(session)),
+            missing_parts=missing_parts(session),
+        )
+    return response
+
+
+def check_total_size(total_size):
+    """Проверка заявленного размера видео (UploadRejected - недопустимый размер)"""
+    if not isinstance(total_size, int) or isinstance(total_size, bool) or total_size <= 0:
+        raise UploadRejected("Размер файла (size) должен быть положительным целым числом", 400, 'malformed')
+    if total_size > MAX_RESUMABLE_UPLOAD_SIZE:
+        raise UploadRejected(
+            f"Файл слишком большой. Максимальный размер: {MAX_RESUMABLE_UPLOAD_SIZE / (1024 * 1024)} МБ",
+            413, 'too_large'
+        )
+
+
+def start_upload(storage, db, user_id, filename, total_size, options=None):
+    """
+    Начало загрузки: составная загрузка в MinIO и запись в upload_sessions
+
+    :param options: Параметры обработки (imgsz, render), применяемые после завершения загрузки
+    :raises UploadRejected: Недопустимое имя или размер файла, хранилище или БД недоступны
+    :return: Запись загрузки (как get_upload_session)
+    """
+    check_extension(filename)
+    check_total_size(total_size)
+    part_size = max(UPLOAD_PART_SIZE, -(-total_size // MAX_UPLOAD_PARTS))
+
+    upload_id = uuid.uuid4()
+    extension = filename.rsplit('.', 1)[1].lower()
+    object_name = f"{upload_id}.{extension}"
+    s3_upload_id = storage.create_multipart_upload(object_name)
+    if not s3_upload_id:
+        raise UploadRejected("Хранилище недоступно, повторите попытку позже", 503, 'storage')
+
+    success, error = db.create_upload_session(
+        upload_id, user_id, filename, storage.upload_bucket, object_name, s3_upload_id,
+        total_size, part_size, options
+    )
+    if not success:
+        storage.abort_multipart_upload(object_name, s3_upload_id)
+        raise UploadRejected(f"Не удалось зарегистрировать загрузку: {error}", 503, 'database')
+
+    return {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'filename': filename,
+        'bucket_name': storage.upload_bucket,
+        's3_key': object_name,
+        's3_upload_id': s3_upload_id,
+        'upload_type': 'multipart',
+        'total_size': total_size,
+        'part_size': part_size,
+        'parts': {},
+        'options': options or {},
+        'status': 'active',
+        'video_id': None,
+    }
+
+
+def store_part(storage, db, session, part_number, data):
+    """
+    Передача части в составную загрузку MinIO
+
+    Первая часть проверяется на формат контейнера: загрузка файла, не являющегося
+    видео, отменяется целиком.
+
+    :raises UploadRejected: Загрузка не активна, неверный номер или размер части, не видео
+    :return: ETag части
+    """
+    if session.get('upload_type', 'multipart') != 'multipart':
+        raise UploadRejected("Видео этой загрузки передается по временной ссылке, а не частями", 400, 'malformed')
+    if session['status'] != 'active':
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    count = part_count(session['total_size'], session['part_size'])
+    if not 1 <= part_number <= count:
+        raise UploadRejected(f"Номер части должен быть от 1 до {count}", 400, 'malformed')
+    expected = expected_part_size(session, part_number)
+    if len(data) != expected:
+        upload_parts_total.labels(result='rejected').inc()
+        raise UploadRejected(f"Размер части {part_number} должен быть {expected} байт", 400, 'malformed')
+    if part_number == 1 and sniff_container(data[:SNIFF_BYTES]) is None:
+        upload_parts_total.labels(result='rejected').inc()
+        abort_upload(storage, db, session)
+        raise UploadRejected("Файл не является видео поддерживаемого формата", 415, 'not_video')
+
+    try:
+        etag = storage.upload_part(session['s3_key'], session['s3_upload_id'], part_number, data)
+    except Exception as e:
+        upload_parts_total.labels(result='failed').inc()
+        raise UploadRejected(f"Не удалось сохранить часть {part_number}: {e}", 503, 'storage')
+
+    stored, error = db.save_upload_part(session['upload_id'], part_number, etag)
+    if not stored:
+        upload_parts_total.labels(result='failed').inc()
+        if error:
+            raise UploadRejected(f"Не удалось сохранить часть {part_number}: {error}", 503, 'database')
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    upload_parts_total.labels(result='stored').inc()
+    return etag
+
+
+def complete_upload(storage, db, session):
+    """
+    Сборка объекта из частей
+
+    Загрузку завершает только один запрос: статус меняется на 'completed' условным
+    UPDATE до сборки. Если сборка не удалась, загрузка снова становится активной.
+
+    :raises UploadRejected: Загружены не все части, загрузка не активна, ошибка хранилища
+    """
+    if session['status'] != 'active':
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    missing = missing_parts(session)
+    if missing:
+        raise UploadRejected(f"Не загружены части: {', '.join(map(str, missing[:20]))}", 400, 'missing_parts')
+
+    claimed, error = db.finish_upload_session(session['upload_id'], 'completed')
+    if not claimed:
+        if error:
+            raise UploadRejected(f"Не удалось завершить загрузку: {error}", 503, 'database')
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+
+    try:
+        storage.complete_multipart_upload(session['s3_key'], session['s3_upload_id'], received_parts(session))
+    except Exception as e:
+        db.reopen_upload_session(session['upload_id'])
+        raise UploadRejected(f"Не удалось собрать видео из частей: {e}", 503, 'storage')
+    session['status'] = 'completed'
+
+
+def abort_upload(storage, db, session):
+    """
+    Отмена загрузки: части удаляются из MinIO
+
+    Части удаляются, только если загрузку не завершил параллельный запрос.
+    """
+    if session['status'] != 'active':
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    claimed, error = db.finish_upload_session(session['upload_id'], 'aborted')
+    if not claimed:
+        if error:
+            raise UploadRejected(f"Не удалось отменить загрузку: {error}", 503, 'database')
+        raise UploadRejected("Загрузка уже завершена или отменена", 409, 'not_active')
+    storage.abort_multipart_upload(session['s3_key'], session['s3_upload_id'])
+    session['status'] = 'aborted'
+
+
+def expire_uploads(storage, db, max_age_hours=None):
+    """
+    Отмена брошенных загрузок частями, начатых больше max_age_hours часов назад
+
+    :return: Число отмененных загрузок
+    """
+    max_age_hours = UPLOAD_SESSION_EXPIRY_HOURS if max_age_hours is None else max_age_hours
+    sessions, error = db.get_expired_upload_sessions('multipart', max_age_hours)
+    if error:
+        raise RuntimeError(f"Не удалось получить незавершенные загрузки: {error}")
+
+    expired = 0
+    for session in sessions:
+        try:
+            abort_upload(storage, db, session)
+            expired += 1
+        except UploadRejected:
+            # Загрузку завершил или отменил другой запрос
+            continue
+    return expired
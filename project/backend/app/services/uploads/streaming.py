@@ -0,0 +1,232 @@
+"""
+Потоковый прием видео из тела multipart/form-data запроса
+
+Тело запроса разбирается по мере чтения (werkzeug MultipartDecoder), без
+предварительной буферизации формы: файл пишется блоками сразу в рабочий каталог
+задачи, одновременно считается SHA-256 и по первым байтам определяется формат
+контейнера. Слишком большие загрузки отклоняются по заголовку Content-Length до
+чтения тела или как только прочитанный объем превысит предел; файлы, не
+являющиеся видео, - после первого блока. В памяти одновременно находится не
+больше одного блока файла и текстовые поля формы (не больше MAX_FORM_FIELDS_SIZE).
+"""
+import hashlib
+import os
+import time
+from collections import namedtuple
+from prometheus_client import Counter, Histogram
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+
+# Предельный размер загружаемого видео, байты
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 100 * 1024 * 1024))
+# Размер блока чтения тела запроса
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Предельный суммарный размер текстовых полей формы (mode, imgsz, render...)
+MAX_FORM_FIELDS_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = ('mp4', 'avi', 'mov', 'mkv')
+# Число первых байт файла, по которым определяется контейнер
+SNIFF_BYTES = 12
+
+upload_rejected_total = Counter(
+    'upload_rejected_total',
+    'Uploads rejected before processing',
+    ['reason']  # 'too_large', 'not_video', 'extension', 'malformed', 'no_file'
+)
+
+upload_receive_seconds = Histogram(
+    'upload_receive_seconds',
+    'Time spent receiving and storing an uploaded video',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+UploadedVideo = namedtuple('UploadedVideo', ['path', 'filename', 'size', 'sha256', 'container', 'fields'])
+
+
+class UploadRejected(Exception):
+    """Загрузка отклонена; status - код ответа HTTP"""
+
+    def __init__(self, message, status=400, reason='malformed'):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+def sniff_container(head):
+    """
+    Формат контейнера по первым байтам файла
+
+    :return: 'mp4', 'mov', 'avi', 'mkv' или None, если это не видео известного формата
+    """
+    if len(head) >= 12 and head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+        return 'mov' if head[8:12] == b'qt  ' else 'mp4'
+    if len(head) >= 12 and head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'avi'
+    if head[:4] == b'\x1aE\xdf\xa3':
+        return 'mkv'
+    return None
+
+
+def check_extension(filename):
+    """Проверка расширения имени файла (UploadRejected - недопустимое расширение)"""
+    if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadRejected(
+            "Недопустимый формат файла. Разрешены только видеофайлы (.mp4, .avi, .mov, .mkv)", 400, 'extension'
+        )
+
+
+def file_sha256(path):
+    """SHA-256 содержимого файла (чтение блоками)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _too_large(max_size):
+    return UploadRejected(
+        f"Файл слишком большой. Максимальный размер: {max_size / (1024 * 1024)} МБ", 413, 'too_large'
+    )
+
+
+class _FileSink:
+    """Запись файла блоками с подсчетом размера, хэша и определением контейнера"""
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.container = None
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise _too_large(self.max_size)
+        if self.container is None and len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_container()
+        self._digest.update(data)
+        self._file.write(data)
+
+    def _check_container(self):
+        self.container = sniff_container(self._head)
+        if self.container is None:
+            raise UploadRejected("Файл не является видео поддерживаемого формата", 415, 'not_video')
+
+    def finish(self):
+        self._file.close()
+        if self.container is None:
+            self._check_container()
+        return self._digest.hexdigest()
+
+    def close(self):
+        self._file.close()
+
+
+def receive_upload(stream, content_type, content_length, directory, max_size=None, field_name='file'):
+    """
+    Прием видео из тела запроса multipart/form-data
+
+    Файл сохраняется в directory под именем upload.<расширение>. Текстовые поля формы
+    возвращаются словарем; поля могут идти как до, так и после файла.
+
+    :param stream: Поток тела запроса (request.stream)
+    :param content_length: Значение Content-Length (None - передача без длины)
+    :param max_size: Предельный размер файла, байты (None - MAX_UPLOAD_SIZE)
+    :raises UploadRejected: Загрузка отклонена (частично записанный файл удаляется)
+    :return: UploadedVideo
+    """
+    started = time.perf_counter()
+    try:
+        result = _receive(stream, content_type, content_length, directory, max_size or MAX_UPLOAD_SIZE, field_name)
+    except UploadRejected as e:
+        upload_rejected_total.labels(reason=e.reason).inc()
+        raise
+    upload_receive_seconds.observe(time.perf_counter() - started)
+    return result
+
+
+def _receive(stream, content_type, content_length, directory, max_size, field_name):
+    mimetype, options = parse_options_header(content_type or '')
+    if mimetype != 'multipart/form-data' or not options.get('boundary'):
+        raise UploadRejected("Ожидается тело запроса multipart/form-data с полем file", 400, 'malformed')
+    if content_length is not None and content_length > max_size + MAX_FORM_FIELDS_SIZE:
+        # Тело заведомо больше предела: отказ до чтения
+        raise _too_large(max_size)
+
+    # Предел буфера декодера: один прочитанный блок и поля формы; размер полей проверяется отдельно
+    decoder = MultipartDecoder(
+        options['boundary'].encode('latin-1'), max_form_memory_size=UPLOAD_CHUNK_SIZE + MAX_FORM_FIELDS_SIZE
+    )
+    fields = {}
+    fields_size = 0
+    part = None
+    value = None
+    sink = None
+    upload = None
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    part, value = event, []
+                elif isinstance(event, File):
+                    part, value = event, None
+                    if event.name == field_name and sink is None and upload is None:
+                        if not event.filename:
+                            raise UploadRejected("No selected file", 400, 'no_file')
+                        check_extension(event.filename)
+                        extension = event.filename.rsplit('.', 1)[1].lower()
+                        sink = _FileSink(os.path.join(directory, f"upload.{extension}"), max_size)
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        fields_size += len(event.data)
+                        if fields_size > MAX_FORM_FIELDS_SIZE:
+                            raise UploadRejected("Слишком большие поля формы", 413, 'too_large')
+                        value.append(event.data)
+                        if not event.more_data:
+                            fields[part.name] = b''.join(value).decode('utf-8', 'replace')
+                    elif sink is not None and part.name == field_name and upload is None:
+                        sink.write(event.data)
+                        if not event.more_data:
+                            sha256 = sink.finish()
+                            upload = (sink.path, part.filename, sink.size, sha256, sink.container)
+                            sink = None
+                event = decoder.next_event()
+            if not chunk or isinstance(event, Epilogue):
+                break
+    except UploadRejected:
+        _discard(sink)
+        raise
+    except RequestEntityTooLarge:
+        _discard(sink)
+        raise UploadRejected("Слишком большие поля формы", 413, 'too_large')
+    except Exception as e:
+        _discard(sink)
+        raise UploadRejected(f"Некорректное тело запроса: {e}", 400, 'malformed')
+
+    if sink is not None:
+        # Тело оборвалось посреди файла
+        _discard(sink)
+        raise UploadRejected("Тело запроса оборвано", 400, 'malformed')
+    if upload is None:
+        raise UploadRejected("No file part", 400, 'no_file')
+    if upload[2] == 0:
+        os.remove(upload[0])
+        raise UploadRejected("No selected file", 400, 'no_file')
+    return UploadedVideo(*upload, fields)
+
+
+def _discard(sink):
+    if sink is not None:
+        sink.close()
+        if os.path.exists(sink.path):
+            os.remove(sink.path)
@@ -0,0 +1,77 @@
+"""
+Периодическая отмена брошенных загрузок
+
+Клиент может начать загрузку и не завершить ее: части составной загрузки или
+объект, загруженный по ссылке, остаются в MinIO, а запись - в таблице
+upload_sessions. Фоновый поток раз в UPLOAD_SWEEP_INTERVAL секунд отменяет
+незавершенные загрузки старше UPLOAD_SESSION_EXPIRY_HOURS часов. Поток
+запускается в каждом воркере API: загрузку отменяет только один из них
+(условный UPDATE статуса).
+"""
+import logging
+import os
+import threading
+from prometheus_client import Counter
+from . import presigned, resumable
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+uploads_expired_total = Counter(
+    'uploads_expired_total',
+    'Abandoned uploads aborted by the sweeper',
+    ['type']  # 'multipart', 'presigned'
+)
+
+# Интервал проверки незавершенных загрузок, секунды
+UPLOAD_SWEEP_INTERVAL = float(os.environ.get("UPLOAD_SWEEP_INTERVAL", 3600))
+# Задержка первой проверки после запуска (пока подключаются БД и хранилище), секунды
+UPLOAD_SWEEP_DELAY = 60
+
+_thread = None
+_lock = threading.Lock()
+
+
+def sweep(storage, db):
+    """Одна проверка: отмена брошенных загрузок всех типов, возвращает их число"""
+    total = 0
+    for upload_type, flow in (('multipart', resumable), ('presigned', presigned)):
+        expired = flow.expire_uploads(storage, db)
+        uploads_expired_total.labels(type=upload_type).inc(expired)
+        if expired:
+            logger.info(f"Отменено брошенных загрузок ({upload_type}): {expired}")
+        total += expired
+    return total
+
+
+def _loop(storage, db, interval, stop):
+    delay = min(interval, UPLOAD_SWEEP_DELAY)
+    while not stop.wait(delay):
+        try:
+            sweep(storage, db)
+        except Exception as e:
+            logger.warning(f"Не удалось отменить брошенные загрузки: {e}")
+        delay = interval
+
+
+def start(storage, db, interval=UPLOAD_SWEEP_INTERVAL):
+    """
+    Запуск фонового потока проверки (один на процесс)
+
+    :return: Событие, установка которого останавливает поток
+    """
+    global _thread
+    with _lock:
+        if _thread is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=_loop, args=(storage, db, interval, stop), name="upload-sweeper", daemon=True)
+            thread.start()
+            _thread = (thread, stop)
+            logger.info(f"Запущена проверка брошенных загрузок каждые {interval} с")
+        return _thread[1]
@@ -0,0 +1,139 @@
+"""
+Компактный формат лога обнаружений
+
+Исходный лог (версия 1) - список [номер_кадра, оружие, нож] для каждого выбранного
+кадра. Версия 2 хранит то же содержимое в виде серий:
+
+    {
+        "format": "detection-log",
+        "version": 2,
+        "fps": 25.0,
+        "total_frames": 90000,
+        "sampled": [[первый_кадр, шаг, число_кадров], ...],
+        "classes": {"weapon": [[первый_кадр, последний_кадр], ...], "knife": [...]},
+        "summary": {"sampled_frames": ..., "detection_frames": ..., "weapon_frames": ..., "knife_frames": ...}
+    }
+
+sampled - номера выбранных кадров, сжатые в арифметические прогрессии; classes -
+отрезки подряд идущих выбранных кадров, на которых найден класс. Выбранный кадр
+содержит класс тогда и только тогда, когда попадает в один из его отрезков,
+поэтому лог версии 1 восстанавливается без потерь (см. expand).
+"""
+
+FORMAT_NAME = "detection-log"
+FORMAT_VERSION = 2
+CLASSES = ("weapon", "knife")
+
+
+def is_compact(log):
+    """Лог в компактном формате (версия 2 и новее)"""
+    return isinstance(log, dict) and log.get("format") == FORMAT_NAME
+
+
+def is_valid(log):
+    """Лог в одном из поддерживаемых форматов"""
+    return isinstance(log, list) or (is_compact(log) and log.get("version") == FORMAT_VERSION)
+
+
+def _encode_sampled(indices):
+    runs = []
+    for index in indices:
+        if runs:
+            start, step, count = runs[-1]
+            last = start + step * (count - 1)
+            if count == 1 and index > last:
+                runs[-1] = [start, index - start, 2]
+                continue
+            if index - last == step:
+                runs[-1][2] += 1
+                continue
+        runs.append([index, 1, 1])
+    return runs
+
+
+def _encode_class(frame_objects, position):
+    segments = []
+    previous_present = False
+    for item in frame_objects:
+        present = bool(item[position])
+        if present:
+            if previous_present:
+                segments[-1][1] = item[0]
+            else:
+                segments.append([item[0], item[0]])
+        previous_present = present
+    return segments
+
+
+def encode(frame_objects, fps=None, total_frames=None):
+    """
+    Преобразование лога версии 1 (список [кадр, оружие, нож]) в компактный формат
+
+    Уже компактный лог возвращается без изменений.
+    """
+    if is_compact(frame_objects):
+        return frame_objects
+
+    frame_objects = sorted(frame_objects, key=lambda item: item[0])
+    classes = {name: _encode_class(frame_objects, position) for position, name in enumerate(CLASSES, start=1)}
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "fps": float(fps) if fps else None,
+        "total_frames": int(total_frames) if total_frames else None,
+        "sampled": _encode_sampled(item[0] for item in frame_objects),
+        "classes": classes,
+        "summary": summarize(frame_objects),
+    }
+
+
+def _iter_sampled(runs):
+    for start, step, count in runs:
+        for number in range(count):
+            yield start + step * number
+
+
+def sampled_frames(log):
+    """Номера выбранных (прошедших инференс) кадров лога любого формата"""
+    if not is_compact(log):
+        return [item[0] for item in log]
+    return list(_iter_sampled(log["sampled"]))
+
+
+def expand(log):
+    """
+    Лог версии 1: список [номер_кадра, оружие, нож] для каждого выбранного кадра
+
+    Принимает логи обоих форматов.
+    """
+    if not is_compact(log):
+        return [list(item) for item in log]
+    if log.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия лога обнаружений: {log.get('version')}")
+
+    cursors = {name: iter(log["classes"].get(name, [])) for name in CLASSES}
+    current = {name: next(cursors[name], None) for name in CLASSES}
+    frame_objects = []
+    for index in _iter_sampled(log["sampled"]):
+        flags = []
+        for name in CLASSES:
+            while current[name] is not None and current[name][1] < index:
+                current[name] = next(cursors[name], None)
+            flags.append(current[name] is not None and current[name][0] <= index)
+        frame_objects.append([index] + flags)
+    return frame_objects
+
+
+def summarize(log):
+    """Сводка лога любого формата: число выбранных кадров и кадров с обнаружениями"""
+    if is_compact(log):
+        return dict(log["summary"])
+
+    weapon_frames = sum(1 for item in log if item[1])
+    knife_frames = sum(1 for item in log if item[2])
+    return {
+        "sampled_frames": len(log),
+        "detection_frames": sum(1 for item in log if item[1] or item[2]),
+        "weapon_frames": weapon_frames,
+        "knife_frames": knife_frames,
+    }
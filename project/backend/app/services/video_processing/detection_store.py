@@ -0,0 +1,289 @@
+"""
+Колоночное хранение всех обнаружений видео (кадр, класс, уверенность, рамка)
+
+Формат файла:
+
+    [блок 0][блок 1]...[оглавление JSON][длина оглавления, uint64 LE][MAGIC]
+
+Блок содержит строки нескольких кадров подряд; колонки блока (frame uint32,
+cls uint16, score float32, xyxy float32 x 4) записаны друг за другом. Оглавление
+хранит для каждого блока диапазон кадров, набор классов и смещения колонок, поэтому
+читатель загружает только оглавление и блоки нужного интервала времени или класса
+запросами с диапазоном байт (Range) к MinIO.
+"""
+import json
+import os
+import struct
+import numpy as np
+
+
+FORMAT_NAME = "detection-columns"
+FORMAT_VERSION = 1
+MAGIC = b"DETCOL01"
+_TRAILER = struct.Struct("<Q8s")
+
+COLUMNS = (
+    ("frame", np.dtype("<u4"), 1),
+    ("cls", np.dtype("<u2"), 1),
+    ("score", np.dtype("<f4"), 1),
+    ("xyxy", np.dtype("<f4"), 4),
+)
+
+# Число строк в блоке: меньше - точнее выборка интервала, больше - меньше оглавление
+DETECTIONS_CHUNK_ROWS = int(os.environ.get("DETECTIONS_CHUNK_ROWS", 4096))
+# Нижний порог уверенности сохраняемых обнаружений: порог выше него применяется
+# к сохраненным данным без повторного инференса (см. evaluate_threshold)
+DETECTIONS_FLOOR_CONF = float(os.environ.get("DETECTIONS_FLOOR_CONF", 0.1))
+
+
+def detections_object_name(video_filename):
+    """Имя объекта с обнаружениями в бакете логов (рядом с JSON логом)"""
+    return f"{video_filename}.detections"
+
+
+class DetectionWriter:
+    """
+    Запись обнаружений в колоночный файл
+
+    add() только складывает массивы кадра в буфер; запись на диск выполняется
+    блоками по chunk_rows строк. Кадры должны поступать в порядке возрастания.
+
+    :param min_score: Порог уверенности, с которым получены обнаружения (пишется в оглавление)
+    """
+
+    def __init__(self, path, fps=None, class_names=None, chunk_rows=DETECTIONS_CHUNK_ROWS, min_score=None):
+        self.path = path
+        self.fps = float(fps) if fps else None
+        self.min_score = min_score
+        self.class_names = {int(key): value for key, value in (class_names or {}).items()}
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._buffers = {name: [] for name, _, _ in COLUMNS}
+        self._pending = 0
+        self._chunks = []
+
+    def add(self, frame_index, detections):
+        """Добавление обнаружений одного кадра (Detections)"""
+        count = len(detections.cls)
+        if not count:
+            return
+        self._buffers["frame"].append(np.full(count, frame_index, dtype=np.uint32))
+        self._buffers["cls"].append(np.asarray(detections.cls, dtype=np.uint16))
+        self._buffers["score"].append(np.asarray(detections.conf, dtype=np.float32))
+        self._buffers["xyxy"].append(np.asarray(detections.xyxy, dtype=np.float32).reshape(count, 4))
+        self._pending += count
+        if self._pending >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        arrays = {name: np.concatenate(self._buffers[name]) for name, _, _ in COLUMNS}
+        offset = self._file.tell()
+        columns = {}
+        for name, dtype, _ in COLUMNS:
+            data = arrays[name].astype(dtype, copy=False).tobytes()
+            columns[name] = [self._file.tell(), len(data)]
+            self._file.write(data)
+        self._chunks.append({
+            "first_frame": int(arrays["frame"][0]),
+            "last_frame": int(arrays["frame"][-1]),
+            "rows": self._pending,
+            "offset": offset,
+            "length": self._file.tell() - offset,
+            "classes": sorted(int(value) for value in np.unique(arrays["cls"])),
+            "max_score": float(arrays["score"].max()),
+            "columns": columns,
+        })
+        self.rows += self._pending
+        self._buffers = {name: [] for name, _, _ in COLUMNS}
+        self._pending = 0
+
+    def append_file(self, path):
+        """
+        Добавление блоков другого файла (например, отрезка видео) без разбора строк
+
+        Блоки копируются побайтно, смещения пересчитываются.
+        """
+        self._flush()
+        reader = DetectionReader.from_file(path)
+        if self.fps is None:
+            self.fps = reader.fps
+        if not self.class_names:
+            self.class_names = dict(reader.class_names)
+        if reader.min_score is not None:
+            self.min_score = max(self.min_score or 0.0, reader.min_score)
+
+        with open(path, "rb") as source:
+            for chunk in reader.chunks:
+                source.seek(chunk["offset"])
+                shift = self._file.tell() - chunk["offset"]
+                self._file.write(source.read(chunk["length"]))
+                moved = dict(chunk, offset=chunk["offset"] + shift)
+                moved["columns"] = {name: [start + shift, length] for name, (start, length) in chunk["columns"].items()}
+                self._chunks.append(moved)
+                self.rows += chunk["rows"]
+
+    def close(self):
+        """Запись оставшихся строк и оглавления; возвращает число строк"""
+        self._flush()
+        footer = json.dumps({
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "fps": self.fps,
+            "min_score": self.min_score,
+            "class_names": {str(key): value for key, value in self.class_names.items()},
+            "rows": self.rows,
+            "columns": {name: [dtype.str, width] for name, dtype, width in COLUMNS},
+            "chunks": self._chunks,
+        }).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(len(footer), MAGIC))
+        self._file.close()
+        return self.rows
+
+
+class DetectionReader:
+    """
+    Чтение колоночного файла обнаружений
+
+    :param read_range: Функция (смещение, длина) -> bytes
+    :param size: Размер файла в байтах
+    """
+
+    def __init__(self, read_range, size):
+        self.read_range = read_range
+        footer_length, magic = _TRAILER.unpack(read_range(size - _TRAILER.size, _TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError("Файл не является колоночным файлом обнаружений")
+        footer = json.loads(read_range(size - _TRAILER.size - footer_length, footer_length))
+        if footer.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия файла обнаружений: {footer.get('version')}")
+
+        self.fps = footer["fps"]
+        self.min_score = footer.get("min_score")
+        self.class_names = {int(key): value for key, value in footer["class_names"].items()}
+        self.rows = footer["rows"]
+        self.chunks = footer["chunks"]
+
+    @classmethod
+    def from_file(cls, path):
+        def read_range(offset, length):
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        return cls(read_range, os.path.getsize(path))
+
+    @classmethod
+    def from_storage(cls, storage, bucket_name, object_name):
+        """Чтение объекта MinIO запросами с диапазоном байт"""
+        size = storage.get_object_size(bucket_name, object_name)
+        if size is None:
+            raise FileNotFoundError(f"Объект {object_name} не найден в бакете {bucket_name}")
+        return cls(lambda offset, length: storage.get_object_range(bucket_name, object_name, offset, length), size)
+
+    def class_ids(self, classes):
+        """Идентификаторы классов по именам (или идентификаторам)"""
+        by_name = {name: key for key, name in self.class_names.items()}
+        ids = set()
+        for value in classes:
+            if isinstance(value, str) and not value.isdigit():
+                if value in by_name:
+                    ids.add(by_name[value])
+            else:
+                ids.add(int(value))
+        return ids
+
+    def read(self, start_frame=None, end_frame=None, classes=None, min_score=None):
+        """
+        Обнаружения на кадрах [start_frame, end_frame) нужных классов
+
+        Загружаются только блоки, пересекающие интервал, содержащие нужные классы и
+        обнаружения с уверенностью не ниже min_score; соседние блоки читаются одним запросом.
+
+        :param classes: Имена или идентификаторы классов (None - все)
+        :param min_score: Порог уверенности (None - все сохраненные обнаружения)
+        :return: Словарь колонок {'frame', 'cls', 'score', 'xyxy'}
+        """
+        class_ids = self.class_ids(classes) if classes is not None else None
+        selected = [
+            chunk for chunk in self.chunks
+            if (start_frame is None or chunk["last_frame"] >= start_frame)
+            and (end_frame is None or chunk["first_frame"] < end_frame)
+            and (class_ids is None or class_ids.intersection(chunk["classes"]))
+            and (min_score is None or chunk["max_score"] >= min_score)
+        ]
+
+        parts = {name: [] for name, _, _ in COLUMNS}
+        for group in self._coalesce(selected):
+            base = group[0]["offset"]
+            data = self.read_range(base, group[-1]["offset"] + group[-1]["length"] - base)
+            for chunk in group:
+                for name, dtype, width in COLUMNS:
+                    start, length = chunk["columns"][name]
+                    column = np.frombuffer(data, dtype=dtype, count=length // dtype.itemsize, offset=start - base)
+                    parts[name].append(column.reshape(-1, width) if width > 1 else column)
+
+        result = {}
+        for name, dtype, width in COLUMNS:
+            if parts[name]:
+                result[name] = np.concatenate(parts[name])
+            else:
+                result[name] = np.empty((0, width) if width > 1 else 0, dtype=dtype)
+
+        mask = np.ones(len(result["frame"]), dtype=bool)
+        if start_frame is not None:
+            mask &= result["frame"] >= start_frame
+        if end_frame is not None:
+            mask &= result["frame"] < end_frame
+        if class_ids is not None:
+            mask &= np.isin(result["cls"], list(class_ids))
+        if min_score is not None:
+            mask &= result["score"] >= min_score
+        if not mask.all():
+            result = {name: values[mask] for name, values in result.items()}
+        return result
+
+    def read_window(self, start_seconds=None, end_seconds=None, classes=None, min_score=None):
+        """Обнаружения в интервале времени [start_seconds, end_seconds)"""
+        fps = self.fps or 1.0
+        start_frame = int(np.ceil(start_seconds * fps)) if start_seconds is not None else None
+        end_frame = int(np.ceil(end_seconds * fps)) if end_seconds is not None else None
+        return self.read(start_frame, end_frame, classes, min_score)
+
+    @staticmethod
+    def _coalesce(chunks):
+        groups = []
+        for chunk in chunks:
+            if groups and groups[-1][-1]["offset"] + groups[-1][-1]["length"] == chunk["offset"]:
+                groups[-1].append(chunk)
+            else:
+                groups.append([chunk])
+        return groups
+
+
+def evaluate_threshold(columns, class_names, sampled_frames, conf):
+    """
+    Пересчет результата обработки при другом пороге уверенности
+
+    :param columns: Колонки обнаружений (DetectionReader.read, можно уже с min_score=conf)
+    :param sampled_frames: Номера кадров, прошедших инференс (из лога обнаружений)
+    :return: (frame_objects [(кадр, оружие, нож)], {'weapon', 'knife'} - число объектов)
+    """
+    keep = columns["score"] >= conf
+    frames = columns["frame"][keep]
+    classes = columns["cls"][keep]
+    ids = {name: [key for key, value in class_names.items() if value == name] for name in ("weapon", "knife")}
+
+    counters = {}
+    present = {}
+    for name, class_ids in ids.items():
+        mask = np.isin(classes, class_ids)
+        counters[name] = int(mask.sum())
+        present[name] = set(frames[mask].tolist())
+
+    frame_objects = [
+        (index, index in present["weapon"], index in present["knife"]) for index in sampled_frames
+    ]
+    return frame_objects, counters
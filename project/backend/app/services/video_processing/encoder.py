@@ -0,0 +1,129 @@
+import cv2
+import logging
+import os
+import shutil
+import subprocess
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+FFMPEG_PRESET = os.environ.get("FFMPEG_PRESET", "veryfast")
+FFMPEG_CRF = os.environ.get("FFMPEG_CRF", "23")
+
+# Контейнеры, звук из которых можно без перекодирования положить в MP4
+AUDIO_COPY_CONTAINERS = (".mp4", ".m4v", ".mov")
+
+
+def find_ffmpeg():
+    """
+    Поиск исполняемого файла ffmpeg
+
+    Порядок: переменная FFMPEG_BINARY, сборка из пакета imageio-ffmpeg, ffmpeg из PATH.
+    """
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+class FfmpegWriter:
+    """
+    Кодирование кадров в MP4/H.264 за один проход через канал ffmpeg
+
+    Кадры BGR передаются в stdin ffmpeg как rawvideo. Если указан audio_source,
+    звуковая дорожка исходника добавляется в результат: для MP4/MOV копированием
+    потока, для остальных контейнеров - перекодированием в AAC.
+    """
+
+    def __init__(self, output_path, fps, frame_size, audio_source=None, ffmpeg_binary=None):
+        binary = ffmpeg_binary or find_ffmpeg()
+        if not binary:
+            raise RuntimeError("ffmpeg не найден")
+
+        width, height = frame_size
+        command = [
+            binary, "-y", "-loglevel", "error", "-nostats",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:.6f}",
+            "-i", "-",
+        ]
+        if audio_source:
+            audio_codec = "copy" if audio_source.lower().endswith(AUDIO_COPY_CONTAINERS) else "aac"
+            command += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", audio_codec, "-shortest"]
+        if width % 2 or height % 2:
+            # yuv420p требует четных размеров кадра
+            command += ["-vf", "crop=trunc(iw/2)*2:trunc(ih/2)*2"]
+        command += [
+            "-c:v", "libx264", "-preset", FFMPEG_PRESET, "-crf", str(FFMPEG_CRF),
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            output_path,
+        ]
+
+        self.output_path = output_path
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        logger.debug(f"Запущен ffmpeg: {' '.join(command)}")
+
+    def write(self, frame):
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            stderr = self.process.stderr.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"ffmpeg прервал кодирование: {stderr.strip()}")
+
+    def release(self):
+        self.process.stdin.close()
+        stderr = self.process.stderr.read().decode("utf-8", errors="replace")
+        return_code = self.process.wait()
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg завершился с кодом {return_code}: {stderr.strip()}")
+
+
+def remux_to_mp4(source_path, output_path, ffmpeg_binary=None):
+    """
+    Перепаковка видео в MP4 без перекодирования (копирование потоков, индекс в начале файла)
+
+    :return: True - файл создан; False - ffmpeg недоступен или потоки исходника нельзя положить в MP4
+    """
+    binary = ffmpeg_binary or find_ffmpeg()
+    if not binary:
+        return False
+
+    command = [
+        binary, "-y", "-loglevel", "error", "-nostats", "-i", source_path,
+        "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy", "-movflags", "+faststart", output_path,
+    ]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        logger.warning(f"ffmpeg не смог перепаковать {source_path} в MP4 (код {result.returncode}): {stderr.strip()}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    return True
+
+
+def open_mp4_writer(output_path, fps, frame_size, audio_source=None):
+    """
+    Кодировщик MP4 для конвейера обработки
+
+    Основной вариант - H.264 через ffmpeg; если ffmpeg недоступен, используется
+    MPEG-4 Part 2 средствами OpenCV (без звука).
+    """
+    try:
+        return FfmpegWriter(output_path, fps, frame_size, audio_source=audio_source)
+    except (RuntimeError, OSError) as e:
+        logger.warning(f"ffmpeg недоступен ({e}), используется кодировщик OpenCV")
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, frame_size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Не удалось открыть кодировщик для {output_path}")
+    return writer
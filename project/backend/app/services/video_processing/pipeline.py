@@ -0,0 +1,452 @@
+import cv2
+import logging
+import queue
+import threading
+import time
+from prometheus_client import Counter, Gauge
+from app.models.model import filter_confidence
+from app.services.video_processing import spans
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+# --- Метрики Prometheus по стадиям конвейера ---
+pipeline_stage_frames_total = Counter(
+    'pipeline_stage_frames_total',
+    'Total frames handled by a video pipeline stage',
+    ['stage']  # 'decode', 'infer', 'track', 'encode'
+)
+
+pipeline_stage_busy_seconds_total = Counter(
+    'pipeline_stage_busy_seconds_total',
+    'Time a video pipeline stage spent doing work (excluding waits on queues)',
+    ['stage']
+)
+
+pipeline_stage_throughput_fps = Gauge(
+    'pipeline_stage_throughput_fps',
+    'Frames per second of busy time for a pipeline stage in the last processed video',
+    ['stage']
+)
+
+STAGES = ('decode', 'infer', 'track', 'encode')
+
+# Маркер конца потока кадров
+_END = object()
+
+BOX_COLORS = {
+    "weapon": (0, 0, 255),
+    "knife": (0, 165, 255),
+}
+DEFAULT_BOX_COLOR = (0, 255, 0)
+
+
+class FrameItem:
+    """Кадр, передаваемый между стадиями конвейера"""
+
+    def __init__(self, index, frame, infer, render, track=False):
+        self.index = index
+        self.frame = frame
+        self.infer = infer
+        self.render = render
+        # Промежуточный кадр, рамки на который переносятся трекером
+        self.track = track
+        self.detections = None
+        # Кадр для инференса (уменьшенный) и коэффициент уменьшения
+        self.input = frame
+        self.scale = 1.0
+
+
+def draw_detections(frame, detections, class_names):
+    """Отрисовка рамок обнаруженных объектов на кадре (кадр изменяется на месте)"""
+    if detections is None:
+        return frame
+    for (x1, y1, x2, y2), conf, cls in zip(detections.xyxy, detections.conf, detections.cls):
+        name = class_names.get(int(cls), str(int(cls)))
+        color = BOX_COLORS.get(name, DEFAULT_BOX_COLOR)
+        top_left = (int(x1), int(y1))
+        cv2.rectangle(frame, top_left, (int(x2), int(y2)), color, 2)
+        cv2.putText(
+            frame,
+            f"{name} {conf:.2f}",
+            (top_left[0], max(top_left[1] - 5, 10)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            color,
+            1,
+            cv2.LINE_AA
+        )
+    return frame
+
+
+def open_cv2_writer(output_path, fps, frame_size):
+    """Кодировщик по умолчанию: Motion JPEG в AVI средствами OpenCV"""
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, frame_size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Не удалось открыть кодировщик для {output_path}")
+    return writer
+
+
+class VideoPipeline:
+    """
+    Трехстадийный конвейер обработки видео: декодирование → инференс → кодирование
+
+    Декодирование и кодирование выполняются в отдельных потоках, инференс пакетами -
+    в вызывающем потоке. Стадии связаны ограниченными очередями, поэтому в памяти
+    одновременно находится ограниченное число кадров.
+
+    :param source_path: Путь к исходному видео
+    :param detector: Функция, принимающая список кадров и возвращающая список Detections
+    :param sampler: Стратегия выбора кадров для инференса (см. sampling.py)
+    :param class_names: Словарь {id класса: имя} для подписи рамок
+    :param output_path: Путь для видео с разметкой (None - видео не формируется)
+    :param render_stride: В выходное видео попадает каждый render_stride-й кадр
+    :param writer_factory: Функция (путь, fps, (ширина, высота)) -> объект с write()/release()
+    :param on_detections: Вызывается как on_detections(номер кадра, Detections) для каждого кадра с инференсом
+    :param on_progress: Вызывается с долей декодированных кадров от 0 до 1
+    :param start_frame: Номер первого обрабатываемого кадра
+    :param end_frame: Номер кадра, на котором обработка останавливается (None - до конца видео)
+    :param infer_size: Длинная сторона кадра для инференса: кадры больше уменьшаются сразу
+        после декодирования, рамки пересчитываются в координаты исходного кадра (None - без уменьшения)
+    :param render_conf: Минимальная уверенность рамок, отрисовываемых в видео (None - все);
+        on_detections получает все обнаружения детектора
+    :param tracker: Трекер рамок (см. tracking.py): рамки кадров, выбранных sampler,
+        переносятся на каждый track_stride-й промежуточный кадр, и on_detections
+        вызывается и для них; при потере сопровождения кадр отправляется детектору
+    :param on_tracked: Вызывается вместо on_detections для кадров с перенесенными
+        трекером рамками (None - вызывается on_detections)
+    :param track_stride: Шаг промежуточных кадров, на которые переносятся рамки
+    """
+
+    def __init__(
+        self,
+        source_path,
+        detector,
+        sampler,
+        class_names=None,
+        output_path=None,
+        render_stride=1,
+        writer_factory=open_cv2_writer,
+        batch_size=8,
+        queue_size=16,
+        max_buffered_frames=32,
+        on_detections=None,
+        on_progress=None,
+        start_frame=0,
+        end_frame=None,
+        infer_size=None,
+        render_conf=None,
+        tracker=None,
+        on_tracked=None,
+        track_stride=1,
+    ):
+        self.source_path = source_path
+        self.detector = detector
+        self.sampler = sampler
+        self.class_names = class_names or {}
+        self.output_path = output_path
+        self.render_stride = max(1, int(render_stride))
+        self.writer_factory = writer_factory
+        self.batch_size = max(1, int(batch_size))
+        self.max_buffered_frames = max(self.batch_size, int(max_buffered_frames))
+        self.on_detections = on_detections
+        self.on_progress = on_progress
+        self.start_frame = max(0, int(start_frame))
+        self.end_frame = end_frame
+        self.infer_size = infer_size
+        self.render_conf = render_conf
+        self.tracker = tracker
+        self.on_tracked = on_tracked
+        self.track_stride = max(1, int(track_stride))
+
+        self._decode_queue = queue.Queue(maxsize=queue_size)
+        self._encode_queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._errors = []
+        self._stats = {stage: {'frames': 0, 'busy_seconds': 0.0} for stage in STAGES}
+        # Время обработки рамок (пересчет координат, фильтр, on_detections) в текущем пакете
+        self._postprocess_seconds = 0.0
+
+        cap = cv2.VideoCapture(source_path)
+        if not cap.isOpened():
+            raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        # Число кадров обрабатываемого диапазона (для расчета прогресса)
+        last_frame = self.total_frames if end_frame is None else min(end_frame, self.total_frames)
+        self.range_frames = max(0, last_frame - self.start_frame)
+
+    @property
+    def output_fps(self):
+        return self.fps / self.render_stride
+
+    def run(self):
+        """
+        Запуск конвейера с ожиданием завершения
+
+        :return: Статистика по стадиям {стадия: {'frames', 'busy_seconds', 'fps'}}
+        """
+        threads = [threading.Thread(target=self._guard, args=(self._decode_loop,), name="pipeline-decode", daemon=True)]
+        if self.output_path:
+            threads.append(threading.Thread(target=self._guard, args=(self._encode_loop,), name="pipeline-encode", daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._infer_loop()
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            if self._stop.is_set():
+                # При ошибке освобождаем потоки, которые могут ждать места в очередях
+                self._drain(self._decode_queue)
+                self._drain(self._encode_queue)
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return self._publish_stats()
+
+    def stop(self):
+        """
+        Досрочная остановка конвейера (например, из on_detections)
+
+        run() завершается без ошибки; кадры, еще не прошедшие инференс, не обрабатываются.
+        """
+        self._stop.set()
+
+    def _guard(self, loop):
+        try:
+            loop()
+        except Exception as e:
+            logger.error(f"Ошибка в потоке {threading.current_thread().name}: {e}")
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, target_queue, item):
+        while not self._stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source_queue):
+        while not self._stop.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    @staticmethod
+    def _drain(target_queue):
+        try:
+            while True:
+                target_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _account(self, stage, frames, busy_seconds):
+        self._stats[stage]['frames'] += frames
+        self._stats[stage]['busy_seconds'] += busy_seconds
+        pipeline_stage_frames_total.labels(stage=stage).inc(frames)
+        pipeline_stage_busy_seconds_total.labels(stage=stage).inc(busy_seconds)
+
+    def _decode_loop(self):
+        cap = cv2.VideoCapture(self.source_path)
+        index = self.start_frame
+        if index:
+            # Номера кадров остаются сквозными: выборка, отрисовка и лог совпадают с обработкой целого видео
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        try:
+            while not self._stop.is_set():
+                if self.end_frame is not None and index >= self.end_frame:
+                    break
+                started = time.perf_counter()
+                if not cap.grab():
+                    break
+
+                frame = None
+                if self.sampler.needs_pixels(index):
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                infer = self.sampler.select(index, frame)
+                render = self.output_path is not None and index % self.render_stride == 0
+                track = self.tracker is not None and not infer and index % self.track_stride == 0
+
+                item = None
+                if infer or render or track:
+                    if frame is None:
+                        ok, frame = cap.retrieve()
+                        if not ok:
+                            break
+                    item = FrameItem(index, frame, infer, render, track)
+                    if infer or track:
+                        self._shrink(item)
+                self._account('decode', 1, time.perf_counter() - started)
+
+                if item is not None and not self._put(self._decode_queue, item):
+                    break
+
+                index += 1
+                if self.on_progress and self.range_frames > 0 and index % 25 == 0:
+                    self.on_progress(min((index - self.start_frame) / self.range_frames, 0.99))
+        finally:
+            cap.release()
+            self._put(self._decode_queue, _END)
+
+    def _shrink(self, item):
+        """Уменьшение кадра до infer_size (кадр без отрисовки в исходном размере не хранится)"""
+        height, width = item.frame.shape[:2]
+        longest = max(height, width)
+        if not self.infer_size or longest <= self.infer_size:
+            return
+        item.scale = self.infer_size / longest
+        size = (max(1, round(width * item.scale)), max(1, round(height * item.scale)))
+        item.input = cv2.resize(item.frame, size, interpolation=cv2.INTER_AREA)
+        if not item.render:
+            item.frame = None
+
+    def _infer_loop(self):
+        buffer = []
+        pending = 0
+        while True:
+            item = self._get(self._decode_queue)
+            if item is _END:
+                break
+            buffer.append(item)
+            if item.infer:
+                pending += 1
+            if pending >= self.batch_size or len(buffer) >= self.max_buffered_frames:
+                self._flush(buffer)
+                buffer = []
+                pending = 0
+
+        if buffer and not self._stop.is_set():
+            self._flush(buffer)
+        if self.output_path:
+            self._put(self._encode_queue, _END)
+
+    def _flush(self, buffer):
+        batch = [item for item in buffer if item.infer]
+        detections = self._detect(batch) if batch else []
+        if self.tracker is None:
+            for item, item_detections in zip(batch, detections):
+                self._emit(item, item_detections)
+        else:
+            self._track(buffer, dict(zip((item.index for item in batch), detections)))
+        if self._postprocess_seconds:
+            spans.observe('postprocess', self._postprocess_seconds)
+            self._postprocess_seconds = 0.0
+
+        # Кадры без отрисовки дальше не нужны, их память освобождается здесь
+        for item in buffer:
+            if item.render:
+                if not self._put(self._encode_queue, item):
+                    return
+
+    def _detect(self, items):
+        """Инференс пакета кадров: рамки в координатах уменьшенных кадров"""
+        started = time.perf_counter()
+        detections = self.detector([item.input for item in items])
+        elapsed = time.perf_counter() - started
+        self._account('infer', len(items), elapsed)
+        spans.observe('infer_batch', elapsed)
+        return detections
+
+    def _emit(self, item, detections, tracked=False):
+        """Передача результата кадра в координатах исходного кадра на отрисовку и в on_detections"""
+        started = time.perf_counter()
+        if item.scale != 1.0:
+            detections = detections._replace(xyxy=detections.xyxy / item.scale)
+        item.input = None
+        item.detections = detections
+        if self.render_conf is not None:
+            item.detections = filter_confidence(detections, self.render_conf)
+        callback = self.on_tracked if tracked and self.on_tracked else self.on_detections
+        if callback:
+            callback(item.index, detections)
+        self._postprocess_seconds += time.perf_counter() - started
+
+    def _track(self, buffer, detections):
+        """
+        Перенос рамок ключевых кадров на промежуточные кадры в порядке номеров
+
+        Состояние трекера переходит между пакетами; промежуточный кадр, на котором
+        сопровождение потеряно, сразу отправляется детектору и становится ключевым.
+        """
+        for item in buffer:
+            if self._stop.is_set():
+                return
+            if not (item.infer or item.track):
+                continue
+
+            started = time.perf_counter()
+            gray = cv2.cvtColor(item.input, cv2.COLOR_BGR2GRAY)
+            item_detections = None if item.infer else self.tracker.update(gray)
+            busy = time.perf_counter() - started
+            tracked = item_detections is not None
+            if not tracked:
+                item_detections = detections[item.index] if item.infer else self._detect([item])[0]
+                started = time.perf_counter()
+                self.tracker.reset(gray, item_detections)
+                busy += time.perf_counter() - started
+            self._account('track', 1, busy)
+            self._emit(item, item_detections, tracked)
+
+    def _encode_loop(self):
+        writer = None
+        last_detections = None
+        try:
+            while True:
+                item = self._get(self._encode_queue)
+                if item is _END:
+                    break
+
+                started = time.perf_counter()
+                if writer is None:
+                    height, width = item.frame.shape[:2]
+                    writer = self.writer_factory(self.output_path, self.output_fps, (width, height))
+                # Кадры без инференса размечаются последними известными результатами
+                if item.detections is not None:
+                    last_detections = item.detections
+                writer.write(draw_detections(item.frame, last_detections, self.class_names))
+                self._account('encode', 1, time.perf_counter() - started)
+        finally:
+            if writer is not None:
+                started = time.perf_counter()
+                writer.release()
+                self._account('encode', 0, time.perf_counter() - started)
+
+    def _publish_stats(self):
+        stats = {}
+        for stage, values in self._stats.items():
+            fps = values['frames'] / values['busy_seconds'] if values['busy_seconds'] > 0 else 0.0
+            stats[stage] = {
+                'frames': values['frames'],
+                'busy_seconds': round(values['busy_seconds'], 4),
+                'fps': round(fps, 2),
+            }
+            if values['frames']:
+                pipeline_stage_throughput_fps.labels(stage=stage).set(fps)
+
+        logger.info(
+            "Производительность стадий конвейера: " +
+            ", ".join(f"{stage}={values['fps']} кадр/с ({values['frames']} кадров)" for stage, values in stats.items())
+        )
+        return stats
@@ -0,0 +1,126 @@
+"""
+Выбор размера входа модели (imgsz) по разрешению видео и бюджету задержки
+"""
+import logging
+import os
+import threading
+from prometheus_client import Histogram
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+inference_imgsz = Histogram(
+    'inference_imgsz',
+    'Model input size (long side, pixels) chosen for a video',
+    buckets=(160, 256, 320, 416, 480, 512, 640, 768, 960, 1280)
+)
+
+# Шаг размеров входа: страйд сетей YOLO
+IMGSZ_STEP = 32
+# Размер, на котором обучена модель, и границы выбора размера
+MODEL_IMGSZ = 640
+INFERENCE_IMGSZ_MAX = int(os.environ.get("INFERENCE_IMGSZ_MAX", MODEL_IMGSZ))
+INFERENCE_IMGSZ_MIN = int(os.environ.get("INFERENCE_IMGSZ_MIN", 320))
+# Бюджет задержки инференса одного кадра, миллисекунды (0 - без ограничения)
+INFERENCE_LATENCY_BUDGET_MS = float(os.environ.get("INFERENCE_LATENCY_BUDGET_MS", 0))
+# Начальная оценка задержки кадра на входе 640, миллисекунды (уточняется по измерениям)
+INFERENCE_FRAME_MS_640 = float(os.environ.get("INFERENCE_FRAME_MS_640", 0))
+
+
+def floor_to_step(value, step=IMGSZ_STEP):
+    return max(step, int(value) // step * step)
+
+
+class InferenceSizePolicy:
+    """
+    Политика выбора размера входа модели
+
+    Размер не превышает длинную сторону кадра (округленную вниз до кратного 32),
+    поэтому видео низкого разрешения не увеличиваются. Если задан бюджет задержки,
+    размер уменьшается, пока оценка задержки кадра не уложится в бюджет. Задержка
+    считается пропорциональной площади входа; оценка на входе 640 уточняется
+    скользящим средним по фактическим замерам инференса.
+
+    :param max_size: Наибольший размер входа
+    :param min_size: Наименьший размер, до которого уменьшается вход ради бюджета
+    :param budget_ms: Бюджет задержки кадра, мс (0 - без ограничения)
+    :param frame_ms_640: Начальная оценка задержки кадра на входе 640, мс (0 - неизвестна)
+    """
+
+    def __init__(
+        self,
+        max_size=INFERENCE_IMGSZ_MAX,
+        min_size=INFERENCE_IMGSZ_MIN,
+        budget_ms=INFERENCE_LATENCY_BUDGET_MS,
+        frame_ms_640=INFERENCE_FRAME_MS_640,
+        smoothing=0.3,
+    ):
+        self.max_size = floor_to_step(max_size)
+        self.min_size = min(floor_to_step(min_size), self.max_size)
+        self.budget_ms = float(budget_ms)
+        self.smoothing = smoothing
+        self._frame_ms_640 = float(frame_ms_640) or None
+        self._lock = threading.Lock()
+
+    def settings(self):
+        """Параметры политики, от которых зависит выбранный размер"""
+        return {'max': self.max_size, 'min': self.min_size, 'budget_ms': self.budget_ms}
+
+    def estimate_ms(self, imgsz):
+        """Оценка задержки кадра на входе imgsz, мс (None - замеров еще нет)"""
+        if self._frame_ms_640 is None:
+            return None
+        return self._frame_ms_640 * (imgsz / MODEL_IMGSZ) ** 2
+
+    def observe(self, imgsz, frames, seconds):
+        """Учет фактической задержки инференса frames кадров на входе imgsz"""
+        if not frames or seconds <= 0:
+            return
+        frame_ms_640 = seconds * 1000 / frames * (MODEL_IMGSZ / imgsz) ** 2
+        with self._lock:
+            if self._frame_ms_640 is None:
+                self._frame_ms_640 = frame_ms_640
+            else:
+                self._frame_ms_640 += self.smoothing * (frame_ms_640 - self._frame_ms_640)
+
+    def choose(self, width, height, override=None):
+        """
+        Размер входа модели для видео
+
+        :param override: Размер, запрошенный пользователем (также не больше кадра)
+        :return: {'imgsz', 'source', 'scale', 'estimated_ms'}; scale - коэффициент
+            уменьшения кадра перед инференсом (1.0 - кадр не уменьшается)
+        """
+        longest = max(int(width), int(height), 1)
+        upper = floor_to_step(longest) if longest >= IMGSZ_STEP else IMGSZ_STEP
+
+        if override:
+            imgsz = min(floor_to_step(override), upper)
+            source = 'request'
+        else:
+            imgsz = min(self.max_size, upper)
+            source = 'resolution'
+            if self.budget_ms > 0 and self.estimate_ms(imgsz) is not None:
+                while imgsz > self.min_size and self.estimate_ms(imgsz) > self.budget_ms:
+                    imgsz -= IMGSZ_STEP
+                if imgsz < min(self.max_size, upper):
+                    source = 'budget'
+
+        inference_imgsz.observe(imgsz)
+        estimated = self.estimate_ms(imgsz)
+        return {
+            'imgsz': imgsz,
+            'source': source,
+            'scale': min(1.0, imgsz / longest),
+            'estimated_ms': round(estimated, 2) if estimated is not None else None,
+        }
+
+
+# Политика процесса: оценка задержки общая для всех задач
+policy = InferenceSizePolicy()
@@ -0,0 +1,103 @@
+"""
+Стратегии выбора кадров для инференса
+"""
+import cv2
+import numpy as np
+from prometheus_client import Counter
+
+
+sampler_decisions_total = Counter(
+    'sampler_decisions_total',
+    'Frame sampling decisions made before inference',
+    ['sampler', 'decision']  # decision: 'sampled', 'skipped'
+)
+
+
+class FixedStrideSampler:
+    """Выбор каждого stride-го кадра (аналог vid_stride в ultralytics)"""
+
+    def __init__(self, stride=8):
+        self.stride = max(1, int(stride))
+
+    def needs_pixels(self, index):
+        # Решение принимается только по номеру кадра, декодировать пропускаемые кадры не нужно
+        return False
+
+    def select(self, index, frame=None):
+        return index % self.stride == 0
+
+
+class MotionGatedSampler:
+    """
+    Выбор кадров по изменению сцены
+
+    Кадр уменьшается до миниатюры в оттенках серого и сравнивается с миниатюрой
+    последнего выбранного кадра. Кадр отправляется на инференс, если доля
+    изменившихся пикселей не меньше motion_threshold (но не чаще чем раз в min_gap
+    кадров), либо если с последнего выбранного кадра прошло max_gap кадров.
+    Статичная сцена обрабатывается раз в max_gap кадров, сцена с движением - раз в min_gap.
+
+    :param motion_threshold: Доля изменившихся пикселей миниатюры (0..1), считающаяся движением
+    :param pixel_threshold: Минимальное изменение яркости пикселя (0..255), считающееся изменением
+    :param min_gap: Минимальный интервал между выбранными кадрами при движении
+    :param max_gap: Максимальный интервал между выбранными кадрами
+    :param thumbnail_width: Ширина миниатюры для сравнения
+    """
+
+    def __init__(self, motion_threshold=0.01, pixel_threshold=25, min_gap=2, max_gap=32, thumbnail_width=64):
+        self.motion_threshold = float(motion_threshold)
+        self.pixel_threshold = int(pixel_threshold)
+        self.min_gap = max(1, int(min_gap))
+        self.max_gap = max(self.min_gap, int(max_gap))
+        self.thumbnail_width = int(thumbnail_width)
+        self._reference = None
+        self._last_index = None
+
+    def needs_pixels(self, index):
+        # Кадры ближе min_gap к последнему выбранному отбрасываются без декодирования
+        return self._last_index is None or index - self._last_index >= self.min_gap
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        thumbnail_height = max(1, round(height * self.thumbnail_width / width))
+        small = cv2.resize(frame, (self.thumbnail_width, thumbnail_height), interpolation=cv2.INTER_AREA)
+        # Целочисленный тип со знаком, чтобы разность не переполнялась
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def motion_score(self, thumbnail):
+        """Доля пикселей миниатюры, изменившихся относительно последнего выбранного кадра"""
+        changed = np.abs(thumbnail - self._reference) > self.pixel_threshold
+        return float(changed.mean())
+
+    def select(self, index, frame=None):
+        if self._last_index is not None:
+            gap = index - self._last_index
+            if gap < self.min_gap:
+                sampler_decisions_total.labels(sampler='motion', decision='skipped').inc()
+                return False
+
+        thumbnail = self._thumbnail(frame)
+        sample = (
+            self._reference is None
+            or index - self._last_index >= self.max_gap
+            or self.motion_score(thumbnail) >= self.motion_threshold
+        )
+
+        if sample:
+            self._reference = thumbnail
+            self._last_index = index
+        sampler_decisions_total.labels(sampler='motion', decision='sampled' if sample else 'skipped').inc()
+        return sample
+
+
+def create_sampler(mode, stride=8, **options):
+    """
+    Создание стратегии выбора кадров по имени режима
+
+    :param mode: 'motion' - по изменению сцены, 'fixed' - каждый stride-й кадр
+    """
+    if mode == 'motion':
+        return MotionGatedSampler(**options)
+    if mode == 'fixed':
+        return FixedStrideSampler(stride)
+    raise ValueError(f"Неизвестный режим выбора кадров: {mode}")
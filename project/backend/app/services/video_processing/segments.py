@@ -0,0 +1,132 @@
+"""
+Параллельная обработка длинных видео по отрезкам кадров
+"""
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.services.tuning import topology
+from app.services.video_processing.encoder import AUDIO_COPY_CONTAINERS, find_ffmpeg
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+
+
+def available_cpus():
+    """Число процессоров, доступных процессу (с учетом квоты cgroup контейнера)"""
+    return topology.available_cpus()
+
+
+def resolve_workers(value):
+    """Число процессов пула из настройки: 'auto' - по числу процессоров, 0 или 1 - без пула"""
+    if str(value).strip().lower() == 'auto':
+        return available_cpus()
+    return max(0, int(value))
+
+
+def plan_segments(total_frames, workers, min_frames, align=1):
+    """
+    Разбиение видео на отрезки кадров [начало, конец) для параллельной обработки
+
+    Отрезков не больше workers, каждый не короче min_frames кадров. Начало каждого
+    отрезка кратно align (шагу выбора и отрисовки кадров), поэтому отрезки выбирают
+    и отрисовывают те же кадры, что и обработка целого видео. Конец последнего
+    отрезка - None: число кадров в заголовке контейнера бывает неточным.
+    """
+    min_frames = max(1, int(min_frames))
+    align = max(1, int(align))
+    count = min(workers, total_frames // min_frames)
+    if count <= 1:
+        return [(0, None)]
+
+    size = -(-total_frames // count)
+    size = -(-size // align) * align
+    starts = list(range(0, total_frames, size))
+    return [(start, end) for start, end in zip(starts, starts[1:] + [None])]
+
+
+def _init_worker(threads):
+    # Процессы пула делят процессоры узла: каждому - своя доля потоков
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    from app.services.tuning import tuning
+    config = dict(tuning.current_config(), role='segment', workers=1, torch_intra_op=threads, opencv=threads)
+    tuning.apply(config)
+
+
+def get_pool(workers):
+    """
+    Общий для процесса пул обработки отрезков (создается при первом обращении)
+
+    Процессы запускаются методом spawn: копирование потоков приложения через fork
+    небезопасно. Модель загружается в каждом процессе пула при первом отрезке
+    (или используется сервер инференса, если задан INFERENCE_SERVER_SOCKET).
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            threads = max(1, available_cpus() // workers)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            _pool_workers = workers
+            logger.info(f"Создан пул обработки отрезков: {workers} процессов по {threads} потоков")
+        return _pool
+
+
+def reset_pool():
+    """Остановка пула (например, после аварийного завершения процесса пула)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def concat_segments(segment_paths, output_path, audio_source=None, ffmpeg_binary=None):
+    """
+    Склейка видео отрезков в один MP4 без перекодирования видеопотока
+
+    Отрезки закодированы с одинаковыми параметрами, поэтому склеиваются
+    demuxer'ом concat с копированием потока. Звук берется из исходника
+    (копированием для MP4/MOV, перекодированием в AAC для остальных контейнеров).
+    """
+    binary = ffmpeg_binary or find_ffmpeg()
+    if not binary:
+        raise RuntimeError("ffmpeg не найден")
+
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    command = [binary, "-y", "-loglevel", "error", "-nostats", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_source:
+        audio_codec = "copy" if audio_source.lower().endswith(AUDIO_COPY_CONTAINERS) else "aac"
+        command += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", audio_codec, "-shortest"]
+    command += ["-c:v", "copy", "-movflags", "+faststart", output_path]
+
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg не смог склеить отрезки (код {result.returncode}): {stderr.strip()}")
@@ -0,0 +1,41 @@
+"""
+Интервалы (spans) этапов обработки видео и их метрики
+"""
+import time
+from contextlib import contextmanager
+from prometheus_client import Gauge, Histogram
+
+
+video_processing_span_seconds = Histogram(
+    'video_processing_span_seconds',
+    'Duration of a video processing span',
+    ['span'],  # 'probe', 'pipeline', 'infer_batch', 'postprocess', 'encode', 'remux', 'finalize', 'upload', 'log_save', 'cleanup'
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+video_processing_fps = Gauge(
+    'video_processing_fps',
+    'Frames per second of the last processed video (video frames / pipeline wall time)'
+)
+
+
+def observe(name, seconds, timings=None):
+    """Учет интервала, длительность которого уже известна (например, занятость стадии конвейера)"""
+    video_processing_span_seconds.labels(span=name).observe(seconds)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name, timings=None):
+    """
+    Интервал этапа: длительность попадает в гистограмму и, если передан словарь timings,
+    суммируется в timings[name]
+
+    Интервал учитывается и при исключении внутри блока.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, timings)
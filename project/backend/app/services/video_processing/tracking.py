@@ -0,0 +1,132 @@
+"""
+Перенос рамок обнаружений с ключевых кадров на промежуточные
+"""
+import cv2
+import numpy as np
+from prometheus_client import Counter
+
+
+tracker_updates_total = Counter(
+    'tracker_updates_total',
+    'Intermediate frames handled by the box tracker',
+    ['result']  # 'tracked', 'lost'
+)
+
+
+class OpticalFlowTracker:
+    """
+    Перенос рамок по разреженному оптическому потоку (пирамидальный Лукас-Канаде)
+
+    На ключевом кадре внутри каждой рамки выбираются характерные точки. На следующих
+    кадрах точки отслеживаются прямым и обратным потоком; точки, для которых потоки
+    расходятся больше max_fb_error пикселей, отбрасываются. Рамка сдвигается на
+    медиану смещения точек и масштабируется по изменению их разброса. Уверенность
+    рамки остается уверенностью детектора на ключевом кадре, поэтому порог уверенности
+    не отбрасывает рамку, которую трекер еще удерживает.
+
+    Доля сохранившихся точек служит только признаком потери: если у какой-либо рамки
+    осталось меньше min_points_ratio исходных точек, сопровождение потеряно, update()
+    возвращает None, и кадр нужно отправить детектору.
+
+    :param max_points: Наибольшее число точек на рамку
+    :param min_points_ratio: Доля исходных точек рамки, ниже которой сопровождение потеряно
+    :param max_fb_error: Допустимое расхождение прямого и обратного потока, пиксели
+    """
+
+    def __init__(self, max_points=24, min_points_ratio=0.5, max_fb_error=1.0, min_points=3):
+        self.max_points = int(max_points)
+        self.min_points_ratio = float(min_points_ratio)
+        self.max_fb_error = float(max_fb_error)
+        self.min_points = int(min_points)
+        self._lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self._gray = None
+        self._detections = None
+        self._points = []
+        self._initial = []
+
+    def _select_points(self, gray, box):
+        height, width = gray.shape[:2]
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(width, int(np.ceil(box[2]))), min(height, int(np.ceil(box[3])))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return np.empty((0, 1, 2), dtype=np.float32)
+
+        points = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, qualityLevel=0.01, minDistance=3)
+        if points is None or len(points) < self.min_points:
+            # Однородная рамка без углов: сетка точек внутри рамки
+            xs = np.linspace(x1, x2 - 1, 4)
+            ys = np.linspace(y1, y2 - 1, 4)
+            return np.array([[[x, y]] for y in ys for x in xs], dtype=np.float32)
+        return (points + np.array([x1, y1], dtype=np.float32)).astype(np.float32)
+
+    def reset(self, gray, detections):
+        """Новый ключевой кадр: рамки детектора (в координатах кадра gray)"""
+        self._gray = gray
+        self._detections = detections
+        self._points = [self._select_points(gray, box) for box in np.asarray(detections.xyxy)]
+        self._initial = [len(points) for points in self._points]
+
+    def update(self, gray):
+        """
+        Рамки на следующем кадре
+
+        :return: Detections с перенесенными рамками или None, если сопровождение потеряно
+        """
+        if self._detections is None:
+            return None
+        if not self._points:
+            self._gray = gray
+            tracker_updates_total.labels(result='tracked').inc()
+            return self._detections
+
+        previous = np.concatenate(self._points)
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, previous, None, **self._lk_params)
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, forward, None, **self._lk_params)
+        error = np.linalg.norm((previous - backward).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error <= self.max_fb_error)
+
+        height, width = gray.shape[:2]
+        boxes = np.asarray(self._detections.xyxy, dtype=np.float32).copy()
+        points = []
+        start = 0
+        for number, count in enumerate(len(box_points) for box_points in self._points):
+            keep = good[start:start + count]
+            old = previous[start:start + count][keep].reshape(-1, 2)
+            new = forward[start:start + count][keep].reshape(-1, 2)
+            start += count
+            if len(new) < max(self.min_points, self.min_points_ratio * self._initial[number]):
+                tracker_updates_total.labels(result='lost').inc()
+                return None
+
+            shift = np.median(new - old, axis=0)
+            old_spread = np.median(np.linalg.norm(old - old.mean(axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new - new.mean(axis=0), axis=1))
+            scale = float(np.clip(new_spread / old_spread, 0.8, 1.25)) if old_spread > 1e-3 else 1.0
+
+            x1, y1, x2, y2 = boxes[number]
+            center_x, center_y = (x1 + x2) / 2 + shift[0], (y1 + y2) / 2 + shift[1]
+            half_width, half_height = (x2 - x1) / 2 * scale, (y2 - y1) / 2 * scale
+            boxes[number] = [
+                np.clip(center_x - half_width, 0, width), np.clip(center_y - half_height, 0, height),
+                np.clip(center_x + half_width, 0, width), np.clip(center_y + half_height, 0, height),
+            ]
+            points.append(new.reshape(-1, 1, 2))
+
+        self._gray = gray
+        self._points = points
+        self._detections = self._detections._replace(xyxy=boxes)
+        tracker_updates_total.labels(result='tracked').inc()
+        return self._detections
+
+
+def create_tracker(mode, **kwargs):
+    """Трекер по имени режима: 'flow' - оптический поток, 'off' - без сопровождения (None)"""
+    if mode == 'off':
+        return None
+    if mode == 'flow':
+        return OpticalFlowTracker(**kwargs)
+    raise ValueError(f"Неизвестный режим сопровождения: {mode}")
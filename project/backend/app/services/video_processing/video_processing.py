@@ -1,13 +1,24 @@
-from moviepy.editor import *
 from datetime import datetime
+from functools import partial
 import cv2
+import hashlib
+import json
 import os
 import shutil
 import logging
 import time
 from app.models import model
 from app.services.minio import MinioStorage
+from app.services.uploads.streaming import SNIFF_BYTES, sniff_container
+from app.services.video_processing.encoder import open_mp4_writer, remux_to_mp4
+from app.services.video_processing.pipeline import VideoPipeline
+from app.services.video_processing.sampling import create_sampler
+from app.services.video_processing.tracking import create_tracker
 import tempfile
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from app.services.video_processing import detection_log, resolution, segments, spans
+from app.services.video_processing.detection_store import DETECTIONS_FLOOR_CONF, DetectionWriter, detections_object_name
 from prometheus_client import Counter, Histogram, Gauge
 
 
@@ -20,8 +31,37 @@ logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
 
-video_directory = "runs/detect/predict/"
-storage = MinioStorage()
+storage = MinioStorage.shared()
+
+# Базовая директория для рабочих каталогов задач (по умолчанию системная временная)
+WORKSPACE_ROOT = os.environ.get("PROCESSING_WORKSPACE_ROOT") or None
+
+# Параметры конвейера обработки
+VID_STRIDE = int(os.environ.get("VID_STRIDE", 8))
+# Выбор кадров для инференса: 'motion' - по изменению сцены, 'fixed' - каждый VID_STRIDE-й кадр
+SAMPLER_MODE = os.environ.get("SAMPLER_MODE", "motion")
+MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", 0.01))
+MOTION_PIXEL_THRESHOLD = int(os.environ.get("MOTION_PIXEL_THRESHOLD", 25))
+MOTION_MIN_GAP = int(os.environ.get("MOTION_MIN_GAP", 2))
+MOTION_MAX_GAP = int(os.environ.get("MOTION_MAX_GAP", 32))
+PIPELINE_BATCH_SIZE = int(os.environ.get("PIPELINE_BATCH_SIZE", 8))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 16))
+PIPELINE_MAX_BUFFERED_FRAMES = int(os.environ.get("PIPELINE_MAX_BUFFERED_FRAMES", 32))
+# Сопровождение рамок между кадрами с инференсом: 'flow' - оптический поток, 'off' - выключено
+TRACKING_MODE = os.environ.get("TRACKING_MODE", "off")
+# Шаг промежуточных кадров, на которые переносятся рамки (1 - каждый кадр)
+TRACK_STRIDE = int(os.environ.get("TRACK_STRIDE", 1))
+# Доля точек рамки, ниже которой сопровождение потеряно и кадр отправляется детектору
+TRACK_MIN_POINTS_RATIO = float(os.environ.get("TRACK_MIN_POINTS_RATIO", 0.5))
+# Параллельная обработка длинных видео по отрезкам: число процессов ('auto' - по числу процессоров, 0 - выключена)
+SEGMENT_WORKERS = segments.resolve_workers(os.environ.get("SEGMENT_WORKERS", 0))
+# Минимальная длина отрезка, секунды: более короткие видео обрабатываются целиком
+SEGMENT_MIN_SECONDS = float(os.environ.get("SEGMENT_MIN_SECONDS", 60))
+# Режим тревоги: число подряд идущих выбранных кадров с оружием/ножом, подтверждающее обнаружение
+ALERT_CONFIRM_FRAMES = int(os.environ.get("ALERT_CONFIRM_FRAMES", 2))
+# Режим тревоги: размер пакета инференса (меньше - раньше ответ) и предельное время просмотра, секунды
+ALERT_BATCH_SIZE = int(os.environ.get("ALERT_BATCH_SIZE", 2))
+ALERT_SCAN_TIMEOUT = float(os.environ.get("ALERT_SCAN_TIMEOUT", 60))
 
 # --- Определения метрик Prometheus для video_processing.py ---
 video_processing_time_seconds = Histogram(
@@ -32,7 +72,7 @@ video_processing_time_seconds = Histogram(
 
 video_conversion_time_seconds = Histogram(
     'video_conversion_time_seconds',
-    'Time spent converting video from AVI to MP4'
+    'Time spent encoding the annotated video to MP4'
 )
 
 model_inference_time_seconds = Histogram(
@@ -58,67 +98,409 @@ processed_video_pixels_histogram = Histogram(
     'Distribution of processed video resolutions in total pixels (width*height)'
 )
 
+video_segment_processing_seconds = Histogram(
+    'video_segment_processing_seconds',
+    'Wall time of processing one segment of a long video in the process pool',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+
+video_segments_per_video = Histogram(
+    'video_segments_per_video',
+    'Number of segments a video was split into for parallel processing',
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32)
+)
+
+time_to_alert_seconds = Histogram(
+    'time_to_alert_seconds',
+    'Time from the start of an alert scan to a confirmed weapon or knife detection',
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+)
+
+alert_scans_total = Counter(
+    'alert_scans_total',
+    'Total number of alert-mode scans',
+    ['result']  # 'alert', 'clear', 'timeout'
+)
+
 detected_objects_total = Counter(
     'detected_objects_total',
     'Total detected objects of specific types',
     ['object_type'] # e.g., 'weapon', 'knife'
 )
 
-def convert_avi_to_mp4(input_file, output_file):
-    start_time = time.time()
+def create_workspace():
+    """Создание изолированного рабочего каталога для одной задачи обработки"""
+    if WORKSPACE_ROOT:
+        os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    return tempfile.mkdtemp(prefix="job_", dir=WORKSPACE_ROOT)
+
+
+def build_sampler():
+    """Стратегия выбора кадров для инференса согласно настройкам окружения"""
+    return create_sampler(
+        SAMPLER_MODE,
+        stride=VID_STRIDE,
+        motion_threshold=MOTION_THRESHOLD,
+        pixel_threshold=MOTION_PIXEL_THRESHOLD,
+        min_gap=MOTION_MIN_GAP,
+        max_gap=MOTION_MAX_GAP,
+    )
+
+
+def build_tracker():
+    """Трекер рамок между кадрами с инференсом согласно настройкам окружения (None - выключен)"""
+    return create_tracker(TRACKING_MODE, min_points_ratio=TRACK_MIN_POINTS_RATIO)
+
+
+def processing_settings():
+    """Настройки обработки, от которых зависят результаты обнаружения"""
+    settings = {'sampler': SAMPLER_MODE, 'stride': VID_STRIDE, 'imgsz': resolution.policy.settings()}
+    if SAMPLER_MODE == 'motion':
+        settings['motion'] = [MOTION_THRESHOLD, MOTION_PIXEL_THRESHOLD, MOTION_MIN_GAP, MOTION_MAX_GAP]
+    if TRACKING_MODE != 'off':
+        settings['tracking'] = [TRACKING_MODE, TRACK_STRIDE, TRACK_MIN_POINTS_RATIO]
+    return settings
+
+
+def build_cache_key(content_sha256, confidence_threshold, imgsz=None, render=True):
+    """
+    Ключ кэша результатов обработки
+
+    Одинаковое содержимое видео, обработанное той же версией модели с тем же порогом
+    уверенности, размером входа и настройками выбора кадров, дает тот же результат.
+
+    :param imgsz: Размер входа модели, с которым обрабатывается видео (см. select_inference_size)
+    :param render: Сохраняется ли видео с разметкой
+    """
+    parts = {
+        'content': content_sha256,
+        'model': model.get_model_version(),
+        'confidence_threshold': round(float(confidence_threshold), 4),
+        'imgsz': imgsz,
+        'settings': processing_settings(),
+    }
+    if not render:
+        # Ключи результатов с разметкой не меняются: признак добавляется только без нее
+        parts['render'] = False
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def select_inference_size(filename, override=None):
+    """
+    Выбор размера входа модели для видео по его разрешению (см. resolution.py)
+
+    :param override: Размер, запрошенный пользователем
+    :return: {'imgsz', 'source', 'scale', 'estimated_ms', 'width', 'height'}
+    """
+    cap = cv2.VideoCapture(filename)
+    if not cap.isOpened():
+        raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    choice = resolution.policy.choose(width, height, override=override)
+    choice.update(width=width, height=height)
+    logger.info(f"Размер входа модели для {width}x{height}: {choice['imgsz']} ({choice['source']})")
+    return choice
+
+
+def _source_container(filename):
+    """Формат контейнера исходного видео по первым байтам (см. sniff_container)"""
+    with open(filename, 'rb') as f:
+        return sniff_container(f.read(SNIFF_BYTES))
+
+
+def build_output_filename(filename, username):
+    """Формирование имени обработанного видео в хранилище: <пользователь>_<дата>_<время>_<имя>.mp4"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_filename = os.path.basename(os.path.splitext(filename)[0])
+    return f"{username}_{timestamp}_{base_filename}.mp4"
+
+
+def process_frame_range(
+    filename,
+    confidence_threshold,
+    output_path,
+    start_frame=0,
+    end_frame=None,
+    audio_source=None,
+    progress_callback=None,
+    imgsz=resolution.MODEL_IMGSZ,
+    detections_path=None,
+):
+    """
+    Обработка диапазона кадров видео конвейером (вызывается и в процессах пула отрезков)
+
+    :param output_path: Путь для видео с разметкой (None - видео не формируется)
+    :param imgsz: Размер входа модели; кадры больше уменьшаются до него при декодировании
+    :param detections_path: Путь для колоночного файла всех обнаружений (None - не сохранять);
+        обнаружения сохраняются с порогом DETECTIONS_FLOOR_CONF, а лог, счетчики и
+        разметка видео строятся по confidence_threshold
+    :param audio_source: Файл, звук из которого добавляется в результат (None - без звука)
+    :return: (frame_objects, {'weapon', 'knife'}, статистика стадий конвейера)
+    """
+    started = time.perf_counter()
+    class_names = model.get_class_names()
+    frame_objects = []
+    counters = {"weapon": 0, "knife": 0}
+    infer_conf = min(confidence_threshold, DETECTIONS_FLOOR_CONF) if detections_path else confidence_threshold
+    writer = None
+    if detections_path:
+        writer = DetectionWriter(detections_path, class_names=class_names, min_score=infer_conf)
+
+    def on_detections(frame_index, detections, tracked=False):
+        if writer is not None:
+            writer.add(frame_index, detections)
+            detections = model.filter_confidence(detections, confidence_threshold)
+        names = [class_names.get(int(cls)) for cls in detections.cls]
+        weapons = names.count("weapon")
+        knives = names.count("knife")
+        if not tracked:
+            # Перенесенные трекером рамки - те же объекты ключевого кадра, они не считаются повторно
+            counters["weapon"] += weapons
+            counters["knife"] += knives
+        # Кадры выбираются неравномерно, поэтому в лог пишется настоящий номер кадра
+        frame_objects.append((frame_index, weapons > 0, knives > 0))
+
+    pipeline = VideoPipeline(
+        filename,
+        detector=lambda frames: model.predict_batch(frames, conf=infer_conf, imgsz=imgsz),
+        sampler=build_sampler(),
+        class_names=class_names,
+        output_path=output_path,
+        render_stride=VID_STRIDE,
+        writer_factory=partial(open_mp4_writer, audio_source=audio_source),
+        batch_size=PIPELINE_BATCH_SIZE,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        max_buffered_frames=PIPELINE_MAX_BUFFERED_FRAMES,
+        on_detections=on_detections,
+        on_tracked=partial(on_detections, tracked=True),
+        on_progress=progress_callback,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        infer_size=imgsz,
+        render_conf=confidence_threshold if infer_conf < confidence_threshold else None,
+        tracker=build_tracker(),
+        track_stride=TRACK_STRIDE,
+    )
+    if writer is not None:
+        writer.fps = pipeline.fps
     try:
-        logger.info(f"Конвертация AVI в MP4: {input_file} -> {output_file}")
-        video = VideoFileClip(input_file)
-        video.write_videofile(
-            output_file,
-            codec="libx264",
-            audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
-            remove_temp=True,
+        stage_stats = pipeline.run()
+    finally:
+        if writer is not None:
+            writer.close()
+    stage_stats['wall_seconds'] = time.perf_counter() - started
+    resolution.policy.observe(imgsz, stage_stats['infer']['frames'], stage_stats['infer']['busy_seconds'])
+    return frame_objects, counters, stage_stats
+
+
+def detect_alert(filename, confidence_threshold, confirm_frames=None, timeout=None, imgsz=None):
+    """
+    Режим тревоги: поиск первого подтвержденного обнаружения оружия или ножа
+
+    Видео не размечается и не кодируется. Обнаружение подтверждено, если оружие
+    или нож найдены на confirm_frames выбранных кадрах подряд; после этого
+    просмотр прекращается. Если за timeout секунд обнаружения нет, просмотр
+    также прекращается (complete=False).
+
+    :param imgsz: Размер входа модели (None - выбор по разрешению видео)
+    :return: {'alert', 'complete', 'frame', 'confirmed_frame', 'timestamp_seconds',
+        'objects', 'frames_scanned', 'time_to_alert_seconds', 'imgsz'}
+    """
+    confirm_frames = max(1, int(confirm_frames or ALERT_CONFIRM_FRAMES))
+    imgsz = select_inference_size(filename, override=imgsz)['imgsz']
+    timeout = ALERT_SCAN_TIMEOUT if timeout is None else timeout
+    class_names = model.get_class_names()
+    started = time.perf_counter()
+    state = {'run': [], 'alert': None, 'timeout': False, 'scanned': 0}
+
+    def on_detections(frame_index, detections):
+        if state['alert'] or state['timeout']:
+            return
+        state['scanned'] += 1
+        names = {class_names.get(int(cls)) for cls in detections.cls} & {"weapon", "knife"}
+        if not names:
+            state['run'] = []
+        else:
+            state['run'].append((frame_index, names))
+            if len(state['run']) >= confirm_frames:
+                state['alert'] = list(state['run'])
+                pipeline.stop()
+                return
+        if timeout and time.perf_counter() - started > timeout:
+            state['timeout'] = True
+            pipeline.stop()
+
+    pipeline = VideoPipeline(
+        filename,
+        detector=lambda frames: model.predict_batch(frames, conf=confidence_threshold, imgsz=imgsz),
+        sampler=build_sampler(),
+        class_names=class_names,
+        batch_size=ALERT_BATCH_SIZE,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        max_buffered_frames=PIPELINE_MAX_BUFFERED_FRAMES,
+        on_detections=on_detections,
+        infer_size=imgsz,
+    )
+    pipeline.run()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'alert': state['alert'] is not None,
+        'complete': state['alert'] is not None or not state['timeout'],
+        'frame': None,
+        'confirmed_frame': None,
+        'timestamp_seconds': None,
+        'objects': [],
+        'frames_scanned': state['scanned'],
+        'time_to_alert_seconds': None,
+        'imgsz': imgsz,
+    }
+    if state['alert']:
+        first_frame = state['alert'][0][0]
+        result.update(
+            frame=first_frame,
+            confirmed_frame=state['alert'][-1][0],
+            timestamp_seconds=round(first_frame / pipeline.fps, 3),
+            objects=sorted(set().union(*(names for _, names in state['alert']))),
+            time_to_alert_seconds=round(elapsed, 4),
         )
-        video.close()
-        logger.info("Конвертация успешно завершена")
-        end_time = time.time()
-        video_conversion_time_seconds.observe(end_time - start_time)
-        return True
-    except Exception as e:
-        logger.error(f"Ошибка при конвертации видео: {e}")
-        video_processing_errors_total.labels(error_type='conversion_failed').inc()
-        # Также можно залогировать время до ошибки, если это полезно
-        # end_time = time.time()
-        # video_conversion_time_seconds.observe(end_time - start_time) # Опционально
-        return False
-
-
-def process_video(filename, confidence_threshold=0.25, username=None):
+        time_to_alert_seconds.observe(elapsed)
+        alert_scans_total.labels(result='alert').inc()
+        logger.info(f"Тревога: {result['objects']} с {result['timestamp_seconds']} с (кадр {first_frame}), "
+                    f"подтверждено за {elapsed:.2f} с")
+    else:
+        alert_scans_total.labels(result='timeout' if state['timeout'] else 'clear').inc()
+    return result
+
+
+def _process_segments(
+    filename,
+    confidence_threshold,
+    output_path,
+    planned,
+    workspace,
+    progress_callback=None,
+    imgsz=resolution.MODEL_IMGSZ,
+    detections_path=None,
+):
+    """
+    Параллельная обработка отрезков видео в пуле процессов
+
+    Номера кадров в логах отрезков сквозные, поэтому frame_objects объединяются
+    конкатенацией в порядке отрезков. Видео отрезков склеиваются без перекодирования,
+    блоки файлов обнаружений отрезков копируются в общий файл без разбора строк.
+
+    :param output_path: Путь для видео с разметкой (None - видео не формируется)
+    """
+    pool = segments.get_pool(SEGMENT_WORKERS)
+    segment_paths = [os.path.join(workspace, f"segment_{number:04d}.mp4") for number in range(len(planned))]
+    detection_paths = [f"{path}.detections" if detections_path else None for path in segment_paths]
+    futures = {
+        pool.submit(
+            process_frame_range, filename, confidence_threshold, path if output_path else None, start, end,
+            imgsz=imgsz, detections_path=segment_detections,
+        ): number
+        for number, (path, segment_detections, (start, end)) in enumerate(zip(segment_paths, detection_paths, planned))
+    }
+    video_segments_per_video.observe(len(planned))
+
+    results = [None] * len(planned)
+    try:
+        for future in as_completed(futures):
+            number = futures[future]
+            results[number] = future.result()
+            video_segment_processing_seconds.observe(results[number][2]['wall_seconds'])
+            if progress_callback:
+                done = sum(1 for result in results if result is not None)
+                progress_callback(min(done / len(planned), 0.99))
+    except BrokenProcessPool:
+        segments.reset_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+    frame_objects = []
+    counters = {"weapon": 0, "knife": 0}
+    stage_stats = {}
+    for segment_objects, segment_counters, segment_stats in results:
+        frame_objects.extend(segment_objects)
+        for key, value in segment_counters.items():
+            counters[key] += value
+        for stage, values in segment_stats.items():
+            if isinstance(values, dict):
+                merged = stage_stats.setdefault(stage, {'frames': 0, 'busy_seconds': 0.0})
+                merged['frames'] += values['frames']
+                merged['busy_seconds'] += values['busy_seconds']
+
+    if output_path:
+        segments.concat_segments(segment_paths, output_path, audio_source=filename)
+    if detections_path:
+        writer = DetectionWriter(detections_path)
+        for path in detection_paths:
+            writer.append_file(path)
+        writer.close()
+    return frame_objects, counters, stage_stats
+
+
+def process_video(
+    filename,
+    confidence_threshold=0.25,
+    username=None,
+    output_filename=None,
+    progress_callback=None,
+    imgsz=None,
+    render=True,
+    timings=None,
+):
+    """
+    Обработка видео моделью обнаружения и сохранение результатов в MinIO
+
+    :param filename: Путь к исходному видеофайлу
+    :param confidence_threshold: Порог уверенности модели
+    :param username: Имя пользователя (используется в имени результата)
+    :param output_filename: Имя результата в хранилище (по умолчанию формируется автоматически)
+    :param progress_callback: Функция, получающая прогресс обработки от 0 до 1
+    :param imgsz: Размер входа модели (None - выбор по разрешению видео, см. select_inference_size)
+    :param render: False - видео с разметкой не формируется: в хранилище сохраняется исходник,
+        перепакованный в MP4 без перекодирования, а разметку рисует клиент по файлу обнаружений
+    :param timings: Словарь, в который записывается длительность этапов в секундах: probe,
+        pipeline (конвейер целиком), infer и encode (занятость стадий), remux, finalize
+        (проверка и подмена результата), upload, log_save, cleanup (см. spans.py)
+    :return: (имя видео, frame_objects, fps, найдено ли оружие/нож, имя лога)
+    """
     logger.info(f"Начало обработки видео: {filename}, пользователь: {username}")
     
     # Начинаем измерение общего времени обработки
     start_time = time.time()
+    timings = {} if timings is None else timings
+
+    # Все промежуточные файлы задачи живут в собственном каталоге, чтобы параллельные задачи не мешали друг другу
+    workspace = create_workspace()
+    logger.debug(f"Рабочий каталог задачи: {workspace}")
     
     try:
-        # Проверяем и создаем директорию для сохранения результатов
-        if not os.path.exists(video_directory):
-            logger.info(f"Создаю директорию для результатов: {video_directory}")
-            os.makedirs(video_directory, exist_ok=True)
-        
         # Проверяем, что файл существует и доступен для чтения
         if not os.path.exists(filename):
             logger.error(f"Файл не найден: {filename}")
             video_processing_errors_total.labels(error_type='file_not_found').inc()
             raise FileNotFoundError(f"Видеофайл не найден: {filename}")
 
-        cap = cv2.VideoCapture(filename)
-        if not cap.isOpened():
-            logger.error(f"Не удалось открыть видеофайл: {filename}")
-            video_processing_errors_total.labels(error_type='file_open_failed').inc()
-            raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
+        with spans.span('probe', timings):
+            cap = cv2.VideoCapture(filename)
+            if not cap.isOpened():
+                logger.error(f"Не удалось открыть видеофайл: {filename}")
+                video_processing_errors_total.labels(error_type='file_open_failed').inc()
+                raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = int(cap.get(cv2.CAP_PROP_FPS))
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            cap.release()
 
         # Записываем разрешение видео в гистограмму
         pixel_count = width * height
@@ -128,35 +510,64 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             f"Параметры видео: {total_frames} кадров, {fps} FPS, разрешение {width}x{height}"
         )
 
+        if imgsz is None:
+            imgsz = resolution.policy.choose(width, height)['imgsz']
         logger.info(
-            f"Запуск модели обнаружения с порогом уверенности {confidence_threshold}"
+            f"Запуск модели обнаружения с порогом уверенности {confidence_threshold}, размер входа {imgsz}"
         )
-        # Измеряем время инференса модели
-        model_start_time = time.time()
-        results = model.model(source=filename, save=True, conf=confidence_threshold, batch=16, vid_stride=8, stream=True)
-        model_end_time = time.time()
-        model_inference_time_seconds.observe(model_end_time - model_start_time)
-
-        frame_objects = []
-        total_weapons = 0
-        total_knives = 0
-        has_weapon_or_knife = False
-
-        for i, frame_results in enumerate(results):
-            boxes = frame_results.boxes
-            has_weapon = False
-            has_knife = False
-            for box in boxes:
-                cls = int(box.cls[0])
-                if frame_results.names[cls] == "weapon":
-                    has_weapon = True
-                    total_weapons += 1
-                    has_weapon_or_knife = True
-                elif frame_results.names[cls] == "knife":
-                    has_knife = True
-                    total_knives += 1
-                    has_weapon_or_knife = True
-            frame_objects.append((i, has_weapon, has_knife))
+        new_filename = output_filename or build_output_filename(filename, username)
+        logger.debug(f"Новое имя файла: {new_filename}")
+
+        # Кадры с разметкой сразу кодируются в итоговый MP4/H.264 вместе со звуком исходника
+        final_video_path = os.path.join(workspace, new_filename)
+        render_path = final_video_path if render else None
+        logger.debug(f"Путь к итоговому файлу: {final_video_path}")
+        # Все обнаружения (рамки, уверенность, классы) пишутся в колоночный файл по ходу обработки
+        detections_filename = detections_object_name(new_filename)
+        detections_path = os.path.join(workspace, detections_filename)
+
+        # Длинные видео делятся на отрезки, которые обрабатываются параллельно в пуле процессов
+        with spans.span('pipeline', timings):
+            planned = segments.plan_segments(
+                total_frames, SEGMENT_WORKERS, min_frames=SEGMENT_MIN_SECONDS * max(fps, 1), align=VID_STRIDE
+            )
+            if len(planned) > 1 and segments.find_ffmpeg():
+                logger.info(f"Видео разделено на {len(planned)} отрезков для параллельной обработки")
+                frame_objects, counters, stage_stats = _process_segments(
+                    filename, confidence_threshold, render_path, planned, workspace, progress_callback,
+                    imgsz=imgsz, detections_path=detections_path,
+                )
+            else:
+                frame_objects, counters, stage_stats = process_frame_range(
+                    filename, confidence_threshold, render_path,
+                    audio_source=filename, progress_callback=progress_callback, imgsz=imgsz,
+                    detections_path=detections_path,
+                )
+        if timings['pipeline'] > 0:
+            spans.video_processing_fps.set(total_frames / timings['pipeline'])
+        # Инференс и кодирование идут параллельно внутри конвейера: учитывается занятость стадий
+        timings['infer'] = stage_stats['infer']['busy_seconds']
+        model_inference_time_seconds.observe(stage_stats['infer']['busy_seconds'])
+        if render:
+            spans.observe('encode', stage_stats['encode']['busy_seconds'], timings)
+            video_conversion_time_seconds.observe(stage_stats['encode']['busy_seconds'])
+        else:
+            with spans.span('remux', timings):
+                if remux_to_mp4(filename, final_video_path):
+                    # Без разметки сохраняется исходное видео: потоки копируются в MP4 без перекодирования
+                    logger.info(f"Исходное видео перепаковано в MP4 без перекодирования: {final_video_path}")
+                elif _source_container(filename) == 'mp4':
+                    # Исходник уже в MP4: сохраняется как есть
+                    shutil.copy2(filename, final_video_path)
+                    logger.warning(f"Перепаковка не удалась, сохраняется исходный MP4: {final_video_path}")
+                else:
+                    # Копия AVI/MKV/MOV под именем .mp4 с типом video/mp4 не воспроизводится клиентом
+                    video_processing_errors_total.labels(error_type='remux_failed').inc()
+                    raise RuntimeError("Не удалось перепаковать исходное видео в MP4 без перекодирования")
+
+        total_weapons = counters["weapon"]
+        total_knives = counters["knife"]
+        has_weapon_or_knife = total_weapons > 0 or total_knives > 0
 
         # Инкрементируем счетчики обнаруженных объектов
         if total_weapons > 0:
@@ -168,84 +579,19 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             f"Обнаружено объектов: {total_weapons} оружия, {total_knives} ножей"
         )
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = os.path.basename(os.path.splitext(filename)[0])
-        new_filename = f"{username}_{timestamp}_{base_filename}.mp4"
-        logger.debug(f"Новое имя файла: {new_filename}")
-
-        # Используем временную директорию для файла
-        temp_dir = tempfile.gettempdir()
-        final_video_path = os.path.join(temp_dir, new_filename)
-        logger.debug(f"Путь к временному файлу: {final_video_path}")
-
-        # Проверяем, создала ли модель MP4 файл
-        processed_mp4 = os.path.join(
-            "runs", "detect", "predict", os.path.basename(filename)[:-3] + "mp4"
-        )
-        processed_avi = os.path.join(
-            "runs", "detect", "predict", os.path.basename(filename)[:-3] + "avi"
-        )
-
-        if os.path.exists(processed_mp4):
-            # Если модель создала MP4, просто копируем его
-            logger.info(f"Найден MP4 файл, копирование: {processed_mp4}")
-            shutil.copy2(processed_mp4, final_video_path)
-        elif os.path.exists(processed_avi):
-            # Если модель создала AVI, конвертируем в MP4
-            logger.info(f"Найден AVI файл, конвертация: {processed_avi}")
-            conversion_success = convert_avi_to_mp4(processed_avi, final_video_path)
-            if not conversion_success:
-                logger.warning("Конвертация не удалась, пробуем прямое копирование...")
-                shutil.copy2(processed_avi, final_video_path)
-        else:
-            # Ищем любые созданные файлы в директории predict
-            available_files = []
-            if os.path.exists(video_directory):
-                available_files = os.listdir(video_directory)
-
-                # Ищем файл с похожим именем
-                for file in available_files:
-                    if os.path.basename(filename).split(".")[0] in file:
-                        source_path = os.path.join(video_directory, file)
-                        logger.info(f"Найден альтернативный файл: {source_path}")
-
-                        if file.endswith(".mp4"):
-                            shutil.copy2(source_path, final_video_path)
-                            break
-                        elif file.endswith((".avi", ".mov", ".mkv")):
-                            conversion_success = convert_avi_to_mp4(
-                                source_path, final_video_path
-                            )
-                            if not conversion_success:
-                                shutil.copy2(source_path, final_video_path)
-                            break
-                else:
-                    logger.warning(
-                        f"Не найдены подходящие файлы в {video_directory}. Доступные файлы: {available_files}. Создаю копию оригинала."
-                    )
-                    # Копируем исходный файл как результат
-                    shutil.copy2(filename, final_video_path)
-            else:
-                logger.warning(f"Директория {video_directory} не существует. Создаю директорию и копирую оригинал.")
-                os.makedirs(video_directory, exist_ok=True)
-                # Копируем исходный файл как результат
-                shutil.copy2(filename, final_video_path)
-
         # Проверяем, что файл действительно был создан и имеет ненулевой размер
-        if (
-            not os.path.exists(final_video_path)
-            or os.path.getsize(final_video_path) == 0
-        ):
-            logger.warning(
-                f"Финальный видеофайл не создан или имеет нулевой размер: {final_video_path}. Создаем пустой результат."
-            )
-            # Создаем пустое видео, чтобы не прерывать работу приложения
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_filename = f"{username}_{timestamp}_empty_result.mp4"
-            
-            # Скопируем оригинальное видео как результат
-            shutil.copy2(filename, final_video_path)
-            logger.info(f"Создан пустой результат (копия оригинала): {final_video_path}")
+        with spans.span('finalize', timings):
+            if (
+                not os.path.exists(final_video_path)
+                or os.path.getsize(final_video_path) == 0
+            ):
+                logger.warning(
+                    f"Финальный видеофайл не создан или имеет нулевой размер: {final_video_path}. Создаем пустой результат."
+                )
+                # Имя результата не меняем: под ним видео уже зарегистрировано в БД
+                # Скопируем оригинальное видео как результат
+                shutil.copy2(filename, final_video_path)
+                logger.info(f"Создан пустой результат (копия оригинала): {final_video_path}")
 
         # Создаем метаданные
         metadata = {
@@ -256,38 +602,23 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             "width": str(width),
             "height": str(height),
             "processed_date": datetime.now().isoformat(),
+            "rendered": str(render).lower(),
         }
 
         # Загружаем видео в MinIO
         logger.info(f"Загрузка видео в MinIO: {new_filename}")
-        storage.save_video(final_video_path, new_filename, metadata)
+        with spans.span('upload', timings):
+            storage.save_video(final_video_path, new_filename, metadata)
 
         # Сохраняем результаты детекции в MinIO
-        # frame_objects содержит кортежи (номер_кадра, наличие_оружия, наличие_ножа)
-        # где наличие_оружия и наличие_ножа - булевы значения
+        # frame_objects содержит кортежи (номер_кадра, наличие_оружия, наличие_ножа);
+        # в хранилище лог записывается в компактном формате (см. detection_log.py)
         log_filename = f"{new_filename}.json"
         logger.info(f"Сохранение лога детекции в MinIO: {log_filename}")
-        storage.save_log(frame_objects, log_filename)
-
-        # Очистка временных файлов модели
-        logger.debug("Очистка временных файлов")
-        try:
-            if os.path.exists(processed_mp4):
-                os.remove(processed_mp4)
-            if os.path.exists(processed_avi):
-                os.remove(processed_avi)
-            if os.path.exists("runs"):
-                shutil.rmtree("runs")
-                logger.debug("Директория 'runs' удалена")
-                # Создаем директорию заново, чтобы она была доступна для следующих вызовов
-                os.makedirs(video_directory, exist_ok=True)
-        except Exception as e:
-            logger.warning(f"Ошибка при очистке временных файлов: {e}. Продолжаем выполнение.")
-
-        # Удаление временного файла
-        if os.path.exists(final_video_path):
-            os.remove(final_video_path)
-            logger.debug(f"Временный файл удален: {final_video_path}")
+        with spans.span('log_save', timings):
+            storage.save_log(detection_log.encode(frame_objects, fps, total_frames), log_filename)
+            logger.info(f"Сохранение обнаружений в MinIO: {detections_filename}")
+            storage.save_detections(detections_path, detections_filename)
 
         logger.info(f"Обработка видео успешно завершена: {new_filename}")
         
@@ -311,3 +642,9 @@ def process_video(filename, confidence_threshold=0.25, username=None):
         video_processing_errors_total.labels(error_type='general_error').inc()
         
         raise
+
+    finally:
+        # Удаляем только каталог текущей задачи
+        with spans.span('cleanup', timings):
+            shutil.rmtree(workspace, ignore_errors=True)
+        logger.debug(f"Рабочий каталог задачи удален: {workspace}")
@@ -0,0 +1,37 @@
+import os
+
+# Пакет app создает приложение при импорте: фоновая инициализация (БД, MinIO,
+# прогрев модели) замеру не нужна, внешние сервисы заменены объектами в памяти
+os.environ.setdefault('STARTUP_INIT', 'false')
+
+from .corpus import (
+    DEFAULT_CORPUS,
+    QUICK_CORPUS,
+    VideoSpec,
+    generate_video,
+    select_corpus
+)
+from .fakes import (
+    FakeDatabase,
+    FakeMinioClient
+)
+from .runner import (
+    compare_results,
+    load_results,
+    run_benchmark,
+    run_video
+)
+
+__all__ = [
+    'DEFAULT_CORPUS',
+    'FakeDatabase',
+    'FakeMinioClient',
+    'QUICK_CORPUS',
+    'VideoSpec',
+    'compare_results',
+    'generate_video',
+    'load_results',
+    'run_benchmark',
+    'run_video',
+    'select_corpus'
+]
@@ -0,0 +1,63 @@
+"""
+Замер обработки видео на синтетическом наборе
+
+Запуск (из каталога backend):
+    python -m benchmarks --output results.json
+    python -m benchmarks --baseline benchmarks/baseline.json   # сравнение, код 1 при регрессии
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --quick --repeats 1                   # одно короткое видео
+"""
+import argparse
+import json
+import sys
+from .corpus import select_corpus
+from .runner import (
+    compare_results,
+    environment_differences,
+    format_comparison,
+    format_report,
+    load_results,
+    run_benchmark
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер этапов обработки видео на синтетическом наборе")
+    parser.add_argument("--corpus-dir", default=".benchmarks/corpus", help="Каталог сгенерированных видео")
+    parser.add_argument("--videos", nargs="+", help="Имена видео набора (по умолчанию - весь набор)")
+    parser.add_argument("--quick", action="store_true", help="Одно короткое видео 360p")
+    parser.add_argument("--repeats", type=int, default=3, help="Число замеряемых проходов на видео")
+    parser.add_argument("--conf", type=float, default=0.5, help="Порог уверенности")
+    parser.add_argument("--no-render", action="store_true", help="Обработка без видео с разметкой (render=false)")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", help="Базовый результат для сравнения")
+    parser.add_argument("--save-baseline", help="Сохранить результат как базовый")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Допустимое замедление этапа (доля)")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        select_corpus(args.videos, args.quick),
+        args.corpus_dir,
+        repeats=args.repeats,
+        confidence_threshold=args.conf,
+        render=not args.no_render,
+    )
+    print(format_report(results))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        differences = environment_differences(results, baseline)
+        if differences:
+            print(f"Окружение отличается от базового замера: {', '.join(differences)}")
+        regressions, improvements = compare_results(results, baseline, tolerance=args.tolerance)
+        print(format_comparison(regressions, improvements))
+        if regressions:
+            sys.exit(1)
+
+
+main()
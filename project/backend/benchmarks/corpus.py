@@ -0,0 +1,134 @@
+"""
+Детерминированный синтетический набор видео для замеров конвейера обработки
+
+Кадры строятся по имени видео (оно задает начальное значение генератора), поэтому
+один и тот же набор на любой машине дает побайтно одинаковые кадры; файлы
+перекодируются только при смене параметров или отсутствии файла.
+"""
+import json
+import os
+import zlib
+from collections import namedtuple
+import cv2
+import numpy as np
+from app.services.video_processing.encoder import FfmpegWriter
+
+
+VideoSpec = namedtuple('VideoSpec', ['name', 'width', 'height', 'seconds', 'fps', 'codec'])
+
+# Контейнер и способ кодирования для каждого кодека
+CODECS = {
+    'h264': '.mp4',   # libx264 через ffmpeg, как у результатов обработки
+    'mp4v': '.mp4',   # MPEG-4 Part 2 средствами OpenCV
+    'mjpeg': '.avi',  # Motion JPEG: дорогое декодирование каждого кадра
+}
+
+# Набор по умолчанию: от базового видео меняется по одному параметру
+DEFAULT_CORPUS = (
+    VideoSpec('360p-2s-h264', 640, 360, 2, 25, 'h264'),
+    VideoSpec('720p-2s-h264', 1280, 720, 2, 25, 'h264'),
+    VideoSpec('1080p-2s-h264', 1920, 1080, 2, 25, 'h264'),
+    VideoSpec('720p-10s-h264', 1280, 720, 10, 25, 'h264'),
+    VideoSpec('720p-2s-mp4v', 1280, 720, 2, 25, 'mp4v'),
+    VideoSpec('720p-2s-mjpeg', 1280, 720, 2, 25, 'mjpeg'),
+)
+
+# Быстрый набор для проверки изменений
+QUICK_CORPUS = (
+    VideoSpec('360p-2s-mp4v', 640, 360, 2, 25, 'mp4v'),
+)
+
+
+def _seed(spec):
+    return zlib.crc32(spec.name.encode('utf-8'))
+
+
+def render_frames(spec):
+    """
+    Кадры видео: текстурированный фон и несколько движущихся фигур
+
+    Фигуры движутся по фиксированным траекториям с разной скоростью, поэтому
+    выбор кадров по движению (SAMPLER_MODE=motion) ведет себя как на реальной записи.
+    """
+    rng = np.random.default_rng(_seed(spec))
+    height, width = spec.height, spec.width
+    gradient = np.linspace(40, 180, width, dtype=np.float32)[None, :, None]
+    texture = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    background = np.clip(gradient + texture, 0, 255).astype(np.uint8)
+
+    shapes = [
+        {
+            'color': tuple(int(value) for value in rng.integers(0, 256, 3)),
+            'size': int(rng.integers(height // 12, height // 5)),
+            'start': rng.uniform(0, 1, 2),
+            'speed': rng.uniform(-0.4, 0.4, 2),
+        }
+        for _ in range(4)
+    ]
+
+    for index in range(int(spec.seconds * spec.fps)):
+        frame = background.copy()
+        moment = index / spec.fps
+        for number, shape in enumerate(shapes):
+            x, y = np.abs(((shape['start'] + shape['speed'] * moment) % 2.0) - 1.0)
+            center = (int(x * (width - 1)), int(y * (height - 1)))
+            if number % 2:
+                cv2.circle(frame, center, shape['size'] // 2, shape['color'], -1)
+            else:
+                half = shape['size'] // 2
+                cv2.rectangle(
+                    frame, (center[0] - half, center[1] - half), (center[0] + half, center[1] + half),
+                    shape['color'], -1
+                )
+        yield frame
+
+
+def _open_writer(spec, path):
+    if spec.codec == 'h264':
+        return FfmpegWriter(path, spec.fps, (spec.width, spec.height))
+    fourcc = {'mp4v': 'mp4v', 'mjpeg': 'MJPG'}[spec.codec]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), spec.fps, (spec.width, spec.height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Не удалось открыть кодировщик {spec.codec} для {path}")
+    return writer
+
+
+def generate_video(spec, directory):
+    """
+    Файл видео набора (создается, если его нет или он создан с другими параметрами)
+
+    :return: Путь к файлу
+    """
+    if spec.codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек: {spec.codec}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, spec.name + CODECS[spec.codec])
+    manifest_path = path + '.json'
+    manifest = dict(spec._asdict())
+
+    if os.path.exists(path) and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return path
+
+    writer = _open_writer(spec, path)
+    try:
+        for frame in render_frames(spec):
+            writer.write(frame)
+    finally:
+        writer.release()
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+def select_corpus(names=None, quick=False):
+    """Видео набора по именам (None - весь набор)"""
+    corpus = QUICK_CORPUS if quick else DEFAULT_CORPUS
+    if not names:
+        return list(corpus)
+    by_name = {spec.name: spec for spec in DEFAULT_CORPUS + QUICK_CORPUS}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Неизвестные видео набора: {', '.join(unknown)}")
+    return [by_name[name] for name in names]
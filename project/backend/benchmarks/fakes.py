@@ -0,0 +1,155 @@
+"""
+Заменители MinIO и PostgreSQL в памяти процесса
+
+Замер не должен зависеть от сети и внешних сервисов: клиент MinIO хранит объекты
+в словаре (MinioStorage работает с ним без изменений), база данных - строки в
+словарях. Каждая операция учитывается в calls с длительностью, чтобы время
+записи в хранилище и БД входило в отчет отдельными этапами.
+"""
+import io
+import json
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+
+Bucket = namedtuple('Bucket', ['name'])
+ObjectStat = namedtuple('ObjectStat', ['bucket_name', 'object_name', 'size', 'content_type', 'metadata'])
+
+
+def _timed(func):
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.calls.append((func.__name__, time.perf_counter() - started))
+    return wrapper
+
+
+class _Response:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amount=None):
+        return self._stream.read(amount)
+
+    def close(self):
+        self._stream.close()
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinioClient:
+    """Клиент MinIO в памяти (подмножество API minio.Minio, используемое MinioStorage)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = {}
+        self.lifecycle = {}
+        self.calls = []
+
+    def list_buckets(self):
+        return [Bucket(name) for name in self.buckets]
+
+    def bucket_exists(self, bucket_name):
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name):
+        self.buckets.setdefault(bucket_name, {})
+
+    def set_bucket_lifecycle(self, bucket_name, config):
+        self.lifecycle[bucket_name] = config
+
+    def _store(self, bucket_name, object_name, data, content_type, metadata):
+        with self._lock:
+            self.buckets.setdefault(bucket_name, {})[object_name] = (data, content_type, dict(metadata or {}))
+
+    @_timed
+    def fput_object(self, bucket_name, object_name, file_path, content_type='application/octet-stream', metadata=None):
+        with open(file_path, 'rb') as f:
+            self._store(bucket_name, object_name, f.read(), content_type, metadata)
+
+    @_timed
+    def put_object(self, bucket_name, object_name, data, length, content_type='application/octet-stream', metadata=None):
+        self._store(bucket_name, object_name, data.read(length), content_type, metadata)
+
+    def stat_object(self, bucket_name, object_name):
+        data, content_type, metadata = self.buckets[bucket_name][object_name]
+        return ObjectStat(bucket_name, object_name, len(data), content_type, metadata)
+
+    @_timed
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        data = self.buckets[bucket_name][object_name][0]
+        return _Response(data[offset:offset + length] if length else data[offset:])
+
+    def size(self):
+        """Суммарный размер объектов, байты"""
+        return sum(len(item[0]) for objects in self.buckets.values() for item in objects.values())
+
+
+class FakeDatabase:
+    """
+    База данных в памяти с методами DatabaseManager, которые вызывает задача обработки
+
+    Метаданные и результаты сериализуются в JSON, как при записи в колонки JSONB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = []
+        self.videos = {}
+        self.results = {}
+        self.logs = []
+        self.cache = {}
+        self._next_id = 1
+
+    @_timed
+    def save_video_metadata(self, user_id, s3_key, bucket_name, metadata=None, status='pending'):
+        with self._lock:
+            video_id = self._next_id
+            self._next_id += 1
+            self.videos[video_id] = {
+                'user_id': user_id, 's3_key': s3_key, 'bucket_name': bucket_name,
+                'metadata': json.dumps(metadata or {}), 'status': status,
+            }
+        return video_id, None
+
+    @_timed
+    def update_video_status(self, video_id, status):
+        self.videos[video_id]['status'] = status
+        return True, None
+
+    @_timed
+    def update_video_metadata(self, video_id, updates):
+        video = self.videos[video_id]
+        metadata = json.loads(video['metadata'])
+        metadata.update(updates)
+        video['metadata'] = json.dumps(metadata)
+        return True, None
+
+    @_timed
+    def save_detection_results(self, video_id, log_filename, frame_objects, weapon_detected, summary=None, model_variant=None):
+        self.results[video_id] = json.dumps({
+            'log_filename': log_filename,
+            'frame_objects': frame_objects,
+            'weapon_detected': weapon_detected,
+            'summary': summary,
+            'model_variant': model_variant,
+        })
+        return True, None
+
+    @_timed
+    def add_log(self, user_id, action, video_id=None, details=None):
+        with self._lock:
+            self.logs.append((user_id, action, video_id, json.dumps(details or {})))
+        return True
+
+    @_timed
+    def save_cached_result(self, cache_key, user_id, video_id, content_sha256, model_version, confidence_threshold):
+        self.cache[(cache_key, user_id)] = (video_id, content_sha256, model_version, confidence_threshold)
+        return True, None
@@ -0,0 +1,247 @@
+"""
+Замер обработки видео по этапам и сравнение с сохраненным базовым результатом
+
+Каждое видео набора обрабатывается так же, как задача из очереди /predict
+(routes._run_prediction_job): выбор размера входа, process_video, запись в MinIO
+и в БД. MinIO и PostgreSQL заменены объектами в памяти (см. fakes.py), поэтому
+результат зависит только от кода обработки, модели и процессора.
+
+Этапы отчета (медиана по повторам, секунды):
+    probe     - чтение параметров видео и выбор размера входа
+    pipeline  - конвейер целиком (декодирование, инференс, отрисовка, кодирование)
+    infer     - занятость стадии инференса
+    encode    - занятость стадии кодирования (remux - перепаковка при render=false)
+    finalize  - проверка итогового файла (и копия исходника, если его нет)
+    upload    - загрузка видео в MinIO
+    log_save  - запись лога и файла обнаружений в MinIO
+    cleanup   - удаление рабочего каталога задачи
+    db        - запросы к БД задачи
+    job       - задача целиком
+"""
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from unittest.mock import patch
+from .corpus import generate_video
+from .fakes import FakeDatabase, FakeMinioClient
+
+
+RESULTS_FORMAT = "pipeline-benchmark"
+RESULTS_VERSION = 1
+
+# Порядок этапов в отчете
+STAGES = ('probe', 'pipeline', 'infer', 'encode', 'remux', 'finalize', 'upload', 'log_save', 'cleanup', 'db', 'job')
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _timed(func, timings, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings['select_size'] = time.perf_counter() - started
+
+
+def environment():
+    """Параметры, от которых зависят замеры: процессоры, модель и настройки обработки"""
+    from app.models import model
+    from app.services.tuning import tuning
+    from app.services.video_processing import video_processing
+
+    config = tuning.current_config()
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': config['cpus'],
+        'torch_threads': config['torch_intra_op'],
+        'model_variant': model.get_model_variant(),
+        'model_version': model.get_model_version(),
+        'inference_max_batch': model.INFERENCE_MAX_BATCH,
+        'pipeline_batch_size': video_processing.PIPELINE_BATCH_SIZE,
+        'segment_workers': video_processing.SEGMENT_WORKERS,
+        'settings': video_processing.processing_settings(),
+    }
+
+
+def run_video(spec, corpus_dir, repeats=3, confidence_threshold=0.5, render=True):
+    """
+    Замер одного видео набора
+
+    Первый проход не учитывается (загрузка модели, прогрев кэшей).
+
+    :return: {'video', 'frames', 'runs', 'stages': {этап: медиана}, 'fps', 'stored_bytes'}
+    """
+    from app.api import routes
+    from app.services.minio import MinioStorage
+    from app.services.video_processing import video_processing
+
+    source = generate_video(spec, corpus_dir)
+    content_sha256 = _sha256(source)
+    client = FakeMinioClient()
+    storage = MinioStorage(lazy=True)
+    storage.client = client
+    storage._ensure_buckets_exist()
+    database = FakeDatabase()
+    process_video = video_processing.process_video
+    select_size = video_processing.select_inference_size
+
+    samples = []
+    with tempfile.TemporaryDirectory() as workspace, \
+         patch.object(video_processing, 'storage', storage), \
+         patch.object(routes, 'db_manager', database):
+        for run in range(repeats + 1):
+            temp_path = os.path.join(workspace, f"{run}_{os.path.basename(source)}")
+            shutil.copyfile(source, temp_path)
+            video_filename = f"bench_{run}_{spec.name}.mp4"
+            user_id = 1
+            video_id, _ = database.save_video_metadata(user_id, video_filename, storage.video_bucket, {'progress': 0.0})
+            payload = {
+                'temp_path': temp_path,
+                'username': 'bench',
+                'user_id': user_id,
+                'video_id': video_id,
+                'video_filename': video_filename,
+                'original_filename': os.path.basename(source),
+                'confidence_threshold': confidence_threshold,
+                'imgsz': None,
+                'render': render,
+                'cache_key': video_processing.build_cache_key(content_sha256, confidence_threshold, render=render),
+                'content_sha256': content_sha256,
+            }
+
+            timings = {}
+            database.calls.clear()
+            started = time.perf_counter()
+            with patch.object(video_processing, 'process_video', partial(process_video, timings=timings)), \
+                 patch.object(video_processing, 'select_inference_size', partial(_timed, select_size, timings)):
+                routes._run_prediction_job(video_id, payload, lambda progress: None)
+            timings['job'] = time.perf_counter() - started
+            # Выбор размера входа в задаче открывает видео отдельно от process_video: входит в probe
+            timings['probe'] += timings.pop('select_size')
+            timings['db'] = sum(duration for _, duration in database.calls)
+            if run:
+                samples.append(timings)
+
+    frames = int(spec.seconds * spec.fps)
+    stages = {
+        stage: statistics.median(sample[stage] for sample in samples)
+        for stage in STAGES if all(stage in sample for sample in samples)
+    }
+    return {
+        'video': spec.name,
+        'width': spec.width,
+        'height': spec.height,
+        'codec': spec.codec,
+        'frames': frames,
+        'runs': len(samples),
+        'stages': {stage: round(value, 6) for stage, value in stages.items()},
+        'fps': round(frames / stages['job'], 3) if stages.get('job') else None,
+        'stored_bytes': client.size() // max(1, repeats + 1),
+    }
+
+
+def run_benchmark(corpus, corpus_dir, repeats=3, confidence_threshold=0.5, render=True, progress=print):
+    """
+    Замер всех видео набора
+
+    :return: Результаты в машиночитаемом виде (сохраняются в JSON и сравниваются compare_results)
+    """
+    videos = []
+    for spec in corpus:
+        result = run_video(spec, corpus_dir, repeats, confidence_threshold, render)
+        videos.append(result)
+        if progress:
+            progress(f"{spec.name}: {result['fps']} кадров/с, задача {result['stages']['job']:.3f} с")
+
+    return {
+        'format': RESULTS_FORMAT,
+        'version': RESULTS_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'repeats': repeats,
+        'confidence_threshold': confidence_threshold,
+        'render': render,
+        'environment': environment(),
+        'videos': videos,
+    }
+
+
+def load_results(path):
+    """Чтение сохраненных результатов с проверкой формата"""
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('format') != RESULTS_FORMAT or results.get('version') != RESULTS_VERSION:
+        raise ValueError(f"Файл {path} не является результатом замера версии {RESULTS_VERSION}")
+    return results
+
+
+def compare_results(current, baseline, tolerance=0.15, min_seconds=0.01):
+    """
+    Сравнение этапов с базовым результатом
+
+    Этап считается изменившимся, если время отличается больше чем на tolerance
+    (доля) и больше чем на min_seconds: короткие этапы шумят сильнее.
+
+    :return: (регрессии, улучшения) - списки {'video', 'stage', 'baseline', 'current', 'change'}
+    """
+    baseline_videos = {item['video']: item for item in baseline['videos']}
+    regressions, improvements = [], []
+    for item in current['videos']:
+        reference = baseline_videos.get(item['video'])
+        if reference is None:
+            continue
+        for stage, value in item['stages'].items():
+            base = reference['stages'].get(stage)
+            if base is None or abs(value - base) < min_seconds:
+                continue
+            change = (value - base) / base if base > 0 else float('inf')
+            entry = {'video': item['video'], 'stage': stage, 'baseline': base, 'current': value, 'change': round(change, 4)}
+            if change > tolerance:
+                regressions.append(entry)
+            elif change < -tolerance:
+                improvements.append(entry)
+    return regressions, improvements
+
+
+def environment_differences(current, baseline):
+    """Параметры окружения, которые отличаются от базового замера (сравнение может быть некорректным)"""
+    current_env, baseline_env = current.get('environment', {}), baseline.get('environment', {})
+    return sorted(key for key in set(current_env) | set(baseline_env) if current_env.get(key) != baseline_env.get(key))
+
+
+def format_report(results):
+    """Таблица этапов по видео"""
+    stages = [stage for stage in STAGES if any(stage in item['stages'] for item in results['videos'])]
+    lines = [f"{'video':<18}{'fps':>9}" + "".join(f"{stage:>10}" for stage in stages)]
+    for item in results['videos']:
+        values = "".join(
+            f"{item['stages'][stage]:>10.3f}" if stage in item['stages'] else f"{'-':>10}" for stage in stages
+        )
+        lines.append(f"{item['video']:<18}{item['fps'] or 0:>9.2f}{values}")
+    return "\n".join(lines)
+
+
+def format_comparison(regressions, improvements):
+    lines = []
+    for title, entries in (("Регрессии", regressions), ("Улучшения", improvements)):
+        if entries:
+            lines.append(f"{title}:")
+            for entry in entries:
+                lines.append(
+                    f"  {entry['video']} {entry['stage']}: {entry['baseline']:.3f} -> {entry['current']:.3f} с "
+                    f"({entry['change']:+.1%})"
+                )
+    return "\n".join(lines) or "Изменений относительно базового замера нет"
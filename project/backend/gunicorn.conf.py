@@ -0,0 +1,23 @@
+"""
+Настройки gunicorn: число воркеров и потоков по доступным процессорам
+
+Модуль topology загружается по пути файла: импорт пакета app загружает Flask и
+метрики, а в мастер-процессе gunicorn они не нужны.
+"""
+import importlib.util
+import os
+
+
+_spec = importlib.util.spec_from_file_location(
+    "topology", os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "services", "tuning", "topology.py")
+)
+topology = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(topology)
+
+_config = topology.load_config()
+
+bind = "0.0.0.0:5174"
+timeout = 120
+workers = _config['workers']
+threads = _config['threads']
+worker_class = "gthread"
@@ -4,6 +4,10 @@ import tempfile
 import json
 import jwt
 from unittest.mock import patch, MagicMock
+
+# Фоновая инициализация (подключение к БД, MinIO, прогрев модели) в тестах не нужна
+os.environ.setdefault('STARTUP_INIT', 'false')
+
 from app import create_app
 from datetime import datetime
 import numpy as np
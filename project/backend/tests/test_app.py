@@ -75,11 +75,11 @@ def test_video_upload_to_minio(authenticated_client, test_video_file):
             content_type='multipart/form-data'
         )
             
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = json.loads(response.data)
+    assert 'job_id' in data
     assert 'video_url' in data
-    assert 'frame_objects' in data
-    assert 'fps' in data
+    assert data['status'] == 'pending'
 
 def test_get_video_from_minio(authenticated_client):
     """Проверяет получение видео из MinIO."""
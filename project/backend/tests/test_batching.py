@@ -0,0 +1,111 @@
+import pytest
+import threading
+import time
+import numpy as np
+from app.models.model import Detections
+from app.services.inference import BatchScheduler
+
+
+def frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+class RecordingPredict:
+    """Возвращает для каждого кадра рамки с уверенностью 0.3 и 0.9, записывает размеры пакетов."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.confs = []
+
+    def __call__(self, frames, conf=0.25, **kwargs):
+        self.batches.append([int(item[0, 0, 0]) for item in frames])
+        self.confs.append(conf)
+        time.sleep(self.delay)
+        return [
+            Detections(
+                xyxy=np.array([[0, 0, 1, 1], [item[0, 0, 0], 0, 2, 2]], dtype=np.float32),
+                conf=np.array([0.3, 0.9], dtype=np.float32),
+                cls=np.array([0, 1], dtype=np.int32),
+            )
+            for item in frames
+        ]
+
+
+def test_scheduler_merges_concurrent_requests():
+    """Тестирует объединение кадров из параллельных потоков в общий пакет и возврат результатов своим потокам."""
+    predict = RecordingPredict(delay=0.05)
+    scheduler = BatchScheduler(predict, max_batch_size=8, max_wait=0.2)
+    results = {}
+
+    def job(value):
+        results[value] = scheduler.predict([frame(value)] * 2, conf=0.25)
+
+    threads = [threading.Thread(target=job, args=(value,)) for value in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+
+    assert max(len(batch) for batch in predict.batches) > 2
+    assert all(len(batch) <= 8 for batch in predict.batches)
+    for value, detections in results.items():
+        assert len(detections) == 2
+        assert detections[0].xyxy[1, 0] == value
+
+
+def test_scheduler_filters_results_by_request_conf():
+    """Тестирует выполнение пакета с минимальным порогом и фильтрацию по порогу каждого запроса."""
+    predict = RecordingPredict(delay=0.05)
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait=0.2)
+    results = {}
+
+    def job(conf):
+        results[conf] = scheduler.predict([frame(1), frame(2)], conf=conf)
+
+    threads = [threading.Thread(target=job, args=(conf,)) for conf in (0.25, 0.5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+
+    assert len(results[0.25][0].conf) == 2
+    assert results[0.5][0].conf.tolist() == pytest.approx([0.9])
+
+
+def test_scheduler_splits_large_request():
+    """Тестирует разбиение запроса больше max_batch_size на несколько пакетов с сохранением порядка."""
+    predict = RecordingPredict()
+    scheduler = BatchScheduler(predict, max_batch_size=3, max_wait=0)
+
+    detections = scheduler.predict([frame(value) for value in range(7)])
+    scheduler.close()
+
+    assert [len(batch) for batch in predict.batches] == [3, 3, 1]
+    assert [int(item.xyxy[1, 0]) for item in detections] == list(range(7))
+
+
+def test_scheduler_single_caller_does_not_wait():
+    """Тестирует отсутствие ожидания заполнения пакета для одиночного потока."""
+    scheduler = BatchScheduler(RecordingPredict(), max_batch_size=16, max_wait=1.0)
+
+    started = time.perf_counter()
+    scheduler.predict([frame(1)])
+    elapsed = time.perf_counter() - started
+    scheduler.close()
+
+    assert elapsed < 0.5
+
+
+def test_scheduler_propagates_errors():
+    """Тестирует проброс ошибки инференса в вызвавший поток."""
+    def broken(frames, conf=0.25, **kwargs):
+        raise RuntimeError("inference failed")
+
+    scheduler = BatchScheduler(broken, max_wait=0)
+
+    with pytest.raises(RuntimeError):
+        scheduler.predict([frame(1)])
+    scheduler.close()
@@ -0,0 +1,67 @@
+import json
+import numpy as np
+from benchmarks import corpus, runner
+from benchmarks.fakes import FakeDatabase, FakeMinioClient
+from app.services.minio import MinioStorage
+
+
+SMALL = corpus.VideoSpec('test-64p', 96, 64, 0.4, 10, 'mp4v')
+
+
+def test_render_frames_is_deterministic():
+    """Тестирует, что кадры набора одинаковы при каждой генерации и меняются во времени."""
+    first = list(corpus.render_frames(SMALL))
+    second = list(corpus.render_frames(SMALL))
+
+    assert len(first) == 4
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[0], first[-1])
+
+
+def test_generate_video_reuses_existing_file(tmp_path):
+    """Тестирует повторное использование видео, созданного с теми же параметрами."""
+    path = corpus.generate_video(SMALL, str(tmp_path))
+    modified = (tmp_path / 'test-64p.mp4').stat().st_mtime_ns
+
+    assert corpus.generate_video(SMALL, str(tmp_path)) == path
+    assert (tmp_path / 'test-64p.mp4').stat().st_mtime_ns == modified
+    assert json.loads((tmp_path / 'test-64p.mp4.json').read_text())['codec'] == 'mp4v'
+
+
+def test_fake_minio_client_with_storage(tmp_path):
+    """Тестирует работу MinioStorage с клиентом в памяти."""
+    storage = MinioStorage(lazy=True)
+    storage.client = FakeMinioClient()
+    storage._ensure_buckets_exist()
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'0123456789')
+
+    assert storage.save_video(str(video), 'video.mp4', {'fps': '25'})
+    assert storage.save_log({'frames': []}, 'video.mp4.json')
+    assert storage.get_object_range(storage.video_bucket, 'video.mp4', 2, 3) == b'234'
+    assert [name for name, _ in storage.client.calls][:2] == ['fput_object', 'put_object']
+
+
+def test_fake_database_records_calls():
+    """Тестирует запись метаданных и учет операций в базе данных в памяти."""
+    database = FakeDatabase()
+    video_id, error = database.save_video_metadata(1, 'video.mp4', 'videos', {'progress': 0.0})
+    database.update_video_metadata(video_id, {'progress': 1.0})
+
+    assert error is None
+    assert json.loads(database.videos[video_id]['metadata']) == {'progress': 1.0}
+    assert [name for name, _ in database.calls] == ['save_video_metadata', 'update_video_metadata']
+
+
+def test_compare_results_reports_regressions():
+    """Тестирует сравнение с базовым замером: допуск, минимальная разница и новые видео."""
+    def results(stages, video='720p'):
+        return {'videos': [{'video': video, 'stages': stages}]}
+
+    baseline = results({'infer': 1.0, 'upload': 0.002, 'encode': 0.5})
+    current = results({'infer': 1.3, 'upload': 0.006, 'encode': 0.3})
+    regressions, improvements = runner.compare_results(current, baseline, tolerance=0.15)
+
+    assert [(item['stage'], item['change']) for item in regressions] == [('infer', 0.3)]
+    assert [item['stage'] for item in improvements] == ['encode']
+    assert runner.compare_results(results({'infer': 9.0}, video='1080p'), baseline) == ([], [])
@@ -39,6 +39,26 @@ def test_init_database(db_manager):
     # Проверяем, что был вызван close для закрытия соединения
     db_manager._mock_conn.close.assert_called()
 
+
+def test_init_database_applies_schema_updates(db_manager):
+    """Тестирует применение изменений схемы при инициализации."""
+    from app.services.database.db import SCHEMA_UPDATES
+
+    db_manager.init_database()
+
+    executed = [call.args[0] for call in db_manager._mock_cursor.execute.call_args_list]
+    assert executed == SCHEMA_UPDATES
+    db_manager._mock_conn.commit.assert_called()
+
+def test_init_database_fails_when_schema_update_fails(db_manager):
+    """Тестирует неудачу инициализации, если изменения схемы не применены (приложение не готово)."""
+    db_manager._mock_cursor.execute.side_effect = Exception("permission denied")
+
+    assert db_manager.init_database() is False
+
+    db_manager._mock_conn.rollback.assert_called_once()
+    db_manager._mock_conn.close.assert_called()
+
 def test_create_user(db_manager):
     """Тестирует создание пользователя."""
     # Мокаем возвращаемое значение для execute_query
@@ -144,6 +164,34 @@ def test_save_video_metadata(db_manager):
     assert error is None
     db_manager.execute_query.assert_called_once()
 
+def test_save_upload_part_reports_inactive_upload(db_manager):
+    """Тестирует отметку части: дополнение словаря частей и отказ для неактивной загрузки."""
+    upload_id = uuid.uuid4()
+    db_manager.execute_query = MagicMock(return_value=({"upload_id": upload_id}, None))
+
+    assert db_manager.save_upload_part(upload_id, 3, 'etag-3') == (True, None)
+    query, params = db_manager.execute_query.call_args[0]
+    assert "parts || jsonb_build_object" in query
+    assert "status = 'active'" in query
+    assert params == ('3', 'etag-3', upload_id)
+
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+    assert db_manager.save_upload_part(upload_id, 3, 'etag-3') == (False, None)
+
+def test_claim_upload_video_only_once(db_manager):
+    """Тестирует привязку видео к загрузке условным UPDATE и отказ, если видео уже привязано."""
+    upload_id = uuid.uuid4()
+    video_id = uuid.uuid4()
+    db_manager.execute_query = MagicMock(return_value=({"upload_id": upload_id}, None))
+
+    assert db_manager.claim_upload_video(upload_id, video_id) == (True, None)
+    query, params = db_manager.execute_query.call_args[0]
+    assert "video_id IS NULL" in query
+    assert params == (video_id, upload_id)
+
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+    assert db_manager.claim_upload_video(upload_id, video_id) == (False, None)
+
 def test_save_video_metadata_error(db_manager):
     """Тестирует обработку ошибок при сохранении метаданных видео."""
     # Мокаем ошибку в execute_query
@@ -297,4 +345,32 @@ def test_delete_video_error(db_manager):
     assert "Ошибка при удалении видео" in error
     
     # Проверяем, что метод transaction был вызван
-    db_manager.transaction.assert_called_once() 
\ No newline at end of file
+    db_manager.transaction.assert_called_once() 
+def test_get_expired_upload_sessions(db_manager):
+    """Тестирует выборку незавершенных загрузок старше срока."""
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+
+    assert db_manager.get_expired_upload_sessions('multipart', 24) == ([], None)
+    query, params = db_manager.execute_query.call_args[0]
+    assert "status = 'active'" in query
+    assert "created_at <" in query
+    assert params == ('multipart', 24 * 3600.0)
+
+def test_fail_stale_videos(db_manager):
+    """Тестирует перевод в failed незавершенных видео без свежей отметки воркера."""
+    db_manager.execute_query = MagicMock(return_value=([('video-1',)], None))
+
+    assert db_manager.fail_stale_videos(600) == (['video-1'], None)
+    query, params = db_manager.execute_query.call_args[0]
+    assert "status IN ('pending', 'processing')" in query
+    assert "heartbeat_at" in query
+    assert params == (600.0,)
+
+def test_touch_videos(db_manager):
+    """Тестирует отметку незавершенных задач воркера."""
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+
+    assert db_manager.touch_videos(['video-1']) == (True, None)
+    query, params = db_manager.execute_query.call_args[0]
+    assert "heartbeat_at" in query
+    assert params == (['video-1'],)
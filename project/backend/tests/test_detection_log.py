@@ -0,0 +1,57 @@
+import pytest
+import json
+import random
+from app.services.video_processing import detection_log
+
+
+def test_roundtrip_fixed_stride():
+    """Тестирует восстановление лога с фиксированным шагом выбора кадров."""
+    frame_objects = [[index, 80 <= index < 120, index == 200] for index in range(0, 400, 8)]
+
+    log = detection_log.encode(frame_objects, fps=25, total_frames=400)
+
+    assert log['version'] == detection_log.FORMAT_VERSION
+    assert log['sampled'] == [[0, 8, 50]]
+    assert log['classes']['weapon'] == [[80, 112]]
+    assert log['classes']['knife'] == [[200, 200]]
+    assert detection_log.expand(log) == frame_objects
+
+
+def test_roundtrip_irregular_sampling():
+    """Тестирует восстановление лога при неравномерном выборе кадров (выбор по движению)."""
+    rng = random.Random(0)
+    index = 0
+    frame_objects = []
+    for _ in range(500):
+        frame_objects.append([index, rng.random() < 0.1, rng.random() < 0.05])
+        index += rng.choice([2, 2, 4, 32])
+
+    log = detection_log.encode(frame_objects)
+
+    assert detection_log.expand(json.loads(json.dumps(log))) == frame_objects
+    assert detection_log.summarize(log) == detection_log.summarize(frame_objects)
+
+
+def test_legacy_log_is_read_as_is():
+    """Тестирует чтение лога исходного формата (список кадров)."""
+    legacy = [[0, 1, 0], [1, 0, 1]]
+
+    assert detection_log.is_valid(legacy)
+    assert detection_log.expand(legacy) == legacy
+    assert detection_log.summarize(legacy)['detection_frames'] == 2
+
+
+def test_compact_log_is_much_smaller():
+    """Тестирует размер компактного лога длинного видео без обнаружений."""
+    frame_objects = [[index, False, False] for index in range(0, 90000, 8)]
+
+    legacy_size = len(json.dumps(frame_objects))
+    compact_size = len(json.dumps(detection_log.encode(frame_objects, fps=25, total_frames=90000)))
+
+    assert compact_size * 100 < legacy_size
+
+
+def test_unknown_version_is_rejected():
+    """Тестирует ошибку при чтении лога неизвестной версии."""
+    with pytest.raises(ValueError):
+        detection_log.expand({'format': 'detection-log', 'version': 99, 'sampled': [], 'classes': {}})
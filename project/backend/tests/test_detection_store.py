@@ -0,0 +1,157 @@
+import pytest
+import numpy as np
+from app.models.model import Detections
+from app.services.video_processing.detection_store import DetectionReader, DetectionWriter, evaluate_threshold
+
+
+CLASS_NAMES = {0: "weapon", 1: "knife"}
+
+
+def make_detections(frame_index):
+    """Обнаружения кадра: оружие на четных кадрах, нож на кадрах, кратных 10."""
+    classes = [0] * (frame_index % 2 == 0) + [1] * (frame_index % 10 == 0)
+    count = len(classes)
+    xyxy = np.tile(np.array([frame_index, 1, frame_index + 10, 11], dtype=np.float32), (count, 1))
+    return Detections(xyxy=xyxy, conf=np.full(count, 0.5, dtype=np.float32), cls=np.array(classes, dtype=np.float32))
+
+
+def write_file(path, frames, chunk_rows=8):
+    writer = DetectionWriter(str(path), fps=10, class_names=CLASS_NAMES, chunk_rows=chunk_rows)
+    for frame_index in frames:
+        writer.add(frame_index, make_detections(frame_index))
+    return writer.close()
+
+
+class CountingRange:
+    """Чтение диапазонов файла с подсчетом запросов и прочитанных байт."""
+
+    def __init__(self, path):
+        self.data = path.read_bytes()
+        self.requests = 0
+        self.bytes = 0
+
+    def __call__(self, offset, length):
+        self.requests += 1
+        self.bytes += length
+        return self.data[offset:offset + length]
+
+
+def test_roundtrip(tmp_path):
+    """Тестирует запись и чтение всех обнаружений."""
+    path = tmp_path / "video.detections"
+    rows = write_file(path, range(100))
+
+    reader = DetectionReader.from_file(str(path))
+    columns = reader.read()
+
+    assert reader.fps == 10
+    assert reader.class_names == CLASS_NAMES
+    assert rows == reader.rows == len(columns["frame"]) == 60
+    assert columns["xyxy"].shape == (60, 4)
+    assert columns["frame"][0] == 0 and columns["cls"][:2].tolist() == [0, 1]
+    np.testing.assert_array_equal(columns["xyxy"][:, 0], columns["frame"].astype(np.float32))
+
+
+def test_window_reads_only_overlapping_chunks(tmp_path):
+    """Тестирует чтение интервала времени: загружаются только нужные блоки."""
+    path = tmp_path / "video.detections"
+    write_file(path, range(1000))
+    fetch = CountingRange(path)
+    reader = DetectionReader(fetch, len(fetch.data))
+    footer_bytes = fetch.bytes
+
+    columns = reader.read_window(start_seconds=50, end_seconds=52, classes=["weapon"])
+
+    assert columns["frame"].tolist() == list(range(500, 520, 2))
+    assert set(columns["cls"].tolist()) == {0}
+    # Интервал занимает пару блоков по 8 строк: прочитана малая часть файла
+    assert fetch.bytes - footer_bytes < 3 * 8 * 26
+
+
+def test_class_filter_skips_chunks_without_class(tmp_path):
+    """Тестирует пропуск блоков, в которых нет запрошенного класса."""
+    path = tmp_path / "video.detections"
+    writer = DetectionWriter(str(path), fps=10, class_names=CLASS_NAMES, chunk_rows=4)
+    for frame_index in range(40):
+        classes = [1] if frame_index >= 36 else [0]
+        writer.add(frame_index, Detections(
+            xyxy=np.zeros((1, 4), dtype=np.float32), conf=np.ones(1, dtype=np.float32), cls=np.array(classes)
+        ))
+    writer.close()
+    fetch = CountingRange(path)
+    reader = DetectionReader(fetch, len(fetch.data))
+    requests = fetch.requests
+
+    columns = reader.read(classes=["knife"])
+
+    assert columns["frame"].tolist() == [36, 37, 38, 39]
+    assert fetch.requests - requests == 1
+
+
+def test_append_file_merges_segments(tmp_path):
+    """Тестирует объединение файлов отрезков без разбора строк."""
+    first, second, merged = tmp_path / "a", tmp_path / "b", tmp_path / "merged"
+    write_file(first, range(0, 50))
+    write_file(second, range(50, 100))
+
+    writer = DetectionWriter(str(merged))
+    writer.append_file(str(first))
+    writer.append_file(str(second))
+    writer.close()
+
+    expected = tmp_path / "expected"
+    write_file(expected, range(100))
+    merged_columns = DetectionReader.from_file(str(merged)).read()
+    expected_columns = DetectionReader.from_file(str(expected)).read()
+    for name in expected_columns:
+        np.testing.assert_array_equal(merged_columns[name], expected_columns[name])
+    assert DetectionReader.from_file(str(merged)).class_names == CLASS_NAMES
+
+
+def test_rejects_foreign_file(tmp_path):
+    """Тестирует отказ читать файл другого формата."""
+    path = tmp_path / "video.json"
+    path.write_bytes(b"{}" * 20)
+
+    with pytest.raises(ValueError):
+        DetectionReader.from_file(str(path))
+
+
+def test_min_score_skips_low_confidence_chunks(tmp_path):
+    """Тестирует пропуск блоков, в которых нет обнаружений выше порога."""
+    path = tmp_path / "video.detections"
+    writer = DetectionWriter(str(path), fps=10, class_names=CLASS_NAMES, chunk_rows=4, min_score=0.1)
+    for frame_index in range(40):
+        score = 0.9 if frame_index < 4 else 0.2
+        writer.add(frame_index, Detections(
+            xyxy=np.zeros((1, 4), dtype=np.float32), conf=np.array([score], dtype=np.float32), cls=np.array([0])
+        ))
+    writer.close()
+    fetch = CountingRange(path)
+    reader = DetectionReader(fetch, len(fetch.data))
+    requests = fetch.requests
+
+    columns = reader.read(min_score=0.5)
+
+    assert reader.min_score == 0.1
+    assert columns["frame"].tolist() == [0, 1, 2, 3]
+    assert fetch.requests - requests == 1
+
+
+def test_evaluate_threshold(tmp_path):
+    """Тестирует пересчет frame_objects и счетчиков при другом пороге."""
+    path = tmp_path / "video.detections"
+    writer = DetectionWriter(str(path), fps=10, class_names=CLASS_NAMES, min_score=0.1)
+    writer.add(0, Detections(xyxy=np.zeros((2, 4), dtype=np.float32), conf=np.array([0.9, 0.3]), cls=np.array([0, 1])))
+    writer.add(8, Detections(xyxy=np.zeros((1, 4), dtype=np.float32), conf=np.array([0.4]), cls=np.array([0])))
+    writer.close()
+    columns = DetectionReader.from_file(str(path)).read()
+
+    frame_objects, counters = evaluate_threshold(columns, CLASS_NAMES, [0, 4, 8], 0.35)
+
+    assert frame_objects == [(0, True, False), (4, False, False), (8, True, False)]
+    assert counters == {"weapon": 2, "knife": 0}
+
+    frame_objects, counters = evaluate_threshold(columns, CLASS_NAMES, [0, 4, 8], 0.2)
+    assert frame_objects[0] == (0, True, True)
+    assert counters == {"weapon": 2, "knife": 1}
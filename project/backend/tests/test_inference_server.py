@@ -0,0 +1,122 @@
+import pytest
+import os
+import tempfile
+import threading
+import numpy as np
+from unittest.mock import MagicMock, patch
+from app.models.model import Detections
+from app.services.inference import InferenceClient, InferenceServer, InferenceServerError
+
+
+AUTHKEY = b'test'
+
+
+def fake_predict(frames, conf=0.25, **kwargs):
+    """Возвращает рамку на всю ширину кадра для каждого кадра."""
+    if conf > 1:
+        raise ValueError("bad conf")
+    detections = []
+    for frame in frames:
+        height, width = frame.shape[:2]
+        detections.append(Detections(
+            xyxy=np.array([[0, 0, width, height]], dtype=np.float32),
+            conf=np.array([conf], dtype=np.float32),
+            cls=np.array([1], dtype=np.int32),
+        ))
+    return detections
+
+
+@pytest.fixture
+def server_address():
+    """Запускает сервер инференса с тестовой функцией предсказания."""
+    address = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = InferenceServer(address, predict=fake_predict, class_names={0: 'weapon', 1: 'knife'}, authkey=AUTHKEY)
+    server.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield address
+
+    server.close()
+
+
+def test_client_receives_detections_in_frame_coordinates(server_address):
+    """Тестирует, что рамки возвращаются в координатах исходных кадров после уменьшения при передаче."""
+    client = InferenceClient(server_address, AUTHKEY, transfer_size=320)
+    frames = [np.zeros((720, 1280, 3), dtype=np.uint8) for _ in range(3)]
+
+    detections = client.predict_batch(frames, conf=0.4)
+
+    assert len(detections) == 3
+    np.testing.assert_allclose(detections[0].xyxy, [[0, 0, 1280, 720]], atol=1)
+    assert detections[0].cls.tolist() == [1]
+    assert detections[0].conf.tolist() == pytest.approx([0.4])
+
+
+def test_client_gets_class_names(server_address):
+    """Тестирует получение имен классов модели сервера."""
+    client = InferenceClient(server_address, AUTHKEY)
+
+    assert client.get_class_names() == {0: 'weapon', 1: 'knife'}
+    assert client.ping() == 'pong'
+
+
+def test_client_raises_server_errors(server_address):
+    """Тестирует проброс ошибки инференса на стороне сервера."""
+    client = InferenceClient(server_address, AUTHKEY)
+
+    with pytest.raises(InferenceServerError):
+        client.predict_batch([np.zeros((10, 10, 3), dtype=np.uint8)], conf=2)
+
+    # Соединение остается рабочим после ошибки
+    assert client.ping() == 'pong'
+
+
+def test_client_reports_unavailable_server():
+    """Тестирует ошибку при недоступном сервере."""
+    client = InferenceClient(os.path.join(tempfile.mkdtemp(), 'missing.sock'), AUTHKEY)
+
+    with pytest.raises(InferenceServerError):
+        client.ping()
+
+
+def test_server_and_client_require_authkey():
+    """Тестирует отказ запускать сервер и подключаться к нему без ключа аутентификации."""
+    address = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = InferenceServer(address, predict=fake_predict, class_names={}, authkey=b'')
+
+    with pytest.raises(RuntimeError):
+        server.start()
+    assert not os.path.exists(address)
+
+    with pytest.raises(InferenceServerError):
+        InferenceClient(address, b'')
+
+
+def test_client_does_not_resend_request_after_disconnect():
+    """Тестирует, что отправленный запрос не повторяется при обрыве соединения."""
+    client = InferenceClient('/run/inference/inference.sock', AUTHKEY)
+    conn = MagicMock()
+    conn.recv.side_effect = EOFError()
+
+    with patch('app.services.inference.client.Client', return_value=conn) as connect:
+        with pytest.raises(InferenceServerError):
+            client.ping()
+        assert conn.send.call_count == 1
+
+        # Следующий запрос идет через новое соединение
+        conn.recv.side_effect = None
+        conn.recv.return_value = ('ok', 'pong')
+        assert client.ping() == 'pong'
+        assert connect.call_count == 2
+
+
+def test_client_retries_failed_connect():
+    """Тестирует повторное подключение, если первая попытка не удалась."""
+    client = InferenceClient('/run/inference/inference.sock', AUTHKEY)
+    conn = MagicMock()
+    conn.recv.return_value = ('ok', 'pong')
+
+    with patch('app.services.inference.client.Client', side_effect=[ConnectionRefusedError(), conn]):
+        assert client.ping() == 'pong'
+    conn.send.assert_called_once()
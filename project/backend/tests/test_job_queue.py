@@ -0,0 +1,114 @@
+import pytest
+import threading
+import time
+from unittest.mock import MagicMock
+from app.services.jobs import JobQueue, QueueFullError, recovery
+
+
+def wait_for_status(job_queue, job_id, statuses, timeout=5):
+    """Ожидает, пока задача перейдет в один из указанных статусов."""
+    for _ in range(int(timeout / 0.01)):
+        job = job_queue.get_job(job_id)
+        if job and job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Задача {job_id} не перешла в статус {statuses}")
+
+
+def test_submit_runs_handler():
+    """Тестирует выполнение задачи обработчиком и сохранение результата."""
+    def handler(job_id, payload, report_progress):
+        report_progress(0.5)
+        return {"value": payload["value"] * 2}
+
+    job_queue = JobQueue(handler, num_workers=1)
+    job_id = job_queue.submit({"value": 21}, owner="testuser")
+
+    job = wait_for_status(job_queue, job_id, ('completed', 'failed'))
+
+    assert job['status'] == 'completed'
+    assert job['progress'] == 1.0
+    assert job['owner'] == "testuser"
+    assert job['result'] == {"value": 42}
+
+
+def test_failed_job_records_error():
+    """Тестирует перевод задачи в статус failed при исключении в обработчике."""
+    def handler(job_id, payload, report_progress):
+        raise ValueError("broken video")
+
+    job_queue = JobQueue(handler, num_workers=1)
+    job_id = job_queue.submit({}, job_id="job-1")
+
+    job = wait_for_status(job_queue, job_id, ('completed', 'failed'))
+
+    assert job_id == "job-1"
+    assert job['status'] == 'failed'
+    assert "broken video" in job['error']
+
+
+def test_submit_rejects_when_queue_is_full():
+    """Тестирует отказ в постановке задачи при переполненной очереди."""
+    release = threading.Event()
+
+    def handler(job_id, payload, report_progress):
+        release.wait(5)
+
+    job_queue = JobQueue(handler, num_workers=1, max_size=1)
+    first_id = job_queue.submit({})
+    wait_for_status(job_queue, first_id, ('processing',))
+    job_queue.submit({})
+
+    with pytest.raises(QueueFullError):
+        job_queue.submit({})
+
+    release.set()
+
+
+def test_get_unknown_job():
+    """Тестирует получение несуществующей задачи."""
+    job_queue = JobQueue(lambda job_id, payload, report_progress: None)
+
+    assert job_queue.get_job("missing") is None
+
+
+def test_active_jobs_lists_unfinished_jobs():
+    """Тестирует список задач, ожидающих или выполняемых процессом."""
+    release = threading.Event()
+    job_queue = JobQueue(lambda job_id, payload, report_progress: release.wait(5), num_workers=1)
+    running = job_queue.submit({})
+    waiting = job_queue.submit({})
+    wait_for_status(job_queue, running, ('processing',))
+
+    assert job_queue.active_jobs() == [running, waiting]
+
+    release.set()
+    wait_for_status(job_queue, waiting, ('completed',))
+    assert job_queue.active_jobs() == []
+
+
+def test_recovery_marks_own_jobs_and_fails_lost_ones():
+    """Тестирует отметку задач воркера и перевод видео потерянных задач в статус failed."""
+    job_queue = MagicMock()
+    job_queue.active_jobs.return_value = ['video-1']
+    db = MagicMock()
+    db.touch_videos.return_value = (True, None)
+    db.fail_stale_videos.return_value = (['video-2', 'video-3'], None)
+
+    assert recovery.check(job_queue, db) == 2
+
+    db.touch_videos.assert_called_once_with(['video-1'])
+    db.fail_stale_videos.assert_called_once_with(recovery.JOB_STALE_AFTER)
+    assert recovery.JOB_STALE_AFTER >= 3 * recovery.JOB_HEARTBEAT_INTERVAL
+
+
+def test_recovery_reports_database_errors():
+    """Тестирует ошибку проверки, если БД недоступна (задача запуска повторяется)."""
+    job_queue = MagicMock()
+    job_queue.active_jobs.return_value = []
+    db = MagicMock()
+    db.fail_stale_videos.return_value = ([], "db error")
+
+    with pytest.raises(RuntimeError):
+        recovery.check(job_queue, db)
+    db.touch_videos.assert_not_called()
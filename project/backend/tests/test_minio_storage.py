@@ -6,6 +6,8 @@ from unittest.mock import patch, MagicMock
 from app.services.minio.minio_storage import MinioStorage
 from datetime import timedelta
 from minio.commonconfig import CopySource
+import inspect
+from minio import Minio
 @pytest.fixture
 def mock_minio_client():
     """Фикстура для мокирования клиента MinIO"""
@@ -30,6 +32,16 @@ def test_init_storage(storage, mock_minio_client):
         region=os.environ.get('MINIO_REGION', None)
     )
 
+def test_lazy_storage_connects_on_first_operation(mock_minio_client):
+    """Тестирует отложенное подключение к MinIO и общий экземпляр хранилища."""
+    storage = MinioStorage(lazy=True)
+    mock_minio_client.assert_not_called()
+
+    storage.object_exists('videos', 'test.mp4')
+
+    mock_minio_client.assert_called_once()
+    assert MinioStorage.shared() is MinioStorage.shared()
+
 def test_save_video(storage):
     """Тестирует сохранение видео в MinIO."""
     with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
@@ -140,6 +152,21 @@ def test_delete_objects(storage):
     assert log_call[1]['bucket_name'] == storage.log_bucket
     assert log_call[1]['object_name'] == 'test_log.json'
 
+def test_get_object_range(storage):
+    """Тестирует чтение диапазона байт объекта."""
+    storage.client.get_object.return_value.read.return_value = b'chunk'
+
+    result = storage.get_object_range(storage.log_bucket, 'video.mp4.detections', 100, 5)
+
+    assert result == b'chunk'
+    storage.client.get_object.assert_called_once_with(
+        bucket_name=storage.log_bucket,
+        object_name='video.mp4.detections',
+        offset=100,
+        length=5
+    )
+    storage.client.get_object.return_value.release_conn.assert_called_once()
+
 def test_rename_object(storage):
     """Тестирует переименование объекта."""
     result = storage.rename_object(storage.video_bucket, 'old_name.mp4', 'new_name.mp4')
@@ -180,4 +207,62 @@ def test_error_handling_get_log(storage):
     storage.client.get_object.side_effect = Exception("Minio error")
 
     result = storage.get_log("test_log.json")
-    assert result is None 
\ No newline at end of file
+    assert result is None 
+def test_multipart_upload(storage):
+    """Тестирует составную загрузку в бакет загрузок: начало, части и сборку в порядке номеров."""
+    storage.client._create_multipart_upload.return_value = 'upload-1'
+    storage.client._upload_part.return_value = 'etag-2'
+
+    assert storage.create_multipart_upload('video.mp4') == 'upload-1'
+    assert storage.upload_part('video.mp4', 'upload-1', 2, b'data') == 'etag-2'
+    assert storage.complete_multipart_upload('video.mp4', 'upload-1', {2: 'etag-2', 1: 'etag-1'}) is True
+
+    storage.client._upload_part.assert_called_once_with(storage.upload_bucket, 'video.mp4', b'data', None, 'upload-1', 2)
+    bucket, object_name, upload_id, parts = storage.client._complete_multipart_upload.call_args[0]
+    assert (bucket, object_name, upload_id) == (storage.upload_bucket, 'video.mp4', 'upload-1')
+    assert [(part.part_number, part.etag) for part in parts] == [(1, 'etag-1'), (2, 'etag-2')]
+
+def test_get_presigned_upload_url(storage):
+    """Тестирует создание ссылки для загрузки в бакет загрузок."""
+    storage.client.presigned_put_object.return_value = 'http://minio/uploads/video.mp4?X-Amz-Signature=abc'
+
+    url = storage.get_presigned_upload_url('video.mp4', timedelta(minutes=30))
+
+    assert url == 'http://minio/uploads/video.mp4?X-Amz-Signature=abc'
+    storage.client.presigned_put_object.assert_called_once_with(
+        bucket_name=storage.upload_bucket,
+        object_name='video.mp4',
+        expires=timedelta(minutes=30)
+    )
+
+def test_copy_upload_within_upload_bucket(storage):
+    """Тестирует копирование загруженного объекта под новое имя на стороне MinIO."""
+    assert storage.copy_upload('staging/video.mp4', 'video.mp4') is True
+
+    bucket, object_name, sources = storage.client.compose_object.call_args[0]
+    assert (bucket, object_name) == (storage.upload_bucket, 'video.mp4')
+    assert [(source.bucket_name, source.object_name) for source in sources] == [(storage.upload_bucket, 'staging/video.mp4')]
+
+def test_staging_uploads_expire_by_lifecycle_rule(storage):
+    """Тестирует правило жизненного цикла для промежуточных объектов загрузок по ссылке."""
+    storage._ensure_staging_expiry()
+
+    bucket, config = storage.client.set_bucket_lifecycle.call_args[0]
+    assert bucket == storage.upload_bucket
+    rule = config.rules[0]
+    assert rule.rule_filter.prefix == 'staging/'
+    assert rule.expiration.days >= 1
+
+@pytest.mark.parametrize('method, params', [
+    ('_create_multipart_upload', ['bucket_name', 'object_name', 'headers']),
+    ('_upload_part', ['bucket_name', 'object_name', 'data', 'headers', 'upload_id', 'part_number']),
+    ('_complete_multipart_upload', ['bucket_name', 'object_name', 'upload_id', 'parts']),
+    ('_abort_multipart_upload', ['bucket_name', 'object_name', 'upload_id']),
+])
+def test_minio_private_multipart_api_matches_calls(method, params):
+    """Тестирует, что внутренние методы клиента minio принимают аргументы в порядке, в котором их передает хранилище."""
+    parameters = list(inspect.signature(getattr(Minio, method)).parameters.values())[1:]
+
+    assert [parameter.name for parameter in parameters[:len(params)]] == params
+    # Новые параметры допустимы, только если у них есть значения по умолчанию
+    assert all(parameter.default is not inspect.Parameter.empty for parameter in parameters[len(params):])
@@ -0,0 +1,108 @@
+import pytest
+import os
+import tempfile
+import numpy as np
+from app.models.model import Detections
+from app.models.backends import (
+    artifact_path,
+    detect_backend,
+    detect_precision,
+    parse_variant,
+    resolve_model,
+    resolve_variant,
+    variant_name
+)
+from app.models.benchmark import compare_detections
+from app.models.quantization import preprocess, quantized_path
+
+
+def make_detections(boxes, classes):
+    return Detections(
+        xyxy=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        conf=np.full(len(classes), 0.9, dtype=np.float32),
+        cls=np.array(classes, dtype=np.int32),
+    )
+
+
+def test_detect_backend_by_model_path():
+    """Тестирует выбор бэкенда по расширению модели."""
+    assert detect_backend('weights/model.pt') == 'torch'
+    assert detect_backend('weights/model.onnx') == 'onnx'
+    assert detect_backend('weights/model_openvino_model/') == 'openvino'
+
+
+def test_resolve_model_uses_exported_artifact():
+    """Тестирует использование уже экспортированной рядом с весами модели."""
+    directory = tempfile.mkdtemp()
+    weights = os.path.join(directory, 'model.pt')
+    exported = artifact_path(weights, 'onnx')
+    open(exported, 'w').close()
+
+    assert resolve_model(weights, 'auto') == ('torch', weights)
+    assert resolve_model(weights, 'onnx') == ('onnx', exported)
+
+
+def test_resolve_model_rejects_unknown_backend():
+    """Тестирует ошибку при неизвестном бэкенде и при экспорте не из .pt."""
+    with pytest.raises(ValueError):
+        resolve_model('model.pt', 'tensorrt')
+    with pytest.raises(ValueError):
+        resolve_model('model.onnx', 'openvino')
+
+
+def test_compare_detections():
+    """Тестирует сравнение обнаружений кандидата с эталоном."""
+    class_names = {0: 'weapon', 1: 'knife'}
+    reference = [
+        make_detections([[0, 0, 10, 10], [20, 20, 30, 30]], [0, 1]),
+        make_detections([[0, 0, 10, 10]], [0]),
+    ]
+    candidate = [
+        make_detections([[0, 0, 10, 11]], [0]),
+        make_detections([[0, 0, 10, 10]], [0]),
+    ]
+
+    report = compare_detections(reference, candidate, class_names)
+
+    assert report['classes']['weapon']['matched'] == 2
+    assert report['classes']['weapon']['frame_agreement'] == 1.0
+    assert report['classes']['knife']['recall'] == 0.0
+    assert report['classes']['knife']['frame_agreement'] == 0.5
+    assert report['mean_iou'] == pytest.approx((10 / 11 + 1) / 2, abs=1e-3)
+
+
+def test_model_variant_names():
+    """Тестирует имена вариантов модели и определение точности по имени файла."""
+    assert variant_name('onnx', 'int8-static') == 'onnx-int8-static'
+    assert variant_name('torch') == 'torch'
+    assert parse_variant('onnx-int8-dynamic') == ('onnx', 'int8-dynamic')
+    assert parse_variant('openvino') == ('openvino', 'fp32')
+    assert detect_precision('weights/model.int8-static.onnx') == 'int8-static'
+    assert detect_precision('weights/model.onnx') == 'fp32'
+
+
+def test_resolve_variant_uses_quantized_artifact():
+    """Тестирует выбор уже квантованной модели и отказ от INT8 вне ONNX Runtime."""
+    directory = tempfile.mkdtemp()
+    weights = os.path.join(directory, 'model.pt')
+    onnx_path = artifact_path(weights, 'onnx')
+    quantized = quantized_path(onnx_path, 'dynamic')
+    open(onnx_path, 'w').close()
+    open(quantized, 'w').close()
+
+    assert resolve_variant(weights, 'auto', 'int8-dynamic') == ('onnx-int8-dynamic', quantized)
+    assert resolve_variant(quantized, 'auto', 'fp32') == ('onnx-int8-dynamic', quantized)
+    with pytest.raises(ValueError):
+        resolve_variant(weights, 'openvino', 'int8-static')
+
+
+def test_quantization_preprocess_letterbox():
+    """Тестирует подготовку кадра для калибровки: letterbox до квадрата, NCHW, 0..1."""
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+
+    tensor = preprocess(frame, imgsz=320)
+
+    assert tensor.shape == (1, 3, 320, 320)
+    assert tensor.dtype == np.float32
+    assert tensor[0, 0, 0, 0] == pytest.approx(114 / 255)
+    assert tensor[0, 0, 160, 160] == 0
@@ -0,0 +1,250 @@
+import pytest
+import os
+import tempfile
+import cv2
+import numpy as np
+from app.models.model import Detections
+from app.services.video_processing.encoder import open_mp4_writer
+from app.services.video_processing.pipeline import VideoPipeline
+from app.services.video_processing.sampling import FixedStrideSampler
+
+
+@pytest.fixture
+def video_file():
+    """Создает временное видео из 20 кадров с движущимся прямоугольником."""
+    temp_file = tempfile.NamedTemporaryFile(suffix='.avi', delete=False)
+    temp_file.close()
+
+    writer = cv2.VideoWriter(temp_file.name, cv2.VideoWriter_fourcc(*'MJPG'), 10, (160, 120))
+    for i in range(20):
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (i * 5, 40), (i * 5 + 20, 60), (0, 255, 0), -1)
+        writer.write(frame)
+    writer.release()
+
+    yield temp_file.name
+
+    if os.path.exists(temp_file.name):
+        os.remove(temp_file.name)
+
+
+def fake_detector(frames):
+    """Возвращает одну рамку класса 0 на каждый кадр."""
+    return [
+        Detections(
+            xyxy=np.array([[10, 10, 50, 50]], dtype=np.float32),
+            conf=np.array([0.9], dtype=np.float32),
+            cls=np.array([0], dtype=np.int32),
+        )
+        for _ in frames
+    ]
+
+
+def test_pipeline_runs_detector_on_sampled_frames(video_file):
+    """Тестирует, что инференс выполняется только для выбранных кадров и в правильном порядке."""
+    seen = []
+    batch_sizes = []
+
+    def detector(frames):
+        batch_sizes.append(len(frames))
+        return fake_detector(frames)
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=detector,
+        sampler=FixedStrideSampler(4),
+        batch_size=2,
+        on_detections=lambda index, detections: seen.append(index),
+    )
+    stats = pipeline.run()
+
+    assert seen == [0, 4, 8, 12, 16]
+    assert max(batch_sizes) <= 2
+    assert stats['decode']['frames'] == 20
+    assert stats['infer']['frames'] == 5
+    assert stats['encode']['frames'] == 0
+
+
+def test_pipeline_writes_annotated_video(video_file):
+    """Тестирует формирование видео с разметкой из каждого render_stride-го кадра."""
+    output_path = os.path.join(tempfile.mkdtemp(), 'annotated.avi')
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=fake_detector,
+        sampler=FixedStrideSampler(2),
+        class_names={0: 'weapon'},
+        output_path=output_path,
+        render_stride=2,
+    )
+    stats = pipeline.run()
+
+    assert stats['encode']['frames'] == 10
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 10
+    cap.release()
+    os.remove(output_path)
+
+
+def test_pipeline_writes_mp4_in_single_pass(video_file):
+    """Тестирует кодирование результата сразу в MP4 без промежуточного AVI."""
+    output_path = os.path.join(tempfile.mkdtemp(), 'result.mp4')
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=fake_detector,
+        sampler=FixedStrideSampler(4),
+        class_names={0: 'knife'},
+        output_path=output_path,
+        render_stride=4,
+        writer_factory=open_mp4_writer,
+    )
+    pipeline.run()
+
+    cap = cv2.VideoCapture(output_path)
+    assert cap.isOpened()
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 5
+    cap.release()
+    os.remove(output_path)
+
+
+def test_pipeline_propagates_detector_errors(video_file):
+    """Тестирует, что ошибка инференса прерывает конвейер и пробрасывается наружу."""
+    def broken_detector(frames):
+        raise RuntimeError("inference failed")
+
+    pipeline = VideoPipeline(video_file, detector=broken_detector, sampler=FixedStrideSampler(1))
+
+    with pytest.raises(RuntimeError):
+        pipeline.run()
+
+
+def test_pipeline_rejects_unreadable_source():
+    """Тестирует ошибку при открытии несуществующего видео."""
+    with pytest.raises(ValueError):
+        VideoPipeline('/nonexistent/video.mp4', detector=fake_detector, sampler=FixedStrideSampler(1))
+
+
+def test_pipeline_processes_frame_range_with_global_indices(video_file):
+    """Тестирует обработку диапазона кадров: номера кадров остаются сквозными."""
+    seen = []
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=fake_detector,
+        sampler=FixedStrideSampler(4),
+        on_detections=lambda index, detections: seen.append(index),
+        start_frame=8,
+        end_frame=16,
+    )
+    stats = pipeline.run()
+
+    assert seen == [8, 12]
+    assert stats['decode']['frames'] == 8
+
+
+def test_pipeline_downscales_frames_for_inference(video_file):
+    """Тестирует уменьшение кадров перед инференсом и пересчет рамок в координаты исходного кадра."""
+    shapes = []
+    seen = []
+
+    def detector(frames):
+        shapes.extend(frame.shape[:2] for frame in frames)
+        return fake_detector(frames)
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=detector,
+        sampler=FixedStrideSampler(10),
+        infer_size=80,
+        on_detections=lambda index, detections: seen.append(detections.xyxy[0].tolist()),
+    )
+    pipeline.run()
+
+    assert shapes == [(60, 80), (60, 80)]
+    assert seen[0] == [20, 20, 100, 100]
+
+
+def test_pipeline_tracks_boxes_between_keyframes(video_file):
+    """Тестирует перенос рамок на промежуточные кадры и повторное обнаружение при потере."""
+    from app.services.video_processing.tracking import OpticalFlowTracker
+    seen = {}
+    calls = []
+
+    def detector(frames):
+        calls.append(len(frames))
+        return [
+            Detections(
+                xyxy=np.array([[0, 35, 60, 65]], dtype=np.float32),
+                conf=np.array([0.9], dtype=np.float32),
+                cls=np.array([0], dtype=np.int32),
+            )
+            for _ in frames
+        ]
+
+    pipeline = VideoPipeline(
+        video_file,
+        detector=detector,
+        sampler=FixedStrideSampler(10),
+        batch_size=2,
+        tracker=OpticalFlowTracker(),
+        on_detections=lambda index, detections: seen.setdefault(index, detections),
+    )
+    stats = pipeline.run()
+
+    assert sorted(seen) == list(range(20))
+    assert stats['track']['frames'] == 20
+    # Детектор вызывается на ключевых кадрах и на кадрах с потерянным сопровождением
+    assert sum(calls) == stats['infer']['frames'] < 20
+    assert all(len(seen[index].cls) == 1 for index in seen)
+
+
+def test_pipeline_reports_tracked_frames_separately(video_file):
+    """Тестирует передачу кадров с перенесенными рамками в on_tracked с уверенностью ключевого кадра."""
+    from app.services.video_processing.tracking import OpticalFlowTracker
+    detected, tracked = {}, {}
+
+    def detector(frames):
+        return [
+            Detections(
+                xyxy=np.array([[0, 35, 60, 65]], dtype=np.float32),
+                conf=np.array([0.7], dtype=np.float32),
+                cls=np.array([0], dtype=np.int32),
+            )
+            for _ in frames
+        ]
+
+    stats = VideoPipeline(
+        video_file,
+        detector=detector,
+        sampler=FixedStrideSampler(10),
+        batch_size=2,
+        tracker=OpticalFlowTracker(),
+        on_detections=lambda index, detections: detected.setdefault(index, detections),
+        on_tracked=lambda index, detections: tracked.setdefault(index, detections),
+    ).run()
+
+    assert sorted({**detected, **tracked}) == list(range(20))
+    assert not set(detected) & set(tracked)
+    assert len(detected) == stats['infer']['frames']
+    assert all(detections.conf.tolist() == pytest.approx([0.7]) for detections in tracked.values())
+
+
+def test_pipeline_observes_inference_spans_per_batch(video_file):
+    """Тестирует учет интервалов инференса по пакетам и обработки рамок."""
+    from unittest.mock import patch
+    from app.services.video_processing import pipeline as pipeline_module
+
+    with patch.object(pipeline_module.spans, 'observe') as mock_observe:
+        VideoPipeline(
+            video_file,
+            detector=fake_detector,
+            sampler=FixedStrideSampler(4),
+            batch_size=2,
+            on_detections=lambda index, detections: None,
+        ).run()
+
+    names = [call.args[0] for call in mock_observe.call_args_list]
+    assert names.count('infer_batch') == 3
+    assert names.count('postprocess') == 3
+    assert all(call.args[1] >= 0 for call in mock_observe.call_args_list)
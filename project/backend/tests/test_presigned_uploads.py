@@ -0,0 +1,125 @@
+import uuid
+import pytest
+from unittest.mock import MagicMock
+from app.services.uploads import UploadRejected, presigned
+
+
+MP4_HEAD = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isommp41'
+
+
+def _session(total_size=1000, status='active'):
+    upload_id = uuid.uuid4()
+    return {
+        'upload_id': upload_id,
+        'filename': 'clip.mp4',
+        'bucket_name': 'uploads',
+        's3_key': f'staging/{upload_id}.mp4',
+        'upload_type': 'presigned',
+        'total_size': total_size,
+        'status': status,
+    }
+
+
+@pytest.fixture
+def storage():
+    storage = MagicMock()
+    storage.upload_bucket = 'uploads'
+    storage.get_presigned_upload_url.return_value = 'http://minio/uploads/object.mp4?X-Amz-Signature=abc'
+    storage.get_object_size.return_value = 1000
+    storage.get_object_range.return_value = MP4_HEAD[:12]
+    return storage
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.create_upload_session.return_value = (True, None)
+    db.finish_upload_session.return_value = (True, None)
+    return db
+
+
+def test_start_upload_issues_put_url(storage, db):
+    """Тестирует выдачу ссылки на объект в бакете загрузок и регистрацию загрузки."""
+    session, url, expires_at = presigned.start_upload(storage, db, 'user', 'clip.mkv', 1000, {'imgsz': 640})
+
+    assert url == storage.get_presigned_upload_url.return_value
+    assert session['s3_key'] == f"staging/{session['upload_id']}.mkv"
+    assert storage.get_presigned_upload_url.call_args[0][0] == session['s3_key']
+    assert db.create_upload_session.call_args[1] == {'upload_type': 'presigned'}
+    assert expires_at is not None
+
+
+def test_complete_upload_checks_copy_of_stored_object(storage, db):
+    """Тестирует проверку копии объекта, которую клиент не может перезаписать по ссылке, и завершение загрузки."""
+    session = _session()
+    staged = session['s3_key']
+
+    presigned.complete_upload(storage, db, session)
+
+    object_name = storage.copy_upload.call_args[0][1]
+    storage.copy_upload.assert_called_once_with(staged, object_name)
+    assert not object_name.startswith('staging/')
+    assert session['status'] == 'completed'
+    assert session['s3_key'] == object_name
+    storage.get_object_range.assert_called_once_with('uploads', object_name, 0, 12)
+    db.finish_upload_session.assert_called_once_with(session['upload_id'], 'completed', s3_key=object_name)
+    storage.delete_upload.assert_called_once_with(staged)
+
+
+def test_complete_upload_before_object_is_uploaded(storage, db):
+    """Тестирует отказ, пока клиент не загрузил объект (загрузка остается активной)."""
+    storage.get_object_size.return_value = None
+    session = _session()
+
+    with pytest.raises(UploadRejected) as error:
+        presigned.complete_upload(storage, db, session)
+
+    assert error.value.status == 400
+    assert session['status'] == 'active'
+    storage.copy_upload.assert_not_called()
+    storage.delete_upload.assert_not_called()
+
+
+@pytest.mark.parametrize('size, head, status', [
+    (999, MP4_HEAD[:12], 400),
+    (1000, b'%PDF-1.7\n%\xe2\xe3', 415),
+])
+def test_complete_upload_rejects_invalid_object(storage, db, size, head, status):
+    """Тестирует удаление объекта и его копии, если размер не совпадает или это не видео."""
+    storage.get_object_size.side_effect = [1000, size]
+    storage.get_object_range.return_value = head
+    session = _session()
+    staged = session['s3_key']
+
+    with pytest.raises(UploadRejected) as error:
+        presigned.complete_upload(storage, db, session)
+
+    assert error.value.status == status
+    assert session['status'] == 'aborted'
+    object_name = storage.copy_upload.call_args[0][1]
+    assert {call[0][0] for call in storage.delete_upload.call_args_list} == {staged, object_name}
+    db.finish_upload_session.assert_called_once_with(session['upload_id'], 'aborted')
+
+
+def test_complete_upload_completed_concurrently_drops_copy(storage, db):
+    """Тестирует удаление копии, если загрузку завершил другой запрос."""
+    db.finish_upload_session.return_value = (False, None)
+    session = _session()
+
+    with pytest.raises(UploadRejected) as error:
+        presigned.complete_upload(storage, db, session)
+
+    assert error.value.status == 409
+    storage.delete_upload.assert_called_once_with(storage.copy_upload.call_args[0][1])
+
+
+def test_expire_uploads_removes_abandoned_objects(storage, db):
+    """Тестирует отмену загрузок по ссылке старше срока и удаление их объектов."""
+    session = _session()
+    db.get_expired_upload_sessions.return_value = ([session], None)
+
+    assert presigned.expire_uploads(storage, db, max_age_hours=6) == 1
+
+    db.get_expired_upload_sessions.assert_called_once_with('presigned', 6)
+    storage.delete_upload.assert_called_once_with(session['s3_key'])
+    assert session['status'] == 'aborted'
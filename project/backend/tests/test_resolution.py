@@ -0,0 +1,55 @@
+import pytest
+from app.services.video_processing.resolution import InferenceSizePolicy
+
+
+def test_low_resolution_video_is_not_upscaled():
+    """Тестирует, что размер входа не превышает длинную сторону кадра."""
+    policy = InferenceSizePolicy(max_size=640, min_size=320)
+
+    choice = policy.choose(480, 270)
+
+    assert choice['imgsz'] == 480
+    assert choice['scale'] == 1.0
+    assert choice['source'] == 'resolution'
+
+
+def test_high_resolution_video_is_downscaled_to_max_size():
+    """Тестирует выбор наибольшего размера для 4K видео и коэффициент уменьшения кадра."""
+    policy = InferenceSizePolicy(max_size=640, min_size=320)
+
+    choice = policy.choose(3840, 2160)
+
+    assert choice['imgsz'] == 640
+    assert choice['scale'] == pytest.approx(640 / 3840)
+
+
+def test_latency_budget_reduces_input_size():
+    """Тестирует уменьшение размера входа, пока оценка задержки не уложится в бюджет."""
+    policy = InferenceSizePolicy(max_size=640, min_size=320, budget_ms=30, frame_ms_640=60)
+
+    choice = policy.choose(1920, 1080)
+
+    assert choice['source'] == 'budget'
+    assert choice['estimated_ms'] <= 30
+    assert choice['imgsz'] % 32 == 0
+    assert choice['imgsz'] >= 320
+
+
+def test_observed_latency_updates_estimate():
+    """Тестирует уточнение оценки задержки по фактическим замерам."""
+    policy = InferenceSizePolicy(max_size=640, min_size=320, budget_ms=50)
+    assert policy.estimate_ms(640) is None
+
+    policy.observe(320, frames=10, seconds=0.25)
+
+    assert policy.estimate_ms(640) == pytest.approx(100)
+    assert policy.choose(1280, 720)['imgsz'] < 640
+
+
+def test_request_override_is_capped_by_resolution():
+    """Тестирует, что размер из запроса округляется до кратного 32 и не превышает кадр."""
+    policy = InferenceSizePolicy(max_size=640)
+
+    assert policy.choose(1920, 1080, override=1000)['imgsz'] == 992
+    assert policy.choose(640, 360, override=1000)['imgsz'] == 640
+    assert policy.choose(1920, 1080, override=1000)['source'] == 'request'
@@ -0,0 +1,208 @@
+import uuid
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.uploads import UploadRejected, resumable
+
+
+MP4_HEAD = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isommp41'
+MB = 1024 * 1024
+
+
+def _session(total_size=20 * MB, part_size=8 * MB, parts=None, status='active'):
+    return {
+        'upload_id': uuid.uuid4(),
+        'user_id': uuid.uuid4(),
+        'filename': 'clip.mp4',
+        'bucket_name': 'uploads',
+        's3_key': 'object.mp4',
+        's3_upload_id': 's3-upload',
+        'total_size': total_size,
+        'part_size': part_size,
+        'parts': parts or {},
+        'options': {},
+        'status': status,
+        'video_id': None,
+    }
+
+
+@pytest.fixture
+def storage():
+    storage = MagicMock()
+    storage.upload_bucket = 'uploads'
+    storage.create_multipart_upload.return_value = 's3-upload'
+    storage.upload_part.return_value = 'etag'
+    return storage
+
+
+@pytest.fixture
+def db():
+    db = MagicMock()
+    db.create_upload_session.return_value = (True, None)
+    db.save_upload_part.return_value = (True, None)
+    db.finish_upload_session.return_value = (True, None)
+    return db
+
+
+def test_part_layout():
+    """Тестирует разбиение на части: последняя часть короче, недостающие части по номерам."""
+    session = _session(parts={'2': 'etag-2'})
+
+    assert resumable.part_count(20 * MB, 8 * MB) == 3
+    assert resumable.expected_part_size(session, 1) == 8 * MB
+    assert resumable.expected_part_size(session, 3) == 4 * MB
+    assert resumable.missing_parts(session) == [1, 3]
+
+
+def test_start_upload_registers_session(storage, db):
+    """Тестирует начало загрузки и увеличение части для файлов больше 10000 частей."""
+    size = resumable.UPLOAD_PART_SIZE * resumable.MAX_UPLOAD_PARTS + 1
+    with patch.object(resumable, 'MAX_RESUMABLE_UPLOAD_SIZE', size):
+        session = resumable.start_upload(storage, db, 'user', 'Clip.MOV', size, {'render': False})
+
+    assert session['s3_key'] == f"{session['upload_id']}.mov"
+    assert session['part_size'] > resumable.UPLOAD_PART_SIZE
+    assert resumable.part_count(size, session['part_size']) <= resumable.MAX_UPLOAD_PARTS
+    storage.create_multipart_upload.assert_called_once_with(session['s3_key'])
+    assert db.create_upload_session.call_args[0][5:] == ('s3-upload', size, session['part_size'], {'render': False})
+
+
+@pytest.mark.parametrize('filename, size, status', [
+    ('notes.txt', 100, 400),
+    ('clip.mp4', 0, 400),
+    ('clip.mp4', '100', 400),
+    ('clip.mp4', resumable.MAX_RESUMABLE_UPLOAD_SIZE + 1, 413),
+])
+def test_start_upload_rejects_invalid_request(storage, db, filename, size, status):
+    """Тестирует отказ для недопустимого имени и размера файла до обращения к хранилищу."""
+    with pytest.raises(UploadRejected) as error:
+        resumable.start_upload(storage, db, 'user', filename, size)
+
+    assert error.value.status == status
+    storage.create_multipart_upload.assert_not_called()
+
+
+def test_start_upload_aborts_multipart_when_database_fails(storage, db):
+    """Тестирует отмену составной загрузки, если запись в БД не удалась."""
+    db.create_upload_session.return_value = (False, "db error")
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.start_upload(storage, db, 'user', 'clip.mp4', 100)
+
+    assert error.value.status == 503
+    storage.abort_multipart_upload.assert_called_once()
+
+
+def test_store_part_checks_size_and_records_etag(storage, db):
+    """Тестирует передачу части в хранилище и проверку ее размера."""
+    session = _session()
+
+    assert resumable.store_part(storage, db, session, 3, b'\x00' * (4 * MB)) == 'etag'
+    storage.upload_part.assert_called_once_with('object.mp4', 's3-upload', 3, b'\x00' * (4 * MB))
+    db.save_upload_part.assert_called_once_with(session['upload_id'], 3, 'etag')
+
+    for number, size in ((3, 4 * MB - 1), (4, 4 * MB)):
+        with pytest.raises(UploadRejected) as error:
+            resumable.store_part(storage, db, session, number, b'\x00' * size)
+        assert error.value.status == 400
+
+
+def test_store_first_part_rejects_non_video(storage, db):
+    """Тестирует отмену загрузки, если первая часть не является видео."""
+    session = _session(total_size=100)
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.store_part(storage, db, session, 1, b'%PDF' + b'\x00' * 96)
+
+    assert error.value.status == 415
+    storage.upload_part.assert_not_called()
+    storage.abort_multipart_upload.assert_called_once_with('object.mp4', 's3-upload')
+    db.finish_upload_session.assert_called_once_with(session['upload_id'], 'aborted')
+
+
+def test_store_part_after_completion_conflicts(storage, db):
+    """Тестирует отказ 409 для части, пришедшей после завершения загрузки."""
+    session = _session(total_size=100)
+    db.save_upload_part.return_value = (False, None)
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.store_part(storage, db, session, 1, MP4_HEAD + b'\x00' * (100 - len(MP4_HEAD)))
+
+    assert error.value.status == 409
+
+
+def test_complete_upload_requires_all_parts(storage, db):
+    """Тестирует отказ в сборке, пока загружены не все части."""
+    session = _session(parts={'1': 'etag-1', '3': 'etag-3'})
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.complete_upload(storage, db, session)
+
+    assert error.value.status == 400
+    assert '2' in str(error.value)
+    db.finish_upload_session.assert_not_called()
+
+
+def test_complete_upload_assembles_parts_once(storage, db):
+    """Тестирует сборку объекта и отказ, если загрузку уже завершил другой запрос."""
+    session = _session(parts={'1': 'etag-1', '2': 'etag-2', '3': 'etag-3'})
+
+    resumable.complete_upload(storage, db, session)
+
+    assert session['status'] == 'completed'
+    storage.complete_multipart_upload.assert_called_once_with(
+        'object.mp4', 's3-upload', {1: 'etag-1', 2: 'etag-2', 3: 'etag-3'}
+    )
+
+    db.finish_upload_session.return_value = (False, None)
+    with pytest.raises(UploadRejected) as error:
+        resumable.complete_upload(storage, db, _session(parts=session['parts']))
+    assert error.value.status == 409
+
+
+def test_complete_upload_reopens_session_when_assembly_fails(storage, db):
+    """Тестирует возврат загрузки в активное состояние при ошибке сборки."""
+    session = _session(total_size=100, parts={'1': 'etag-1'})
+    storage.complete_multipart_upload.side_effect = Exception("InvalidPart")
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.complete_upload(storage, db, session)
+
+    assert error.value.status == 503
+    assert session['status'] == 'active'
+    db.reopen_upload_session.assert_called_once_with(session['upload_id'])
+
+
+def test_abort_upload_skips_upload_completed_concurrently(storage, db):
+    """Тестирует, что части не удаляются, если загрузку успел завершить другой запрос."""
+    session = _session()
+    db.finish_upload_session.return_value = (False, None)
+
+    with pytest.raises(UploadRejected) as error:
+        resumable.abort_upload(storage, db, session)
+
+    assert error.value.status == 409
+    storage.abort_multipart_upload.assert_not_called()
+
+
+def test_expire_uploads_aborts_abandoned_sessions(storage, db):
+    """Тестирует отмену загрузок старше срока и пропуск загрузок, завершенных параллельно."""
+    abandoned, completed = _session(), _session()
+    db.get_expired_upload_sessions.return_value = ([abandoned, completed], None)
+    db.finish_upload_session.side_effect = [(True, None), (False, None)]
+
+    assert resumable.expire_uploads(storage, db, max_age_hours=12) == 1
+
+    db.get_expired_upload_sessions.assert_called_once_with('multipart', 12)
+    storage.abort_multipart_upload.assert_called_once_with('object.mp4', 's3-upload')
+    assert abandoned['status'] == 'aborted'
+
+
+def test_sweeper_reports_expired_uploads(storage, db):
+    """Тестирует проверку брошенных загрузок и ошибку, если БД недоступна."""
+    from app.services.uploads import sweeper
+    db.get_expired_upload_sessions.return_value = ([_session()], None)
+    assert sweeper.sweep(storage, db) == 1
+
+    db.get_expired_upload_sessions.return_value = ([], "db error")
+    with pytest.raises(RuntimeError):
+        sweeper.sweep(storage, db)
@@ -1,6 +1,7 @@
 import pytest
 import json
 import os
+import shutil
 import jwt
 import uuid
 from datetime import datetime
@@ -10,6 +11,9 @@ from app import create_app
 # Чтение секретного ключа из тестового окружения
 TEST_SECRET_KEY = "test_secret_key"
 
+# Начало файла MP4 (атом ftyp): загрузка проходит проверку формата контейнера
+MP4_CONTENT = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isommp41video-content'
+
 @pytest.fixture
 def app():
     """Создает и настраивает экземпляр Flask для тестирования."""
@@ -325,4 +329,637 @@ def test_update_video_success(client, app, auth_headers, test_username, test_use
         assert response.status_code == 200
         data = json.loads(response.data)
         assert 'message' in data
-        assert 'renamed successfully' in data['message'] 
\ No newline at end of file
+        assert 'renamed successfully' in data['message'] 
+def test_get_job_status_from_database(client, app, auth_headers, test_username, test_user_id, test_video_filename):
+    """Тестирует получение статуса задачи, обрабатываемой другим процессом."""
+    video_id = uuid.uuid4()
+
+    app.db_manager.get_video_by_id.return_value = {
+        "video_id": video_id,
+        "user_id": test_user_id,
+        "s3_key": test_video_filename,
+        "status": "processing",
+        "metadata": {"progress": 0.35}
+    }
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.get(f'/jobs/{video_id}', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'processing'
+        assert data['progress'] == 0.35
+        assert data['video_url'] == test_video_filename
+
+
+def test_predict_returns_cached_result(client, app, auth_headers, test_username, test_user_id, test_video_filename, test_log_filename):
+    """Тестирует возврат результата из кэша при повторной загрузке того же видео."""
+    import hashlib
+    import io
+    video_id = uuid.uuid4()
+    frame_objects = [[0, False, False], [8, False, True]]
+
+    app.db_manager.get_cached_result.return_value = {
+        "video_id": video_id,
+        "s3_key": test_video_filename,
+        "bucket_name": "videos",
+        "metadata": {"fps": "25.0"},
+        "log_s3_key": test_log_filename,
+        "log_bucket_name": "logs"
+    }
+    app.storage.object_exists.return_value = True
+    app.storage.get_log_from_bucket.return_value = frame_objects
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.build_cache_key', return_value='a' * 64) as mock_key, \
+         patch('app.api.routes.video_processing.select_inference_size', return_value={'imgsz': 640, 'source': 'resolution'}), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4')},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['cached'] is True
+        assert data['job_id'] == str(video_id)
+        assert data['detections']['summary']['weapon_frames'] == 0
+        assert data['detections']['summary']['knife_frames'] == 1
+        assert data['fps'] == 25.0
+        # В ключ кэша попадает размер входа, выбранный политикой, а не запрошенный (None)
+        mock_key.assert_called_once_with(hashlib.sha256(MP4_CONTENT).hexdigest(), 0.6, imgsz=640, render=True)
+        mock_queue.submit.assert_not_called()
+        app.db_manager.save_video_metadata.assert_not_called()
+
+
+def test_predict_stale_cache_entry_is_processed(client, app, auth_headers, test_username, test_user_id, test_video_filename):
+    """Тестирует обработку видео, если объекты из кэша удалены из хранилища."""
+    import hashlib
+    import io
+    video_id = uuid.uuid4()
+
+    app.db_manager.get_cached_result.return_value = {
+        "video_id": uuid.uuid4(),
+        "s3_key": test_video_filename,
+        "bucket_name": "videos",
+        "metadata": {},
+        "log_s3_key": "missing.json",
+        "log_bucket_name": "logs"
+    }
+    app.storage.object_exists.return_value = False
+    app.db_manager.save_video_metadata.return_value = (video_id, None)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.build_cache_key', return_value='b' * 64), \
+         patch('app.api.routes.video_processing.select_inference_size', return_value={'imgsz': 640, 'source': 'resolution'}), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.return_value = str(video_id)
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4')},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 202
+        app.db_manager.delete_cached_result.assert_called_once_with('b' * 64, str(test_user_id))
+        payload = mock_queue.submit.call_args[0][0]
+        assert payload['cache_key'] == 'b' * 64
+        assert payload['content_sha256'] == hashlib.sha256(MP4_CONTENT).hexdigest()
+        shutil.rmtree(payload['workspace'])
+
+
+def test_predict_alert_mode_responds_immediately(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует режим тревоги: ответ с моментом обнаружения без постановки видео в очередь."""
+    import io
+    alert = {
+        "alert": True, "complete": True, "frame": 48, "confirmed_frame": 56,
+        "timestamp_seconds": 1.92, "objects": ["weapon"], "frames_scanned": 8, "time_to_alert_seconds": 0.4
+    }
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.detect_alert', return_value=alert) as mock_detect, \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'mode': 'alert'},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['mode'] == 'alert'
+        assert data['timestamp_seconds'] == 1.92
+        mock_detect.assert_called_once()
+        assert not os.path.exists(mock_detect.call_args[0][0])
+        mock_queue.submit.assert_not_called()
+
+
+def test_predict_alert_mode_rejects_unreadable_video(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует ответ 400 в режиме тревоги, если видео с распознанным контейнером не открывается."""
+    import io
+    from app.api import routes
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes._discard_upload', wraps=routes._discard_upload) as mock_discard, \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'mode': 'alert'},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 400
+        assert 'error' in json.loads(response.data)
+        mock_discard.assert_called_once()
+        mock_queue.submit.assert_not_called()
+
+
+def test_predict_rejects_unknown_mode(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует ошибку при неизвестном режиме обработки."""
+    import io
+    response = client.post(
+        '/predict',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'mode': 'fast'},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 400
+
+
+def test_predict_passes_requested_imgsz_to_job(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует передачу размера входа модели из запроса в задачу и проверку значения."""
+    import io
+    app.db_manager.get_cached_result.return_value = None
+    app.db_manager.save_video_metadata.return_value = (uuid.uuid4(), None)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.build_cache_key', return_value='c' * 64) as mock_key, \
+         patch('app.api.routes.video_processing.select_inference_size',
+               side_effect=lambda path, override: {'imgsz': override, 'source': 'request'}), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.return_value = 'job'
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'imgsz': '480'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 202
+        payload = mock_queue.submit.call_args[0][0]
+        assert payload['imgsz'] == 480
+        assert payload['inference_size']['imgsz'] == 480
+        assert mock_key.call_args[1]['imgsz'] == 480
+        shutil.rmtree(payload['workspace'])
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'imgsz': 'large'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+
+
+def test_get_video_logs_expands_compact_log(client, app, auth_headers, test_username, test_user_id, test_video_filename, test_log_filename):
+    """Тестирует развертывание компактного лога на сервере по параметру expand."""
+    from app.services.video_processing import detection_log
+    frame_objects = [[0, False, False], [8, True, False], [16, True, True]]
+
+    app.db_manager.get_video_by_s3_key.return_value = None
+    app.storage.get_log.return_value = detection_log.encode(frame_objects, fps=25)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.get(f'/videos/{test_video_filename}/logs', headers=auth_headers)
+        assert json.loads(response.data)['version'] == 2
+
+        response = client.get(f'/videos/{test_video_filename}/logs?expand=true', headers=auth_headers)
+        assert json.loads(response.data) == frame_objects
+
+
+def test_get_video_detections_window(client, app, auth_headers, test_username, test_user_id, test_video_filename, tmp_path):
+    """Тестирует выборку обнаружений по интервалу времени и классу."""
+    import numpy as np
+    from app.models.model import Detections
+    from app.services.video_processing.detection_store import DetectionWriter
+
+    path = tmp_path / "video.detections"
+    writer = DetectionWriter(str(path), fps=10, class_names={0: "weapon", 1: "knife"})
+    for frame_index in range(100):
+        writer.add(frame_index, Detections(
+            xyxy=np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.float32),
+            conf=np.array([0.9, 0.4], dtype=np.float32),
+            cls=np.array([0, 1]),
+        ))
+    writer.close()
+    data = path.read_bytes()
+
+    app.db_manager.get_video_by_s3_key.return_value = None
+    app.storage.log_bucket = 'logs'
+    app.storage.get_object_size.return_value = len(data)
+    app.storage.get_object_range.side_effect = lambda bucket, name, offset, length: data[offset:offset + length]
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.get(f'/videos/{test_video_filename}/detections?start=2&end=2.5&class=knife', headers=auth_headers)
+
+    assert response.status_code == 200
+    result = json.loads(response.data)
+    assert result['frame'] == [20, 21, 22, 23, 24]
+    assert result['time'][0] == 2.0
+    assert set(result['class']) == {'knife'}
+    assert result['xyxy'][0] == [5.0, 6.0, 7.0, 8.0]
+    app.storage.get_object_size.assert_called_with('logs', f"{test_video_filename}.detections")
+
+
+def test_get_video_detections_not_found(client, app, auth_headers, test_username, test_user_id, test_video_filename):
+    """Тестирует ответ 404 для видео без файла обнаружений."""
+    app.db_manager.get_video_by_s3_key.return_value = None
+    app.storage.get_object_size.return_value = None
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.get(f'/videos/{test_video_filename}/detections', headers=auth_headers)
+
+    assert response.status_code == 404
+
+
+def test_reevaluate_video_at_another_threshold(client, app, auth_headers, test_username, test_user_id, test_video_filename, tmp_path):
+    """Тестирует пересчет результата при другом пороге без повторного инференса."""
+    import numpy as np
+    from app.models.model import Detections
+    from app.services.video_processing import detection_log
+    from app.services.video_processing.detection_store import DetectionWriter
+
+    path = tmp_path / "video.detections"
+    writer = DetectionWriter(str(path), fps=10, class_names={0: "weapon", 1: "knife"}, min_score=0.1)
+    writer.add(0, Detections(xyxy=np.zeros((1, 4), dtype=np.float32), conf=np.array([0.45]), cls=np.array([0])))
+    writer.add(8, Detections(xyxy=np.zeros((1, 4), dtype=np.float32), conf=np.array([0.9]), cls=np.array([1])))
+    writer.close()
+    data = path.read_bytes()
+
+    app.db_manager.get_video_by_s3_key.return_value = None
+    app.storage.get_log.return_value = detection_log.encode([[0, False, False], [8, False, True], [16, False, False]], fps=10)
+    app.storage.get_object_size.return_value = len(data)
+    app.storage.get_object_range.side_effect = lambda bucket, name, offset, length: data[offset:offset + length]
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.get(f'/videos/{test_video_filename}/reevaluate?conf=0.4&expand=true', headers=auth_headers)
+        result = json.loads(response.data)
+        assert response.status_code == 200
+        assert result['weapon_detected'] is True
+        assert result['counters'] == {'weapon': 1, 'knife': 1}
+        assert result['frame_objects'] == [[0, True, False], [8, False, True], [16, False, False]]
+
+        response = client.get(f'/videos/{test_video_filename}/reevaluate?conf=0.95', headers=auth_headers)
+        result = json.loads(response.data)
+        assert result['weapon_detected'] is False
+        assert result['summary']['detection_frames'] == 0
+
+        response = client.get(f'/videos/{test_video_filename}/reevaluate?conf=0.05', headers=auth_headers)
+        assert response.status_code == 400
+
+
+def test_predict_without_rendering(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует режим без видео с разметкой: признак в задаче и ключе кэша, проверку значения."""
+    import io
+    app.db_manager.get_cached_result.return_value = None
+    app.db_manager.save_video_metadata.return_value = (uuid.uuid4(), None)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.build_cache_key', return_value='d' * 64) as mock_key, \
+         patch('app.api.routes.video_processing.select_inference_size', return_value={'imgsz': 640, 'source': 'resolution'}), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.return_value = 'job'
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'render': 'false'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 202
+        payload = mock_queue.submit.call_args[0][0]
+        assert payload['render'] is False
+        assert mock_key.call_args[1]['render'] is False
+        shutil.rmtree(payload['workspace'])
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4'), 'render': 'maybe'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+
+
+def test_predict_rejects_non_video_and_oversized_uploads(client, app, auth_headers, test_username, test_user_id, tmp_path):
+    """Тестирует отказ 415 для файла, не являющегося видео, и 413 для слишком большого файла."""
+    import io
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.video_processing.create_workspace', side_effect=lambda: str(tmp_path)), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.post(
+            '/predict',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(b'%PDF-1.7\n' + b'x' * 64), 'clip.mp4')},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 415
+        assert not tmp_path.exists()
+
+        tmp_path.mkdir()
+        with patch('app.services.uploads.streaming.MAX_UPLOAD_SIZE', 16):
+            response = client.post(
+                '/predict',
+                headers=auth_headers,
+                data={'file': (io.BytesIO(MP4_CONTENT), 'clip.mp4')},
+                content_type='multipart/form-data'
+            )
+        assert response.status_code == 413
+        assert not tmp_path.exists()
+        mock_queue.submit.assert_not_called()
+
+
+def test_resumable_upload_flow(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует загрузку частями: начало, часть, продолжение по недостающим частям и завершение с постановкой в очередь."""
+    sessions = {}
+
+    def create_session(upload_id, user_id, filename, bucket_name, s3_key, s3_upload_id, total_size, part_size, options):
+        sessions[str(upload_id)] = {
+            'upload_id': upload_id, 'user_id': user_id, 'filename': filename, 'bucket_name': bucket_name,
+            's3_key': s3_key, 's3_upload_id': s3_upload_id, 'total_size': total_size, 'part_size': part_size,
+            'parts': {}, 'options': options, 'status': 'active', 'video_id': None,
+        }
+        return True, None
+
+    def save_part(upload_id, part_number, etag):
+        sessions[str(upload_id)]['parts'][str(part_number)] = etag
+        return True, None
+
+    app.db_manager.create_upload_session.side_effect = create_session
+    app.db_manager.get_upload_session.side_effect = lambda upload_id, user_id: sessions.get(upload_id)
+    app.db_manager.save_upload_part.side_effect = save_part
+    app.db_manager.finish_upload_session.return_value = (True, None)
+    video_id = uuid.uuid4()
+    app.db_manager.save_video_metadata.return_value = (video_id, None)
+    app.db_manager.claim_upload_video.return_value = (True, None)
+    app.storage.upload_bucket = 'uploads'
+    app.storage.create_multipart_upload.return_value = 's3-upload'
+    app.storage.upload_part.side_effect = lambda object_name, upload_id, number, data: f"etag-{number}"
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.resumable.UPLOAD_PART_SIZE', 16), \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.return_value = str(video_id)
+
+        response = client.post('/uploads', headers=auth_headers, json={
+            'filename': 'clip.mp4', 'size': len(MP4_CONTENT), 'render': False
+        })
+        assert response.status_code == 201
+        upload = json.loads(response.data)
+        assert upload['part_count'] == 3
+        upload_id = upload['upload_id']
+
+        response = client.put(f'/uploads/{upload_id}/parts/1', headers=auth_headers, data=MP4_CONTENT[:16])
+        assert response.status_code == 200
+        response = client.put(f'/uploads/{upload_id}/parts/2', headers=auth_headers, data=b'x' * 17)
+        assert response.status_code == 413
+
+        response = client.post(f'/uploads/{upload_id}/complete', headers=auth_headers)
+        assert response.status_code == 400
+        response = client.get(f'/uploads/{upload_id}', headers=auth_headers)
+        assert json.loads(response.data)['missing_parts'] == [2, 3]
+
+        for number in (3, 2):
+            response = client.put(
+                f'/uploads/{upload_id}/parts/{number}', headers=auth_headers,
+                data=MP4_CONTENT[(number - 1) * 16:number * 16]
+            )
+            assert response.status_code == 200
+
+        response = client.post(f'/uploads/{upload_id}/complete', headers=auth_headers)
+        assert response.status_code == 202
+        assert json.loads(response.data)['job_id'] == str(video_id)
+
+    app.storage.complete_multipart_upload.assert_called_once_with(
+        sessions[upload_id]['s3_key'], 's3-upload', {1: 'etag-1', 2: 'etag-2', 3: 'etag-3'}
+    )
+    payload = mock_queue.submit.call_args[0][0]
+    assert payload['source_object'] == sessions[upload_id]['s3_key']
+    assert payload['render'] is False
+    assert 'temp_path' not in payload
+    app.db_manager.claim_upload_video.assert_called_once_with(sessions[upload_id]['upload_id'], video_id)
+
+
+def _completed_upload_session(test_user_id, video_id=None):
+    return {
+        'upload_id': uuid.uuid4(), 'user_id': test_user_id, 'filename': 'clip.mp4', 'bucket_name': 'uploads',
+        's3_key': 'object.mp4', 's3_upload_id': 's3-upload', 'upload_type': 'multipart', 'total_size': 37,
+        'part_size': 16, 'parts': {}, 'options': {}, 'status': 'completed', 'video_id': video_id,
+    }
+
+
+def test_concurrent_complete_submits_job_once(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует, что запрос, не привязавший видео к загрузке, не ставит задачу и возвращает задачу другого запроса."""
+    session = _completed_upload_session(test_user_id)
+    winner_id = uuid.uuid4()
+    video_id = uuid.uuid4()
+    app.db_manager.get_upload_session.side_effect = [session, dict(session, video_id=winner_id)]
+    app.db_manager.save_video_metadata.return_value = (video_id, None)
+    app.db_manager.claim_upload_video.return_value = (False, None)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+
+        response = client.post(f"/uploads/{session['upload_id']}/complete", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert json.loads(response.data)['job_id'] == str(winner_id)
+    mock_queue.submit.assert_not_called()
+    app.db_manager.discard_video.assert_called_once_with(video_id)
+
+
+def test_complete_upload_with_full_queue_discards_video(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует удаление записи видео, если очередь заполнена: повторное завершение не оставляет лишних записей."""
+    from app.services.jobs import QueueFullError
+    session = _completed_upload_session(test_user_id)
+    video_id = uuid.uuid4()
+    app.db_manager.get_upload_session.return_value = session
+    app.db_manager.save_video_metadata.return_value = (video_id, None)
+    app.db_manager.claim_upload_video.return_value = (True, None)
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.side_effect = QueueFullError("Очередь заполнена")
+
+        response = client.post(f"/uploads/{session['upload_id']}/complete", headers=auth_headers)
+
+    assert response.status_code == 503
+    app.db_manager.discard_video.assert_called_once_with(video_id)
+    app.db_manager.update_video_status.assert_not_called()
+
+
+def test_prediction_job_fetches_stored_upload(app, tmp_path):
+    """Тестирует обработку видео из бакета загрузок: скачивание в рабочий каталог, ключ кэша и удаление объекта."""
+    import hashlib
+    from app.api import routes
+
+    def fetch(object_name, file_path):
+        with open(file_path, 'wb') as f:
+            f.write(MP4_CONTENT)
+        return True
+
+    app.storage.get_upload.side_effect = fetch
+    workspace = tmp_path / 'job'
+    workspace.mkdir()
+    payload = {
+        'source_object': 'object.mp4', 'username': 'testuser', 'user_id': None, 'video_id': None,
+        'video_filename': 'out.mp4', 'original_filename': 'clip.mp4', 'confidence_threshold': 0.6,
+        'imgsz': None, 'render': True,
+    }
+
+    with patch('app.api.routes.video_processing.create_workspace', return_value=str(workspace)), \
+         patch('app.services.video_processing.video_processing.model.get_model_version', return_value='torch-fp32:1'), \
+         patch('app.api.routes.video_processing.select_inference_size', return_value={'imgsz': 640, 'source': 'auto'}) as mock_size, \
+         patch('app.api.routes.video_processing.process_video', return_value=('out.mp4', [[0, False, False]], 25.0, False, 'out.json')) as mock_process:
+        result = routes._run_prediction_job('job', payload, lambda progress: None)
+
+    # Размер входа выбирается один раз - до ключа кэша - и передается обработке
+    mock_size.assert_called_once()
+    assert mock_process.call_args[1]['imgsz'] == 640
+
+    assert result['video_url'] == 'out.mp4'
+    assert mock_process.call_args[0][0] == str(workspace / 'upload.mp4')
+    assert payload['content_sha256'] == hashlib.sha256(MP4_CONTENT).hexdigest()
+    assert payload['cache_key']
+    assert not workspace.exists()
+    app.storage.delete_upload.assert_called_once_with('object.mp4')
+
+
+def test_prediction_job_keeps_upload_it_could_not_fetch(app, tmp_path):
+    """Тестирует, что объект, который не удалось скачать, остается в бакете, а завершение загрузки можно повторить."""
+    from app.api import routes
+    video_id = uuid.uuid4()
+    app.storage.get_upload.return_value = False
+    payload = {
+        'source_object': 'object.mp4', 'username': 'testuser', 'user_id': 'user', 'video_id': video_id,
+        'video_filename': 'out.mp4', 'original_filename': 'clip.mp4', 'confidence_threshold': 0.6,
+        'imgsz': None, 'render': True,
+    }
+
+    with patch('app.api.routes.video_processing.create_workspace', return_value=str(tmp_path / 'job')), \
+         patch('app.api.routes.video_processing.process_video') as mock_process:
+        with pytest.raises(RuntimeError):
+            routes._run_prediction_job('job', payload, lambda progress: None)
+
+    mock_process.assert_not_called()
+    app.storage.delete_upload.assert_not_called()
+    app.db_manager.discard_video.assert_called_once_with(video_id)
+
+
+def test_prediction_job_removes_upload_after_processing_failure(app, tmp_path):
+    """Тестирует удаление скачанного объекта, если видео не удалось обработать."""
+    from app.api import routes
+    video_id = uuid.uuid4()
+
+    def fetch(object_name, file_path):
+        with open(file_path, 'wb') as f:
+            f.write(MP4_CONTENT)
+        return True
+
+    app.storage.get_upload.side_effect = fetch
+    workspace = tmp_path / 'job'
+    workspace.mkdir()
+    payload = {
+        'source_object': 'object.mp4', 'username': 'testuser', 'user_id': 'user', 'video_id': video_id,
+        'video_filename': 'out.mp4', 'original_filename': 'clip.mp4', 'confidence_threshold': 0.6,
+        'imgsz': None, 'render': True,
+    }
+
+    with patch('app.api.routes.video_processing.create_workspace', return_value=str(workspace)), \
+         patch('app.api.routes.video_processing.select_inference_size', side_effect=ValueError("Не удалось открыть видеофайл")):
+        with pytest.raises(ValueError):
+            routes._run_prediction_job('job', payload, lambda progress: None)
+
+    app.storage.delete_upload.assert_called_once_with('object.mp4')
+    app.db_manager.update_video_status.assert_called_with(video_id, 'failed')
+    app.db_manager.discard_video.assert_not_called()
+
+
+def test_presigned_upload_flow(client, app, auth_headers, test_username, test_user_id):
+    """Тестирует загрузку по временной ссылке: выдачу ссылки и завершение с постановкой в очередь."""
+    sessions = {}
+
+    def create_session(upload_id, user_id, filename, bucket_name, s3_key, s3_upload_id, total_size, part_size, options, upload_type):
+        sessions[str(upload_id)] = {
+            'upload_id': upload_id, 'user_id': user_id, 'filename': filename, 'bucket_name': bucket_name,
+            's3_key': s3_key, 's3_upload_id': s3_upload_id, 'upload_type': upload_type, 'total_size': total_size,
+            'part_size': part_size, 'parts': {}, 'options': options, 'status': 'active', 'video_id': None,
+        }
+        return True, None
+
+    app.db_manager.create_upload_session.side_effect = create_session
+    app.db_manager.get_upload_session.side_effect = lambda upload_id, user_id: sessions.get(upload_id)
+    app.db_manager.finish_upload_session.return_value = (True, None)
+    video_id = uuid.uuid4()
+    app.db_manager.save_video_metadata.return_value = (video_id, None)
+    app.db_manager.claim_upload_video.return_value = (True, None)
+    app.storage.upload_bucket = 'uploads'
+    app.storage.get_presigned_upload_url.return_value = 'http://minio:9000/uploads/object.mp4?X-Amz-Signature=abc'
+    app.storage.get_object_size.return_value = len(MP4_CONTENT)
+    app.storage.get_object_range.return_value = MP4_CONTENT[:12]
+
+    with patch('app.api.routes.jwt.decode') as mock_jwt_decode, \
+         patch('app.api.routes.job_queue') as mock_queue:
+        mock_jwt_decode.return_value = {"user": test_username, "user_id": str(test_user_id)}
+        mock_queue.submit.return_value = str(video_id)
+
+        response = client.post('/uploads/presigned', headers=auth_headers, json={
+            'filename': 'clip.mp4', 'size': len(MP4_CONTENT), 'imgsz': 480
+        })
+        assert response.status_code == 201
+        upload = json.loads(response.data)
+        assert upload['upload_url'] == 'http://minio:9000/uploads/object.mp4?X-Amz-Signature=abc'
+        assert upload['method'] == 'PUT'
+        upload_id = upload['upload_id']
+
+        response = client.put(f'/uploads/{upload_id}/parts/1', headers=auth_headers, data=MP4_CONTENT)
+        assert response.status_code == 400
+
+        response = client.post(upload['complete_url'], headers=auth_headers)
+        assert response.status_code == 202
+        assert json.loads(response.data)['job_id'] == str(video_id)
+
+    app.storage.upload_part.assert_not_called()
+    app.storage.complete_multipart_upload.assert_not_called()
+    payload = mock_queue.submit.call_args[0][0]
+    assert payload['source_object'] == sessions[upload_id]['s3_key']
+    assert payload['imgsz'] == 480
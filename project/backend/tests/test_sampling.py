@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+from app.services.video_processing.sampling import (
+    FixedStrideSampler,
+    MotionGatedSampler,
+    create_sampler
+)
+
+
+def static_frame():
+    return np.full((120, 160, 3), 80, dtype=np.uint8)
+
+
+def moving_frame(index):
+    frame = static_frame()
+    x = (index * 7) % 120
+    frame[30:90, x:x + 40] = 255
+    return frame
+
+
+def run_sampler(sampler, frames):
+    selected = []
+    for index, frame in enumerate(frames):
+        pixels = frame if sampler.needs_pixels(index) else None
+        if sampler.select(index, pixels):
+            selected.append(index)
+    return selected
+
+
+def test_fixed_stride_sampler():
+    """Тестирует выбор каждого stride-го кадра без декодирования."""
+    sampler = FixedStrideSampler(4)
+
+    assert run_sampler(sampler, [static_frame()] * 10) == [0, 4, 8]
+    assert sampler.needs_pixels(1) is False
+
+
+def test_motion_sampler_static_scene_uses_max_gap():
+    """Тестирует, что статичная сцена обрабатывается не реже чем раз в max_gap кадров."""
+    sampler = MotionGatedSampler(min_gap=2, max_gap=10)
+
+    selected = run_sampler(sampler, [static_frame()] * 25)
+
+    assert selected == [0, 10, 20]
+
+
+def test_motion_sampler_dense_on_motion():
+    """Тестирует плотный выбор кадров при движении в кадре."""
+    sampler = MotionGatedSampler(min_gap=2, max_gap=10)
+
+    selected = run_sampler(sampler, [moving_frame(i) for i in range(10)])
+
+    assert selected == [0, 2, 4, 6, 8]
+
+
+def test_motion_sampler_skips_decoding_within_min_gap():
+    """Тестирует, что кадры ближе min_gap к выбранному не требуют декодирования."""
+    sampler = MotionGatedSampler(min_gap=3, max_gap=10)
+    sampler.select(0, static_frame())
+
+    assert sampler.needs_pixels(1) is False
+    assert sampler.needs_pixels(3) is True
+
+
+def test_create_sampler_unknown_mode():
+    """Тестирует ошибку при неизвестном режиме выбора кадров."""
+    with pytest.raises(ValueError):
+        create_sampler('random')
@@ -0,0 +1,74 @@
+import pytest
+import os
+import subprocess
+import sys
+import tempfile
+import cv2
+import numpy as np
+from unittest.mock import patch
+from app.services.video_processing import segments
+from app.services.video_processing.encoder import find_ffmpeg, open_mp4_writer
+
+
+def test_plan_segments_short_video_is_not_split():
+    """Тестирует, что короткое видео обрабатывается одним отрезком."""
+    assert segments.plan_segments(100, workers=4, min_frames=60) == [(0, None)]
+    assert segments.plan_segments(10000, workers=1, min_frames=60) == [(0, None)]
+
+
+def test_plan_segments_covers_video_with_aligned_starts():
+    """Тестирует, что отрезки покрывают видео без пропусков, а их начала кратны шагу кадров."""
+    planned = segments.plan_segments(1000, workers=3, min_frames=100, align=8)
+
+    assert len(planned) == 3
+    assert planned[0][0] == 0
+    assert planned[-1][1] is None
+    for (start, end), (next_start, _) in zip(planned, planned[1:]):
+        assert start % 8 == 0
+        assert end == next_start
+
+
+def test_resolve_workers():
+    """Тестирует разбор числа процессов пула."""
+    assert segments.resolve_workers('0') == 0
+    assert segments.resolve_workers(3) == 3
+    assert segments.resolve_workers('auto') == segments.available_cpus()
+
+
+@pytest.mark.skipif(not find_ffmpeg(), reason="ffmpeg недоступен")
+def test_pool_processes_do_not_start_application():
+    """Тестирует, что импорт модулей в процессе пула не создает приложение и не меняет окружение родителя."""
+    environ = dict(os.environ)
+    env = {key: value for key, value in os.environ.items() if key != 'STARTUP_INIT'}
+    code = "import sys, app.services.video_processing.segments; print('app.api.routes' in sys.modules)"
+
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False'
+
+    with patch.object(segments, 'ProcessPoolExecutor'):
+        segments.get_pool(2)
+        segments.reset_pool()
+    assert dict(os.environ) == environ
+
+
+def test_concat_segments_joins_without_reencoding():
+    """Тестирует склейку видео отрезков в один MP4."""
+    workspace = tempfile.mkdtemp()
+    paths = []
+    for number in range(2):
+        path = os.path.join(workspace, f"segment_{number}.mp4")
+        writer = open_mp4_writer(path, 10, (160, 120))
+        for _ in range(5):
+            writer.write(np.full((120, 160, 3), number * 100, dtype=np.uint8))
+        writer.release()
+        paths.append(path)
+
+    output_path = os.path.join(workspace, 'result.mp4')
+    segments.concat_segments(paths, output_path)
+
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 10
+    cap.release()
+    assert not os.path.exists(f"{output_path}.segments.txt")
@@ -0,0 +1,37 @@
+import pytest
+from app.services.video_processing import spans
+
+
+def _count(name):
+    return spans.video_processing_span_seconds.labels(span=name)._sum.get()
+
+
+def test_span_records_duration_in_histogram_and_timings():
+    """Тестирует запись длительности интервала в гистограмму и в словарь этапов."""
+    before = _count('upload')
+    timings = {}
+    with spans.span('upload', timings):
+        pass
+    with spans.span('upload', timings):
+        pass
+
+    assert timings['upload'] >= 0
+    assert _count('upload') - before == pytest.approx(timings['upload'])
+
+
+def test_span_is_recorded_on_error():
+    """Тестирует учет интервала, завершившегося исключением."""
+    timings = {}
+    with pytest.raises(ValueError):
+        with spans.span('probe', timings):
+            raise ValueError("broken")
+
+    assert 'probe' in timings
+
+
+def test_observe_accumulates_known_duration():
+    """Тестирует учет интервала с известной длительностью."""
+    timings = {'encode': 1.0}
+    spans.observe('encode', 0.5, timings)
+
+    assert timings['encode'] == 1.5
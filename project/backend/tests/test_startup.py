@@ -0,0 +1,58 @@
+import pytest
+import threading
+import time
+from app.services.startup import StartupManager
+
+
+def test_startup_runs_tasks_in_parallel():
+    """Тестирует параллельное выполнение задач инициализации и готовность после их завершения."""
+    barrier = threading.Barrier(2, timeout=2)
+    manager = StartupManager(retry_interval=0.01)
+    manager.add_task('database', barrier.wait)
+    manager.add_task('model', barrier.wait)
+
+    assert manager.is_ready() is False
+    manager.start()
+
+    assert manager.wait(timeout=5) is True
+    status = manager.status()
+    assert status['tasks']['database']['status'] == 'ready'
+    assert 'task:model' in status['phases']
+
+
+def test_startup_retries_failed_task():
+    """Тестирует повтор неудавшейся задачи и неготовность до ее успеха."""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("database is down")
+
+    manager = StartupManager(retry_interval=0.01)
+    manager.add_task('database', flaky)
+    manager.start()
+
+    assert manager.wait(timeout=5) is True
+    assert manager.status()['tasks']['database']['attempts'] == 3
+
+
+def test_startup_optional_task_does_not_block_readiness():
+    """Тестирует, что необязательная задача не влияет на готовность."""
+    manager = StartupManager(retry_interval=10)
+    manager.add_task('database', lambda: None)
+    manager.add_task('cache', lambda: time.sleep(5), required=False)
+    manager.start()
+
+    assert manager.wait(timeout=2) is True
+    assert manager.status()['tasks']['cache']['status'] == 'running'
+
+
+def test_startup_records_phases():
+    """Тестирует запись длительности этапов запуска."""
+    manager = StartupManager()
+
+    with manager.phase('import:routes'):
+        time.sleep(0.01)
+
+    assert manager.status()['phases']['import:routes'] >= 0.01
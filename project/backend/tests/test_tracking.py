@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+from app.models.model import Detections
+from app.services.video_processing.tracking import OpticalFlowTracker, create_tracker
+
+
+def textured_frame(x, y, size=(240, 320)):
+    """Кадр с текстурированным квадратом 40x40 в точке (x, y) на ровном фоне."""
+    rng = np.random.default_rng(0)
+    patch = (rng.random((40, 40)) * 255).astype(np.uint8)
+    frame = np.full(size, 30, dtype=np.uint8)
+    frame[y:y + 40, x:x + 40] = patch
+    return frame
+
+
+def box_detections(x, y):
+    return Detections(
+        xyxy=np.array([[x, y, x + 40, y + 40]], dtype=np.float32),
+        conf=np.array([0.8], dtype=np.float32),
+        cls=np.array([0], dtype=np.int32),
+    )
+
+
+def test_tracker_follows_moving_object():
+    """Тестирует перенос рамки за движущимся объектом."""
+    tracker = OpticalFlowTracker()
+    tracker.reset(textured_frame(50, 60), box_detections(50, 60))
+
+    for step in range(1, 6):
+        detections = tracker.update(textured_frame(50 + 3 * step, 60 + 2 * step))
+
+    assert detections is not None
+    np.testing.assert_allclose(detections.xyxy[0], [65, 70, 105, 110], atol=1.5)
+    # Уверенность рамки не убывает вместе с точками, иначе порог отбросит удерживаемую рамку
+    assert detections.conf[0] == pytest.approx(0.8)
+    assert detections.cls.tolist() == [0]
+
+
+def test_tracker_reports_lost_object():
+    """Тестирует потерю сопровождения при исчезновении объекта."""
+    tracker = OpticalFlowTracker()
+    tracker.reset(textured_frame(50, 60), box_detections(50, 60))
+
+    assert tracker.update(np.full((240, 320), 30, dtype=np.uint8)) is None
+
+
+def test_tracker_without_boxes_and_modes():
+    """Тестирует перенос пустого результата и создание трекера по режиму."""
+    tracker = OpticalFlowTracker()
+    assert tracker.update(textured_frame(0, 0)) is None
+
+    empty = Detections(xyxy=np.zeros((0, 4), dtype=np.float32), conf=np.zeros(0), cls=np.zeros(0))
+    tracker.reset(textured_frame(0, 0), empty)
+    assert len(tracker.update(textured_frame(0, 0)).cls) == 0
+
+    assert create_tracker('off') is None
+    assert isinstance(create_tracker('flow'), OpticalFlowTracker)
+    with pytest.raises(ValueError):
+        create_tracker('unknown')
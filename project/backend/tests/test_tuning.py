@@ -0,0 +1,106 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from app.services.tuning import topology, tuning
+
+
+def _write(root, path, text):
+    target = root / path.lstrip('/')
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(text)
+
+
+def test_cgroup_cpu_quota_v2(tmp_path):
+    """Тестирует чтение квоты процессора из cgroup v2."""
+    _write(tmp_path, topology.CGROUP_V2_CPU_MAX, "150000 100000\n")
+    assert topology.cgroup_cpu_quota(str(tmp_path)) == 1.5
+
+    _write(tmp_path, topology.CGROUP_V2_CPU_MAX, "max 100000\n")
+    assert topology.cgroup_cpu_quota(str(tmp_path)) is None
+
+
+def test_cgroup_cpu_quota_v1(tmp_path):
+    """Тестирует чтение квоты процессора из cgroup v1 и отсутствие квоты."""
+    assert topology.cgroup_cpu_quota(str(tmp_path)) is None
+
+    _write(tmp_path, topology.CGROUP_V1_QUOTA, "30000")
+    _write(tmp_path, topology.CGROUP_V1_PERIOD, "100000")
+    assert topology.cgroup_cpu_quota(str(tmp_path)) == pytest.approx(0.3)
+
+    _write(tmp_path, topology.CGROUP_V1_QUOTA, "-1")
+    assert topology.cgroup_cpu_quota(str(tmp_path)) is None
+
+
+def test_available_cpus_limited_by_quota(tmp_path):
+    """Тестирует ограничение числа процессоров квотой контейнера (с округлением вверх)."""
+    _write(tmp_path, topology.CGROUP_V2_CPU_MAX, "250000 100000")
+    with patch.object(topology.os, 'sched_getaffinity', return_value=set(range(8))):
+        assert topology.available_cpus(str(tmp_path)) == 3
+
+    _write(tmp_path, topology.CGROUP_V2_CPU_MAX, "30000 100000")
+    with patch.object(topology.os, 'sched_getaffinity', return_value=set(range(8))):
+        assert topology.available_cpus(str(tmp_path)) == 1
+
+
+def test_plan_threads_splits_cpus_between_workers():
+    """Тестирует распределение процессоров между воркерами, torch и OpenCV."""
+    with patch.object(topology, 'TUNING_MAX_WORKERS', 4):
+        plan = topology.plan_threads(8)
+        assert plan['workers'] == 4
+        assert plan['torch_intra_op'] == plan['opencv'] == 2
+
+        assert topology.plan_threads(8, inference_server=True)['torch_intra_op'] == 1
+
+        server = topology.plan_threads(8, role='inference')
+        assert server['workers'] == 1
+        assert server['torch_intra_op'] == 8
+
+
+def test_load_config_precedence(tmp_path):
+    """Тестирует порядок: окружение важнее файла автонастройки, файл - распределения по умолчанию."""
+    tuning_file = tmp_path / "tuning.json"
+    tuning_file.write_text(json.dumps({'role': 'api', 'cpus': 4, 'workers': 1, 'torch_intra_op': 4, 'opencv': 4}))
+
+    with patch.object(topology, 'available_cpus', return_value=4):
+        config = topology.load_config(tuning_file=str(tuning_file), environ={})
+        assert config['source'] == 'file'
+        assert (config['workers'], config['torch_intra_op']) == (1, 4)
+
+        config = topology.load_config(tuning_file=str(tuning_file), environ={'WEB_CONCURRENCY': '2'})
+        assert config['source'] == 'env'
+        assert (config['workers'], config['torch_intra_op']) == (2, 4)
+
+    # Файл создан для другого числа процессоров: используется распределение по умолчанию
+    with patch.object(topology, 'available_cpus', return_value=2):
+        config = topology.load_config(tuning_file=str(tuning_file), environ={})
+        assert config['source'] == 'auto'
+        assert config['workers'] == 2
+
+
+def test_configure_torch_sets_threads():
+    """Тестирует настройку потоков torch и повторный вызов после первой параллельной операции."""
+    torch = MagicMock()
+    torch.set_num_interop_threads.side_effect = RuntimeError("already set")
+    config = {'torch_intra_op': 3, 'torch_inter_op': 1}
+
+    with patch.object(tuning, 'current_config', return_value=config):
+        tuning.configure_torch(torch)
+
+    torch.set_num_threads.assert_called_once_with(3)
+    torch.set_num_interop_threads.assert_called_once_with(1)
+
+
+def test_apply_sets_opencv_threads_and_info():
+    """Тестирует применение конфигурации: потоки OpenCV и метрика с действующей конфигурацией."""
+    config = topology.plan_threads(2)
+    config['source'] = 'auto'
+
+    with patch.object(tuning.cv2, 'setNumThreads') as mock_set, \
+         patch.object(tuning, 'configure_torch'), \
+         patch.object(tuning, '_config', None):
+        applied = tuning.apply(config)
+        assert tuning.current_config() is applied
+
+    mock_set.assert_called_once_with(config['opencv'])
+    assert applied['role'] == 'api'
+    assert tuning.cpu_tuning_info._value['workers'] == str(config['workers'])
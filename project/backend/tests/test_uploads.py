@@ -0,0 +1,132 @@
+import hashlib
+import io
+import os
+import pytest
+from app.services.uploads import streaming
+from app.services.uploads import UploadRejected, receive_upload, sniff_container
+
+
+BOUNDARY = 'test-boundary'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+MP4_HEAD = b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isommp41'
+
+
+def _body(parts):
+    """Тело multipart/form-data: parts - список (имя, значение) или (имя, имя файла, содержимое)."""
+    body = b''
+    for part in parts:
+        if len(part) == 2:
+            name, value = part
+            body += (
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            ).encode()
+        else:
+            name, filename, content = part
+            body += (
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'
+            ).encode() + content + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def _receive(body, directory, **kwargs):
+    return receive_upload(io.BytesIO(body), CONTENT_TYPE, len(body), str(directory), **kwargs)
+
+
+@pytest.mark.parametrize('head, expected', [
+    (MP4_HEAD, 'mp4'),
+    (b'\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00', 'mov'),
+    (b'RIFF\x00\x10\x00\x00AVI LIST', 'avi'),
+    (b'\x1aE\xdf\xa3\x9fB\x86\x81\x01B\xf7\x81', 'mkv'),
+    (b'%PDF-1.7\n%\xe2\xe3\xcf\xd3', None),
+])
+def test_sniff_container(head, expected):
+    """Тестирует определение формата контейнера по первым байтам файла."""
+    assert sniff_container(head) == expected
+
+
+def test_receive_upload_streams_file_and_fields(tmp_path):
+    """Тестирует сохранение файла, хэш и поля формы, идущие до и после файла."""
+    content = MP4_HEAD + os.urandom(3 * streaming.UPLOAD_CHUNK_SIZE)
+    body = _body([('mode', 'alert'), ('file', 'clip.MP4', content), ('imgsz', '480')])
+
+    upload = _receive(body, tmp_path)
+
+    assert upload.path == str(tmp_path / 'upload.mp4')
+    assert upload.filename == 'clip.MP4'
+    assert upload.size == len(content)
+    assert upload.sha256 == hashlib.sha256(content).hexdigest()
+    assert upload.container == 'mp4'
+    assert upload.fields == {'mode': 'alert', 'imgsz': '480'}
+    with open(upload.path, 'rb') as f:
+        assert f.read() == content
+
+
+def test_receive_upload_rejects_by_content_length_before_reading(tmp_path):
+    """Тестирует отказ 413 по заголовку Content-Length без чтения тела."""
+    class Unreadable:
+        def read(self, size):
+            raise AssertionError("тело не должно читаться")
+
+    with pytest.raises(UploadRejected) as error:
+        receive_upload(Unreadable(), CONTENT_TYPE, 10 * 1024 * 1024, str(tmp_path), max_size=1024)
+
+    assert error.value.status == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_upload_rejects_oversized_stream(tmp_path):
+    """Тестирует отказ 413 при превышении предела без заголовка Content-Length."""
+    body = _body([('file', 'clip.mp4', MP4_HEAD + b'\x00' * 4096)])
+
+    with pytest.raises(UploadRejected) as error:
+        receive_upload(io.BytesIO(body), CONTENT_TYPE, None, str(tmp_path), max_size=1024)
+
+    assert error.value.status == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_upload_rejects_non_video(tmp_path):
+    """Тестирует отказ 415 для файла, не являющегося видео, и удаление записанной части."""
+    body = _body([('file', 'clip.mp4', b'%PDF-1.7\n' + b'x' * 1024)])
+
+    with pytest.raises(UploadRejected) as error:
+        _receive(body, tmp_path)
+
+    assert error.value.status == 415
+    assert error.value.reason == 'not_video'
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('parts, message', [
+    ([('file', 'notes.txt', MP4_HEAD)], 'Недопустимый формат файла'),
+    ([('mode', 'full')], 'No file part'),
+    ([('file', '', b'')], 'No selected file'),
+])
+def test_receive_upload_rejects_invalid_form(tmp_path, parts, message):
+    """Тестирует отказ 400 при недопустимом расширении, отсутствии файла и пустом имени."""
+    with pytest.raises(UploadRejected) as error:
+        _receive(_body(parts), tmp_path)
+
+    assert error.value.status == 400
+    assert message in str(error.value)
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_upload_rejects_truncated_body(tmp_path):
+    """Тестирует отказ при оборванном теле запроса и удаление частично записанного файла."""
+    body = _body([('file', 'clip.mp4', MP4_HEAD + b'\x00' * 1024)])[:-200]
+
+    with pytest.raises(UploadRejected) as error:
+        _receive(body, tmp_path)
+
+    assert error.value.status == 400
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_upload_requires_multipart(tmp_path):
+    """Тестирует отказ для тела запроса, не являющегося multipart/form-data."""
+    with pytest.raises(UploadRejected) as error:
+        receive_upload(io.BytesIO(b'{}'), 'application/json', 2, str(tmp_path))
+
+    assert error.value.status == 400
@@ -84,4 +84,184 @@ def test_process_video_invalid_file(mock_storage):
     finally:
 
         if os.path.exists(temp_path):
-            os.remove(temp_path) 
\ No newline at end of file
+            os.remove(temp_path) 
+
+def test_build_cache_key_depends_on_model_and_threshold():
+    """Тестирует, что ключ кэша меняется вместе с версией модели, порогом уверенности и режимом разметки."""
+    content = 'c' * 64
+    with patch('app.services.video_processing.video_processing.model.get_model_version', return_value='torch-fp32:1'):
+        key = video_processing.build_cache_key(content, 0.6)
+        assert key == video_processing.build_cache_key(content, 0.6)
+        assert key != video_processing.build_cache_key(content, 0.5)
+        assert key != video_processing.build_cache_key('d' * 64, 0.6)
+        assert key != video_processing.build_cache_key(content, 0.6, render=False)
+
+    with patch('app.services.video_processing.video_processing.model.get_model_version', return_value='torch-fp32:2'):
+        assert key != video_processing.build_cache_key(content, 0.6)
+
+
+def test_process_segments_merges_results_in_frame_order():
+    """Тестирует объединение результатов отрезков, завершившихся в произвольном порядке."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fake_range(filename, confidence_threshold, output_path, start_frame=0, end_frame=None, **kwargs):
+        objects = [(index, index == 8, False) for index in range(start_frame, end_frame or 24, 8)]
+        stats = {'infer': {'frames': len(objects), 'busy_seconds': 0.1}, 'wall_seconds': 0.2}
+        return objects, {'weapon': sum(1 for _, weapon, _ in objects if weapon), 'knife': 0}, stats
+
+    with ThreadPoolExecutor(max_workers=3) as pool, \
+         patch.object(video_processing.segments, 'get_pool', return_value=pool), \
+         patch.object(video_processing, 'process_frame_range', side_effect=fake_range), \
+         patch.object(video_processing.segments, 'concat_segments') as mock_concat:
+        frame_objects, counters, stats = video_processing._process_segments(
+            'video.mp4', 0.5, '/tmp/out.mp4', [(0, 8), (8, 16), (16, None)], '/tmp/workspace'
+        )
+
+    assert [item[0] for item in frame_objects] == [0, 8, 16]
+    assert counters == {'weapon': 1, 'knife': 0}
+    assert stats['infer']['frames'] == 3
+    assert len(mock_concat.call_args[0][0]) == 3
+
+
+def test_detect_alert_stops_at_first_confirmed_detection(mock_video_file):
+    """Тестирует остановку просмотра после подтверждения обнаружения на N кадрах подряд."""
+    from app.models.model import Detections
+    calls = []
+
+    def fake_predict(frames, conf=0.25, **kwargs):
+        calls.append(len(frames))
+        return [
+            Detections(
+                xyxy=np.array([[10, 10, 50, 50]], dtype=np.float32),
+                conf=np.array([0.9], dtype=np.float32),
+                cls=np.array([1], dtype=np.int32),
+            )
+            for _ in frames
+        ]
+
+    with patch.object(video_processing, 'build_sampler', return_value=video_processing.create_sampler('fixed', stride=1)), \
+         patch.object(video_processing.model, 'get_class_names', return_value={0: 'weapon', 1: 'knife'}), \
+         patch.object(video_processing.model, 'predict_batch', side_effect=fake_predict):
+        result = video_processing.detect_alert(mock_video_file, 0.5, confirm_frames=2)
+
+    assert result['alert'] is True
+    assert result['frame'] == 0
+    assert result['confirmed_frame'] == 1
+    assert result['timestamp_seconds'] == 0.0
+    assert result['objects'] == ['knife']
+    assert result['frames_scanned'] == 2
+    assert sum(calls) < 5
+
+
+def test_process_frame_range_stores_detections_below_threshold(mock_video_file, tmp_path):
+    """Тестирует сохранение обнаружений с нижним порогом при логе и счетчиках по заданному порогу."""
+    from app.models.model import Detections
+    from app.services.video_processing.detection_store import DetectionReader
+    thresholds = []
+
+    def fake_predict(frames, conf=0.25, **kwargs):
+        thresholds.append(conf)
+        return [
+            Detections(
+                xyxy=np.array([[10, 10, 50, 50], [60, 60, 90, 90]], dtype=np.float32),
+                conf=np.array([0.9, 0.3], dtype=np.float32),
+                cls=np.array([0, 1], dtype=np.int32),
+            )
+            for _ in frames
+        ]
+
+    detections_path = str(tmp_path / "video.detections")
+    with patch.object(video_processing, 'build_sampler', return_value=video_processing.create_sampler('fixed', stride=1)), \
+         patch.object(video_processing.model, 'get_class_names', return_value={0: 'weapon', 1: 'knife'}), \
+         patch.object(video_processing.model, 'predict_batch', side_effect=fake_predict):
+        frame_objects, counters, _ = video_processing.process_frame_range(
+            mock_video_file, 0.6, None, detections_path=detections_path
+        )
+
+    assert set(thresholds) == {video_processing.DETECTIONS_FLOOR_CONF}
+    assert counters == {'weapon': 5, 'knife': 0}
+    assert all(weapon and not knife for _, weapon, knife in frame_objects)
+
+    reader = DetectionReader.from_file(detections_path)
+    assert reader.min_score == video_processing.DETECTIONS_FLOOR_CONF
+    assert reader.rows == 10
+
+
+def test_process_frame_range_counts_tracked_boxes_once(mock_video_file):
+    """Тестирует лог по всем кадрам с перенесенными рамками и счетчики только по кадрам детектора."""
+    from app.models.model import Detections
+    from app.services.video_processing.tracking import OpticalFlowTracker
+
+    def fake_predict(frames, conf=0.25, **kwargs):
+        return [
+            Detections(
+                xyxy=np.array([[80, 80, 220, 220]], dtype=np.float32),
+                conf=np.array([0.7], dtype=np.float32),
+                cls=np.array([0], dtype=np.int32),
+            )
+            for _ in frames
+        ]
+
+    with patch.object(video_processing, 'build_sampler', return_value=video_processing.create_sampler('fixed', stride=5)), \
+         patch.object(video_processing, 'build_tracker', return_value=OpticalFlowTracker()), \
+         patch.object(video_processing.model, 'get_class_names', return_value={0: 'weapon', 1: 'knife'}), \
+         patch.object(video_processing.model, 'predict_batch', side_effect=fake_predict):
+        frame_objects, counters, _ = video_processing.process_frame_range(mock_video_file, 0.6, None)
+
+    assert [index for index, weapon, _ in frame_objects if weapon] == [0, 1, 2, 3, 4]
+    assert counters == {'weapon': 1, 'knife': 0}
+
+
+def test_process_video_without_rendering(mock_video_file):
+    """Тестирует обработку без видео с разметкой: исходник перепаковывается, обнаружения сохраняются."""
+    stats = {'infer': {'frames': 1, 'busy_seconds': 0.1}, 'encode': {'frames': 0, 'busy_seconds': 0.0}}
+
+    def fake_range(filename, confidence_threshold, output_path, **kwargs):
+        assert output_path is None
+        return [(0, True, False)], {'weapon': 1, 'knife': 0}, stats
+
+    def fake_remux(source_path, output_path):
+        with open(output_path, 'wb') as f:
+            f.write(b'remuxed')
+        return True
+
+    with patch.object(video_processing, 'process_frame_range', side_effect=fake_range), \
+         patch.object(video_processing, 'remux_to_mp4', side_effect=fake_remux) as mock_remux, \
+         patch.object(video_processing, 'storage') as mock_storage:
+        timings = {}
+        name, frame_objects, _, detected, _ = video_processing.process_video(
+            mock_video_file, 0.5, 'user', output_filename='user_result.mp4', render=False, timings=timings
+        )
+
+    assert name == 'user_result.mp4'
+    assert detected is True
+    assert mock_remux.call_args[0][0] == mock_video_file
+    assert mock_storage.save_video.call_args[0][2]['rendered'] == 'false'
+    mock_storage.save_detections.assert_called_once()
+    assert set(timings) == {'probe', 'pipeline', 'infer', 'remux', 'finalize', 'upload', 'log_save', 'cleanup'}
+
+
+@pytest.mark.parametrize('head, saved', [
+    (b'\x00\x00\x00\x18ftypisom\x00\x00\x02\x00', True),
+    (b'RIFF\x00\x00\x00\x00AVI LIST', False),
+])
+def test_process_video_without_rendering_when_remux_fails(tmp_path, head, saved):
+    """Тестирует, что без перепаковки сохраняется только исходник MP4, а AVI не выдается за MP4."""
+    source = tmp_path / 'upload.bin'
+    source.write_bytes(head + b'\x00' * 64)
+    stats = {'infer': {'frames': 1, 'busy_seconds': 0.1}, 'encode': {'frames': 0, 'busy_seconds': 0.0}}
+    cap = MagicMock()
+    cap.isOpened.return_value = True
+    cap.get.return_value = 10
+
+    with patch.object(video_processing.cv2, 'VideoCapture', return_value=cap), \
+         patch.object(video_processing, 'process_frame_range', return_value=([(0, False, False)], {'weapon': 0, 'knife': 0}, stats)), \
+         patch.object(video_processing, 'remux_to_mp4', return_value=False), \
+         patch.object(video_processing, 'storage') as mock_storage:
+        if saved:
+            video_processing.process_video(str(source), 0.5, 'user', output_filename='user_result.mp4', render=False)
+        else:
+            with pytest.raises(RuntimeError):
+                video_processing.process_video(str(source), 0.5, 'user', output_filename='user_result.mp4', render=False)
+
+    assert mock_storage.save_video.called is saved
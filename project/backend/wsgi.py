@@ -1 +1,6 @@
-from app import app
+from app import create_app
+
+# Создание экземпляра приложения для запуска через WSGI. Приложение создается
+# здесь, а не при импорте пакета app: процессы, которым нужны только его модули
+# (сервер инференса, пулы обработки), не запускают фоновую инициализацию
+app = create_app()
@@ -83,6 +83,13 @@ kubectl apply -f /home/terra/devops/project/kubernetes/postgres -n app-namespace
 echo -e "${YELLOW}Запускаем MinIO...${NC}"
 kubectl apply -f /home/terra/devops/project/kubernetes/minio -n app-namespace
 
+# Ключ аутентификации сервера инференса создается один раз случайным
+if ! kubectl get secret inference-authkey -n app-namespace > /dev/null 2>&1; then
+  echo -e "${YELLOW}Создаем секрет inference-authkey...${NC}"
+  kubectl create secret generic inference-authkey -n app-namespace \
+    --from-literal=INFERENCE_SERVER_AUTHKEY="$(openssl rand -hex 32)"
+fi
+
 echo -e "${YELLOW}Запускаем бэкенд с HPA...${NC}"
 kubectl apply -f /home/terra/devops/project/kubernetes/backend -n app-namespace
 
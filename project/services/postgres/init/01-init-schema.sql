@@ -33,6 +33,7 @@ CREATE TABLE detection_results (
     processed_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     status VARCHAR(50) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
     weapon_detected BOOLEAN NOT NULL DEFAULT FALSE,
+    model_variant VARCHAR(64),
     FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
 );
@@ -51,6 +52,40 @@ CREATE TABLE logs (
     FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE SET NULL
 );
 
+-- Кэш результатов обработки: повторная загрузка того же видео тем же пользователем
+CREATE TABLE result_cache (
+    cache_key VARCHAR(64) NOT NULL,
+    user_id UUID NOT NULL,
+    video_id UUID NOT NULL,
+    content_sha256 VARCHAR(64) NOT NULL,
+    model_version VARCHAR(128) NOT NULL,
+    confidence_threshold REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cache_key, user_id),
+    FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+);
+
+-- Загрузки видео в MinIO минуя API: частями (multipart) или по временной ссылке (presigned)
+CREATE TABLE upload_sessions (
+    upload_id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    bucket_name VARCHAR(100) NOT NULL,
+    s3_key VARCHAR(255) NOT NULL,
+    s3_upload_id VARCHAR(255),
+    upload_type VARCHAR(20) NOT NULL DEFAULT 'multipart' CHECK (upload_type IN ('multipart', 'presigned')),
+    total_size BIGINT NOT NULL,
+    part_size BIGINT NOT NULL,
+    parts JSONB NOT NULL DEFAULT '{}',
+    options JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'completed', 'aborted')),
+    video_id UUID,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+    FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE SET NULL
+);
+
 -- Индексы для улучшения производительности
 CREATE INDEX idx_videos_user_id ON videos (user_id);
 CREATE INDEX idx_detection_results_video_id ON detection_results (video_id);
@@ -61,6 +96,9 @@ CREATE INDEX idx_logs_user_id ON logs (user_id);
 CREATE INDEX idx_logs_video_id ON logs (video_id);
 CREATE INDEX idx_videos_s3_key ON videos (s3_key);
 CREATE INDEX idx_videos_bucket_name ON videos (bucket_name);
+CREATE INDEX idx_upload_sessions_user_id ON upload_sessions (user_id);
+CREATE INDEX idx_upload_sessions_active_created_at ON upload_sessions (created_at) WHERE status = 'active';
+CREATE INDEX idx_videos_unfinished_upload_time ON videos (upload_time) WHERE status IN ('pending', 'processing');
 
 -- Добавляем тестового пользователя (admin/admin123)
 INSERT INTO users (username, password_hash, role)